@@ -0,0 +1,431 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark แบบ offline: เปิด HTTP server ในเครื่องที่เสิร์ฟหน้าจำลองของทุกเว็บ แล้วรัน scrap1–4 กับมัน
+
+    python bench.py                              # ทุกสคริปต์
+    python bench.py scrap2 scrap4 --latency-ms 80 --jitter-ms 40 --json bench.json
+    python bench.py serve --port 8765            # เปิด server ค้างไว้ (ลองกับ browser)
+    python bench.py record                       # แปลงไฟล์ผลลัพธ์จริงล่าสุดเป็น fixtures
+
+หน้าจำลองใช้ markup/selector เดียวกับเว็บจริง:
+  /tmd/              select#province-selector + card "วันนี้" ที่โหลดผ่าน XHR
+  /waterlevel        ตาราง MUI + ปุ่ม Next Page (ข้อมูลจาก /api/waterlevel)
+  /dam               ตาราง MUI 2 แท็บ (tabpanel-0/1; ข้อมูลจาก /api/dam?type=...)
+  /dgr/search.php    #country-dropdown + div#myTable + a.paginate_button.next
+ข้อมูลมาจาก bench_fixtures/<name>.json ถ้ามี (สร้างด้วย record) ไม่งั้นสร้างข้อมูลสังเคราะห์แบบคงที่
+
+ผลลัพธ์ต่อสคริปต์: วินาที, pages/sec, rows/sec, WebDriver calls ต่อแถว, peak RSS (ตัวเอง + chromedriver/Chrome)
++ เวลาแยกตาม phase / WebDriver command จาก metrics.py
+แต่ละสคริปต์รันใน subprocess แยก เพื่อให้ peak RSS ไม่ปนกัน
+"""
+from __future__ import annotations
+
+import os, sys, json, math, time, random, resource, tempfile, threading, subprocess
+from collections import Counter
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# ======================================================================
+# CONFIG
+# ======================================================================
+FIXTURES_DIR: str = os.getenv("BENCH_FIXTURES", "bench_fixtures")
+SCRIPTS = ["scrap1", "scrap2", "scrap3", "scrap4"]
+MUI_PAGE_SIZE = 10
+DGR_PAGE_SIZE = 20
+
+# ======================================================================
+# FIXTURES
+# ======================================================================
+_PROVINCES = ["กรุงเทพมหานคร", "เชียงใหม่", "ขอนแก่น", "ภูเก็ต", "สงขลา", "นครราชสีมา",
+              "ชลบุรี", "อุดรธานี", "พิษณุโลก", "สุราษฎร์ธานี", "ลำปาง", "ตรัง"]
+
+def _synthetic() -> dict:
+    rnd = random.Random(42)
+    tmd = [{"name": p, "value": str(10 + i), "weather": rnd.choice(["ฝนฟ้าคะนอง", "มีเมฆบางส่วน", "ท้องฟ้าแจ่มใส"]),
+            "rain": rnd.choice([0, 10, 20, 40, 60, 70])} for i, p in enumerate(_PROVINCES)]
+    waterlevel = [[f"สถานี{i:03d} ต.{_PROVINCES[i % len(_PROVINCES)]}", _PROVINCES[i % len(_PROVINCES)],
+                   f"{rnd.randint(0, 23):02d}:00", f"{rnd.uniform(1, 30):.2f}", f"{rnd.uniform(20, 40):.2f}",
+                   f"{rnd.uniform(0, 10):.2f}", f"{rnd.uniform(0, 100):.1f}", rnd.choice(["ปกติ", "น้อย", "มาก"]), "-"]
+                  for i in range(95)]
+    def _dams(n, prefix):
+        return [[f"{prefix}{i:02d}"] + [f"{rnd.uniform(1, 9000):,.2f}" for _ in range(7)] for i in range(n)]
+    dgr = {p: [[str(j + 1), f"{10 + i}{j:04d}", f"บ้าน{j} {p}", rnd.choice(["w1.png", "w2.png"]),
+                f"{rnd.uniform(10, 120):.1f}", f"{rnd.uniform(1, 20):.2f}", f"{rnd.uniform(1, 30):.2f}",
+                f"{rnd.uniform(1, 20):.2f}", f"{rnd.uniform(10, 400):.1f}"]
+               for j in range(rnd.randint(15, 70))]
+           for i, p in enumerate(_PROVINCES[:6])}
+    return {"tmd": tmd, "waterlevel": waterlevel, "dam_large": _dams(35, "เขื่อนใหญ่"),
+            "dam_medium": _dams(48, "อ่างกลาง"), "dgr": dgr}
+
+def load_fixtures() -> dict:
+    data = _synthetic()
+    for name in list(data):
+        path = os.path.join(FIXTURES_DIR, f"{name}.json")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data[name] = json.load(f)
+    return data
+
+def table_pages(fx: dict) -> dict:
+    """จำนวนหน้าตารางที่ scraper ต้องเดินผ่าน (ใช้คำนวณ pages/sec)"""
+    mui = lambda n: max(1, math.ceil(n / MUI_PAGE_SIZE))
+    return {
+        "scrap1": len(fx["tmd"]),
+        "scrap2": mui(len(fx["waterlevel"])),
+        "scrap3": mui(len(fx["dam_large"])) + mui(len(fx["dam_medium"])),
+        "scrap4": sum(max(1, math.ceil(len(r) / DGR_PAGE_SIZE)) for r in fx["dgr"].values()),
+    }
+
+# ======================================================================
+# PAGES
+# ======================================================================
+_TMD_HTML = """<!doctype html><html><head><meta charset="utf-8"><title>TMD</title></head><body>
+<select id="province-selector" name="province"><option value="">เลือกจังหวัด</option>{options}</select>
+<div id="cards"></div>
+<script>
+document.getElementById('province-selector').addEventListener('change', function (e) {{
+  fetch('/tmd/api/forecast?province=' + encodeURIComponent(e.target.value))
+    .then(function (r) {{ return r.text(); }})
+    .then(function (html) {{ document.getElementById('cards').innerHTML = html; }});
+}});
+</script></body></html>"""
+
+_TMD_CARD = ('<div class="card card-shadow text-center"><div class="font-small">วันนี้</div>'
+             '<div class="font-tiny text-center">{weather}</div><div class="font-tiny text-center">{rain} %</div></div>'
+             '<div class="card card-shadow text-center"><div class="font-small">พรุ่งนี้</div>'
+             '<div class="font-tiny text-center">-</div></div>')
+
+_MUI_HTML = """<!doctype html><html><head><meta charset="utf-8"><title>{title}</title></head><body>
+<div role="tablist">{tabs}</div>
+<table class="MuiTable-root"><tbody></tbody></table>
+<span title="Next Page"><button id="next" type="button">&rsaquo;</button></span>
+<script>
+var PS = {page_size}, rows = [], page = 0;
+function render() {{
+  var tb = document.createElement('tbody');
+  rows.slice(page * PS, (page + 1) * PS).forEach(function (r) {{
+    var tr = document.createElement('tr');
+    r.forEach(function (c) {{ var td = document.createElement('td'); td.textContent = c; tr.appendChild(td); }});
+    tb.appendChild(tr);
+  }});
+  var t = document.querySelector('.MuiTable-root');
+  t.replaceChild(tb, t.querySelector('tbody'));
+  document.getElementById('next').disabled = (page + 1) * PS >= rows.length;
+}}
+function load(url) {{
+  fetch(url).then(function (r) {{ return r.json(); }}).then(function (j) {{ rows = j.data; page = 0; render(); }});
+}}
+document.getElementById('next').addEventListener('click', function () {{ page++; render(); }});
+Array.prototype.forEach.call(document.querySelectorAll('[aria-controls]'), function (b) {{
+  b.addEventListener('click', function () {{ load(b.getAttribute('data-src')); }});
+}});
+load('{src}');
+</script></body></html>"""
+
+_DGR_HTML = """<!doctype html><html><head><meta charset="utf-8"><title>DGR</title></head><body>
+<form action="search.php" method="get">
+<select id="country-dropdown" name="province"><option value="">-- เลือกจังหวัด --</option>{options}</select>
+<button class="btn btn-primary" type="submit">ค้นหา</button>
+</form>
+{results}
+</body></html>"""
+
+_DGR_RESULTS = """<div id="myTable" class="table-responsive" style="max-height:600px;overflow:auto">
+<table><thead><tr>{head}</tr></thead><tbody></tbody></table></div>
+<ul class="pagination"><li class="paginate_button next"><a class="paginate_button next" href="#">ถัดไป</a></li></ul>
+<script>
+var PS = {page_size}, rows = {rows}, page = 0;
+function cell(v) {{ return /\\.png$/.test(v) ? '<img src="/img/' + v + '" alt="">' : v; }}
+function render() {{
+  var tb = document.createElement('tbody');
+  tb.innerHTML = rows.slice(page * PS, (page + 1) * PS).map(function (r) {{
+    return '<tr>' + r.map(function (c) {{ return '<td>' + cell(c) + '</td>'; }}).join('') + '</tr>';
+  }}).join('');
+  var t = document.querySelector('#myTable table');
+  t.replaceChild(tb, t.querySelector('tbody'));
+  var nxt = document.querySelector('a.paginate_button.next');
+  if ((page + 1) * PS >= rows.length) {{ nxt.classList.add('disabled'); nxt.parentNode.classList.add('disabled'); }}
+}}
+document.querySelector('a.paginate_button.next').addEventListener('click', function (e) {{
+  e.preventDefault(); if (!this.classList.contains('disabled')) {{ page++; render(); }}
+}});
+render();
+</script>"""
+
+_DGR_HEAD = ["ลำดับ", "รหัสบ่อ", "สถานที่ตั้ง", "ประเภท", "ความลึก (เมตร)", "ปริมาณน้ำ (เมตร³/ชม.)",
+             "ระดับน้ำปกติ (เมตร)", "ระยะน้ำลด (เมตร)", "น้ำต้นทุน (เมตร³/วัน.)"]
+
+# 1x1 PNG โปร่งใส (รูปประเภทบ่อ)
+_PNG = bytes.fromhex("89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+                     "1f15c4890000000d49444154789c6360000002000154a24f3a0000000049454e44ae426082")
+
+# ======================================================================
+# SERVER
+# ======================================================================
+class BenchServer:
+    """HTTP server ในเครื่อง + หน่วงเวลาต่อ request (latency ± jitter) + นับ request ตามประเภท"""
+
+    def __init__(self, fixtures: dict, port: int = 0, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.fx = fixtures
+        self.latency_ms, self.jitter_ms = latency_ms, jitter_ms
+        self.hits: Counter = Counter()
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self) -> "BenchServer":
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+
+    def reset(self) -> Counter:
+        with self._lock:
+            hits, self.hits = self.hits, Counter()
+        return hits
+
+    def _count(self, kind: str) -> None:
+        with self._lock:
+            self.hits[kind] += 1
+
+    def _delay(self) -> None:
+        d = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if d > 0:
+            time.sleep(d / 1000.0)
+
+    def route(self, path: str, q: dict):
+        """คืน (status, content-type, body, kind)"""
+        fx = self.fx
+        arg = lambda k: (q.get(k) or [""])[0]
+        if path in ("/tmd", "/tmd/"):
+            opts = "".join(f'<option value="{escape(p["value"])}">{escape(p["name"])}</option>' for p in fx["tmd"])
+            return 200, "text/html", _TMD_HTML.format(options=opts), "page"
+        if path == "/tmd/api/forecast":
+            p = next((p for p in fx["tmd"] if p["value"] == arg("province")), None)
+            body = _TMD_CARD.format(weather=escape(p["weather"]), rain=p["rain"]) if p else ""
+            return 200, "text/html", body, "api"
+        if path == "/waterlevel":
+            return 200, "text/html", _MUI_HTML.format(title="waterlevel", tabs="", page_size=MUI_PAGE_SIZE,
+                                                      src="/api/waterlevel"), "page"
+        if path == "/dam":
+            tabs = ('<button aria-controls="tabpanel-0" data-src="/api/dam?type=large">แหล่งน้ำขนาดใหญ่</button>'
+                    '<button aria-controls="tabpanel-1" data-src="/api/dam?type=medium">แหล่งน้ำขนาดกลาง</button>')
+            return 200, "text/html", _MUI_HTML.format(title="dam", tabs=tabs, page_size=MUI_PAGE_SIZE,
+                                                      src="/api/dam?type=large"), "page"
+        if path == "/api/waterlevel":
+            return 200, "application/json", json.dumps({"data": fx["waterlevel"]}, ensure_ascii=False), "api"
+        if path == "/api/dam":
+            rows = fx["dam_medium"] if arg("type") == "medium" else fx["dam_large"]
+            return 200, "application/json", json.dumps({"data": rows}, ensure_ascii=False), "api"
+        if path == "/dgr/search.php":
+            provinces = list(fx["dgr"])
+            opts = "".join(f'<option value="{i + 1}">{escape(p)}</option>' for i, p in enumerate(provinces))
+            results = ""
+            sel = arg("province")
+            if sel.isdigit() and 0 < int(sel) <= len(provinces):
+                rows = fx["dgr"][provinces[int(sel) - 1]]
+                head = "".join(f"<th>{escape(h)}</th>" for h in _DGR_HEAD)
+                results = _DGR_RESULTS.format(head=head, page_size=DGR_PAGE_SIZE,
+                                              rows=json.dumps(rows, ensure_ascii=False))
+            return 200, "text/html", _DGR_HTML.format(options=opts, results=results), "page"
+        if path.startswith("/img/"):
+            return 200, "image/png", _PNG, "asset"
+        return 404, "text/plain", "not found", "miss"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                u = urlparse(self.path)
+                status, ctype, body, kind = server.route(u.path, parse_qs(u.query))
+                server._count(kind)
+                server._delay()
+                data = body if isinstance(body, bytes) else body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", f"{ctype}; charset=utf-8" if ctype.startswith("text") or "json" in ctype else ctype)
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+# ======================================================================
+# CHILD: รันสคริปต์เดียวกับ server ที่ base URL
+# ======================================================================
+def _csv_rows(path: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    import pandas as pd
+    return len(pd.read_csv(path, dtype=str, keep_default_na=False, encoding="utf-8-sig"))
+
+def run_child(script: str, base: str, out_dir: str) -> dict:
+    os.environ["EMAIL_ENABLED"] = "false"
+    os.environ["TMD_HOME"] = f"{base}/tmd/"
+    os.environ["CSV_OUT"] = os.path.join(out_dir, "tmd.csv")
+    os.environ.setdefault("STORAGE_BACKEND", "csv")
+    os.environ.setdefault("TMD_ENGINE", "selenium")
+    os.environ["METRICS_ENABLED"] = "true"
+    os.environ["METRICS_DIR"] = out_dir
+    os.chdir(out_dir)
+    import metrics
+
+    with metrics.run(script) as run_:
+        rows = _run_script(script, base, out_dir)
+    rep = run_.report()
+
+    ru_self = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    ru_children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {"script": script, "secs": rep["total_secs"], "rows": rows,
+            "webdriver_calls": rep["webdriver"]["count"], "webdriver_secs": rep["webdriver"]["secs"],
+            "webdriver_commands": rep["webdriver"]["commands"], "phases": rep["phases"],
+            "peak_rss_mb": round(ru_self / 1024, 1), "children_peak_rss_mb": round(ru_children / 1024, 1)}
+
+def _run_script(script: str, base: str, out_dir: str) -> int:
+    if script == "scrap1":
+        import scrap1
+        scrap1.main()
+        rows = _csv_rows(scrap1.CSV_OUT)
+    elif script == "scrap2":
+        import scrap2
+        scrap2.URL = f"{base}/waterlevel"
+        scrap2.CSV_OUT = os.path.join(out_dir, "waterlevel_report.csv")
+        scrap2.ENABLE_GOOGLE_DRIVE_UPLOAD = False
+        scrap2.main()
+        rows = _csv_rows(scrap2.CSV_OUT)
+    elif script == "scrap3":
+        import scrap3
+        scrap3.URL = f"{base}/dam"
+        data = scrap3.scrape_all()
+        rows = sum(scrap3.save_data_to_csv(data[t], t)[0] for t in ("large", "medium"))
+    elif script == "scrap4":
+        import scrap4
+        scrap4.URL = f"{base}/dgr/search.php"
+        scrap4.OUT_DIR = out_dir
+        for name in ("ALL_PATH", "UPLOAD_STATE_PATH", "RUN_LOG_PATH", "SESSION_SUMMARY_PATH",
+                     "CHECKPOINT_PATH", "PROVINCE_DIR"):
+            setattr(scrap4, name, os.path.join(out_dir, os.path.basename(getattr(scrap4, name))))
+        scrap4.ENABLE_GOOGLE_DRIVE_UPLOAD = False
+        scrap4.run_all_provinces(headless=True)
+        rows = _csv_rows(scrap4.ALL_PATH)
+    else:
+        raise SystemExit(f"unknown script: {script}")
+    return rows
+
+# ======================================================================
+# PARENT
+# ======================================================================
+def bench(scripts: list, latency_ms: float = 0.0, jitter_ms: float = 0.0) -> list:
+    fx = load_fixtures()
+    pages = table_pages(fx)
+    server = BenchServer(fx, latency_ms=latency_ms, jitter_ms=jitter_ms).start()
+    results = []
+    try:
+        for script in scripts:
+            server.reset()
+            with tempfile.TemporaryDirectory(prefix=f"bench_{script}_") as out_dir:
+                print(f"\n===== {script} ({server.base}, latency {latency_ms}±{jitter_ms} ms) =====")
+                proc = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "child", script, server.base, out_dir],
+                    cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True,
+                )
+                hits = server.reset()
+                lines = [l for l in proc.stdout.splitlines() if l.startswith("BENCH_RESULT ")]
+                if proc.returncode != 0 or not lines:
+                    print(proc.stdout[-2000:], proc.stderr[-2000:])
+                    results.append({"script": script, "error": f"exit {proc.returncode}"})
+                    continue
+                r = json.loads(lines[-1][len("BENCH_RESULT "):])
+                secs = r["secs"] or 1e-9
+                r.update({
+                    "latency_ms": latency_ms, "jitter_ms": jitter_ms,
+                    "table_pages": pages[script], "http_requests": dict(hits),
+                    "pages_per_sec": round(pages[script] / secs, 3),
+                    "rows_per_sec": round(r["rows"] / secs, 3),
+                    "webdriver_calls_per_row": round(r["webdriver_calls"] / r["rows"], 3) if r["rows"] else None,
+                })
+                results.append(r)
+                print(f"⏱ {r['secs']}s | {r['rows']} rows | {r['pages_per_sec']} pages/s | {r['rows_per_sec']} rows/s"
+                      f" | {r['webdriver_calls_per_row']} WebDriver calls/row | RSS {r['peak_rss_mb']} MB"
+                      f" (+children {r['children_peak_rss_mb']} MB)")
+    finally:
+        server.stop()
+    return results
+
+def record(out_dir: str = FIXTURES_DIR, limit: int = 500) -> None:
+    """สร้าง fixtures จากไฟล์ผลลัพธ์จริงล่าสุดของแต่ละสคริปต์ (ถ้ามี)"""
+    import pandas as pd
+    os.makedirs(out_dir, exist_ok=True)
+
+    def _read(path):
+        return pd.read_csv(path, dtype=str, keep_default_na=False, encoding="utf-8-sig") if os.path.exists(path) else None
+
+    def _save(name, data):
+        with open(os.path.join(out_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        print(f"💾 {name}: {len(data)} รายการ")
+
+    df = _read(os.getenv("CSV_OUT", "tmd_7day_forecast_today.csv"))
+    if df is not None and not df.empty:
+        _save("tmd", [{"name": r.Province, "value": str(i + 1), "weather": r.Weather,
+                       "rain": int(float(r.RainChance or 0) * 100)} for i, r in enumerate(df.itertuples())])
+    df = _read("waterlevel_report.csv")
+    if df is not None and not df.empty:
+        _save("waterlevel", df.iloc[-limit:, :9].values.tolist())
+    for t in ("large", "medium"):
+        df = _read(f"waterdam_report_{t}.csv")
+        if df is not None and not df.empty:
+            _save(f"dam_{t}", df.iloc[-limit:, :-2].values.tolist())
+    df = _read(os.path.join("dgr_results", "dgr_all_provinces.csv"))
+    if df is not None and not df.empty and "Province" in df.columns:
+        cols = [c for c in df.columns if c not in ("Province", "CollectedAt")]
+        _save("dgr", {p: g[cols].values.tolist()[:limit] for p, g in df.groupby("Province")})
+
+def main(argv: list) -> int:
+    import argparse
+    if argv[:1] == ["child"]:
+        _, script, base, out_dir = argv
+        print("BENCH_RESULT " + json.dumps(run_child(script, base, out_dir), ensure_ascii=False), flush=True)
+        return 0
+
+    ap = argparse.ArgumentParser(description="offline scraper benchmark")
+    ap.add_argument("targets", nargs="*", help="scrap1..scrap4 | serve | record")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--json", help="เขียนผลลัพธ์เป็น JSON")
+    args = ap.parse_args(argv)
+
+    if args.targets[:1] == ["serve"]:
+        server = BenchServer(load_fixtures(), port=args.port, latency_ms=args.latency_ms,
+                             jitter_ms=args.jitter_ms).start()
+        print(f"🌐 {server.base}/tmd/  {server.base}/waterlevel  {server.base}/dam  {server.base}/dgr/search.php")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.stop()
+        return 0
+    if args.targets[:1] == ["record"]:
+        record()
+        return 0
+
+    results = bench(args.targets or SCRIPTS, args.latency_ms, args.jitter_ms)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 {args.json}")
+    return 1 if any("error" in r for r in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""
+สร้าง Chrome สำหรับทุกสคริปต์จากที่เดียว + โปรไฟล์ "lean"
+
+lean = ไม่โหลด รูป/วิดีโอ/ฟอนต์/analytics/map tiles ที่ scraper ไม่ได้อ่าน
+- รูปถูกปิดด้วย content setting: <img src> ยังอยู่ใน DOM (scrap4 ใช้ TYPE_MAP ได้) แต่ไม่ดาวน์โหลด bytes
+- ที่เหลือบล็อกด้วย CDP Network.setBlockedURLs
+- allow=[...] ใช้ยกเว้น pattern ที่เว็บนั้นจำเป็นต้องโหลด (จับคู่แบบ substring)
+
+SessionBroker: เปิด Chrome ครั้งเดียว (หรือ pool เล็ก ๆ) แล้วแจก tab ใหม่ให้แต่ละ scraper
+ภายใน process เดียว (ดู run_all.py) ; path ของ chromedriver ถูก cache ไว้ใน CHROMEDRIVER_CACHE
+"""
+from __future__ import annotations
+
+import os, json, shutil, threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+import metrics
+
+LEAN_BROWSER: bool = os.getenv("LEAN_BROWSER", "true").lower() == "true"
+CHROMEDRIVER_CACHE: str = os.getenv(
+    "CHROMEDRIVER_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "auto_scraper", "chromedriver.json")
+)
+
+DEFAULT_UA: str = ("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36")
+
+LEAN_BLOCK_PATTERNS: tuple[str, ...] = (
+    # fonts
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    # media
+    "*.mp4", "*.webm", "*.mp3", "*.ogg", "*.m3u8",
+    # analytics / ads / social
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*googlesyndication.com*", "*facebook.net*", "*connect.facebook.com*",
+    "*hotjar.com*", "*clarity.ms*", "*histats.com*", "*truehits.net*",
+    # map tiles
+    "*tile.openstreetmap.org*", "*maps.googleapis.com/maps/vt*", "*maps.gstatic.com*",
+    "*arcgisonline.com*", "*api.mapbox.com*", "*tiles.mapbox.com*",
+)
+
+LEAN_ARGS: tuple[str, ...] = (
+    "--blink-settings=imagesEnabled=false",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--no-first-run",
+    "--mute-audio",
+)
+
+def blocked_patterns(allow: Iterable[str] = (), extra: Iterable[str] = ()) -> list[str]:
+    allow = [a for a in allow if a]
+    pats = list(LEAN_BLOCK_PATTERNS) + list(extra)
+    return [p for p in pats if not any(a in p for a in allow)]
+
+def build_options(headless: bool = True, lean: bool = LEAN_BROWSER, user_agent: Optional[str] = DEFAULT_UA,
+                  window_size: Optional[str] = "1920,1080", page_load_strategy: Optional[str] = None,
+                  extra_args: Sequence[str] = ()) -> Options:
+    opt = Options()
+    if headless:
+        opt.add_argument("--headless=new")
+    opt.add_argument("--no-sandbox")
+    opt.add_argument("--disable-dev-shm-usage")
+    if window_size:
+        opt.add_argument(f"--window-size={window_size}")
+    if user_agent:
+        opt.add_argument(f"--user-agent={user_agent}")
+    for a in extra_args:
+        opt.add_argument(a)
+    if lean:
+        for a in LEAN_ARGS:
+            opt.add_argument(a)
+        opt.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.default_content_setting_values.notifications": 2,
+            "profile.default_content_setting_values.geolocation": 2,
+        })
+    if page_load_strategy:
+        opt.page_load_strategy = page_load_strategy
+    return opt
+
+def apply_blocking(driver, allow: Iterable[str] = (), extra: Iterable[str] = ()) -> None:
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked_patterns(allow, extra)})
+    except Exception as e:
+        print("⚠️ ตั้งค่า block URL ไม่สำเร็จ:", e)
+
+# ======================================================================
+# chromedriver path cache
+# ======================================================================
+def _cached_driver_path() -> str:
+    try:
+        with open(CHROMEDRIVER_CACHE, "r", encoding="utf-8") as f:
+            path = (json.load(f) or {}).get("path", "")
+    except Exception:
+        return ""
+    return path if path and os.access(path, os.X_OK) else ""
+
+def _save_driver_path(path: str) -> None:
+    try:
+        os.makedirs(os.path.dirname(CHROMEDRIVER_CACHE), exist_ok=True)
+        with open(CHROMEDRIVER_CACHE, "w", encoding="utf-8") as f:
+            json.dump({"path": path}, f)
+    except Exception:
+        pass
+
+def forget_driver_path() -> None:
+    try:
+        os.remove(CHROMEDRIVER_CACHE)
+    except OSError:
+        pass
+
+def _resolve_driver_path_uncached() -> str:
+    path = shutil.which("chromedriver") or ""
+    if path:
+        return path
+    try:  # selenium >= 4.11
+        from selenium.webdriver.common.selenium_manager import SeleniumManager
+        sm = SeleniumManager()
+        if hasattr(sm, "binary_paths"):
+            return sm.binary_paths(["--browser", "chrome"]).get("driver_path", "")
+        return sm.driver_location(Options())
+    except Exception:
+        pass
+    try:
+        from webdriver_manager.chrome import ChromeDriverManager
+        return ChromeDriverManager().install()
+    except Exception:
+        return ""
+
+def resolve_driver_path() -> str:
+    """CHROMEDRIVER_PATH > cache > PATH/Selenium Manager/webdriver-manager (แล้ว cache ผลไว้)"""
+    path = os.getenv("CHROMEDRIVER_PATH", "") or _cached_driver_path()
+    if path:
+        return path
+    path = _resolve_driver_path_uncached()
+    if path:
+        _save_driver_path(path)
+    return path
+
+def chromedriver_service() -> Optional[Service]:
+    path = resolve_driver_path()
+    return Service(executable_path=path) if path else None
+
+# ======================================================================
+# launch
+# ======================================================================
+def _launch(opt: Options, service=None) -> webdriver.Chrome:
+    if service is not None:
+        return webdriver.Chrome(service=service, options=opt)
+    svc = chromedriver_service()
+    if svc is None:
+        return webdriver.Chrome(options=opt)
+    try:
+        return webdriver.Chrome(service=svc, options=opt)
+    except Exception:
+        # path ใน cache อาจเก่า (Chrome อัปเดต) -> ล้าง cache แล้วให้ Selenium Manager หาใหม่
+        forget_driver_path()
+        return webdriver.Chrome(options=opt)
+
+def _configure(drv, lean: bool, allow: Iterable[str], block_extra: Iterable[str],
+               page_load_timeout: Optional[int], script_timeout: Optional[int]) -> None:
+    if page_load_timeout:
+        drv.set_page_load_timeout(page_load_timeout)
+    if script_timeout:
+        drv.set_script_timeout(script_timeout)
+    if lean:
+        apply_blocking(drv, allow, block_extra)
+
+def make_chrome(headless: bool = True, lean: bool = LEAN_BROWSER, allow: Iterable[str] = (),
+                block_extra: Iterable[str] = (), user_agent: Optional[str] = DEFAULT_UA,
+                window_size: Optional[str] = "1920,1080", page_load_strategy: Optional[str] = None,
+                page_load_timeout: Optional[int] = None, script_timeout: Optional[int] = None,
+                extra_args: Sequence[str] = (), service=None) -> webdriver.Chrome:
+    if _BROKER is not None and service is None:
+        return _BROKER.acquire(headless=headless, lean=lean, allow=allow, block_extra=block_extra,
+                               user_agent=user_agent, window_size=window_size,
+                               page_load_strategy=page_load_strategy, page_load_timeout=page_load_timeout,
+                               script_timeout=script_timeout, extra_args=extra_args)
+    opt = build_options(headless, lean, user_agent, window_size, page_load_strategy, extra_args)
+    drv = _launch(opt, service)
+    metrics.instrument(drv)
+    _configure(drv, lean, allow, block_extra, page_load_timeout, script_timeout)
+    return drv
+
+# ======================================================================
+# SESSION BROKER
+# ======================================================================
+class BrokeredDriver:
+    """ตัวแทน WebDriver ที่ quit() แล้วปิดแค่ tab ของตัวเองแล้วคืน browser เข้า pool (ไม่ปิด Chrome)"""
+
+    def __init__(self, broker: "SessionBroker", key: tuple, driver: webdriver.Chrome):
+        self._broker = broker
+        self._key = key
+        self._driver = driver
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+    def quit(self) -> None:
+        if self._driver is not None:
+            self._broker.release(self._key, self._driver)
+            self._driver = None
+
+class SessionBroker:
+    """
+    pool ของ Chrome ที่ใช้ร่วมกันหลาย scraper ใน process เดียว
+    - browser แยกตามทุกค่าที่กำหนดตอนเปิด (headless, page_load_strategy, lean, allow, extra_args)
+      เพราะเปลี่ยนหลังเปิดไม่ได้ -> ผู้เรียกไม่ได้ browser ที่เปิดด้วย option คนละชุดกับที่ขอ
+    - release ปิด tab ของผู้เรียก (เปิด tab เปล่าแทน) + ล้าง cookie/blocking ก่อนคืนเข้า pool
+    - acquire ตั้ง UA/timeout/blocking ตามที่ผู้เรียกขอบน tab นั้น
+    - max_browsers จำกัดจำนวน Chrome ที่ค้างไว้ใน pool (ตัวเกินจะถูกปิดตอน release)
+    """
+
+    def __init__(self, max_browsers: int = 4):
+        self.max_browsers = max_browsers
+        self._idle: Dict[tuple, List[webdriver.Chrome]] = {}
+        self._all: List[webdriver.Chrome] = []
+        self._lock = threading.Lock()
+
+    def acquire(self, headless: bool = True, lean: bool = LEAN_BROWSER, allow: Iterable[str] = (),
+                block_extra: Iterable[str] = (), user_agent: Optional[str] = DEFAULT_UA,
+                window_size: Optional[str] = "1920,1080", page_load_strategy: Optional[str] = None,
+                page_load_timeout: Optional[int] = None, script_timeout: Optional[int] = None,
+                extra_args: Sequence[str] = ()) -> BrokeredDriver:
+        key = self._pool_key(headless, lean, allow, page_load_strategy, extra_args)
+        with self._lock:
+            idle = self._idle.get(key) or []
+            drv = idle.pop() if idle else None
+        if drv is None:
+            opt = build_options(headless, lean, None, window_size, page_load_strategy, extra_args)
+            drv = _launch(opt)
+            metrics.instrument(drv)
+            with self._lock:
+                self._all.append(drv)
+
+        if user_agent:
+            try:
+                drv.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": user_agent})
+            except Exception:
+                pass
+        if window_size:
+            try:
+                w, h = (int(x) for x in window_size.split(","))
+                drv.set_window_size(w, h)
+            except Exception:
+                pass
+        _configure(drv, lean, allow, block_extra, page_load_timeout, script_timeout)
+        return BrokeredDriver(self, key, drv)
+
+    @staticmethod
+    def _pool_key(headless: bool, lean: bool, allow: Iterable[str], page_load_strategy: Optional[str],
+                  extra_args: Sequence[str]) -> tuple:
+        return (bool(headless), page_load_strategy or "normal", bool(lean),
+                tuple(sorted(a for a in allow if a)), tuple(extra_args))
+
+    @staticmethod
+    def _fresh_tab(drv) -> None:
+        old = drv.window_handles
+        drv.switch_to.new_window("tab")
+        for h in old:
+            try:
+                drv.switch_to.window(h); drv.close()
+            except Exception:
+                pass
+        drv.switch_to.window(drv.window_handles[-1])
+        try:
+            drv.delete_all_cookies()
+            drv.execute_cdp_cmd("Network.setBlockedURLs", {"urls": []})
+        except Exception:
+            pass
+
+    def release(self, key: tuple, drv) -> None:
+        try:
+            self._fresh_tab(drv)
+        except Exception:
+            # browser ตาย/ค้าง -> ไม่คืนเข้า pool
+            with self._lock:
+                if drv in self._all:
+                    self._all.remove(drv)
+            try:
+                drv.quit()
+            except Exception:
+                pass
+            return
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            keep = sum(len(v) for v in self._idle.values()) < self.max_browsers
+            if keep:
+                idle.append(drv)
+            else:
+                self._all.remove(drv)
+        if not keep:
+            try:
+                drv.quit()
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        with self._lock:
+            drivers, self._all, self._idle = self._all, [], {}
+        for drv in drivers:
+            try:
+                drv.quit()
+            except Exception:
+                pass
+
+_BROKER: Optional[SessionBroker] = None
+
+@contextmanager
+def use_broker(max_browsers: int = 4):
+    """ระหว่างอยู่ใน with ทุก make_chrome() จะได้ tab จาก broker แทนการเปิด Chrome ใหม่"""
+    global _BROKER
+    prev, _BROKER = _BROKER, SessionBroker(max_browsers)
+    try:
+        yield _BROKER
+    finally:
+        broker, _BROKER = _BROKER, prev
+        broker.close()
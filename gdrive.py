@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+ชั้นอัปโหลด Google Drive ที่ทุกสคริปต์ใช้ร่วมกัน
+
+- จำ sha1 ของเนื้อไฟล์ต่อ fileId ปลายทางไว้ใน DRIVE_UPLOAD_STATE -> ไฟล์ไม่เปลี่ยน = ไม่อัปโหลด
+- ไฟล์เล็กอัปโหลดครั้งเดียว (simple upload); ไฟล์ใหญ่ใช้ resumable โดย chunk size ตามขนาดไฟล์
+- ปลายทางที่ผู้ใช้ไฟล์รับ .gz ได้ (DRIVE_GZIP_FILE_IDS=id1,id2) จะอัปโหลดแบบ gzip
+- get_service(): Drive client ต่อ process (credentials/token + HTTP connection เดียวใช้ซ้ำ)
+- read_csv_chunks(): ดาวน์โหลด CSV แบบ stream แล้ว parse ทีละก้อน (ไม่ถือ bytes/str ทั้งไฟล์)
+"""
+from __future__ import annotations
+
+import io, os, json, gzip, shutil, hashlib, tempfile, threading
+from datetime import datetime
+from typing import Iterator, Optional, Tuple
+
+# ======================================================================
+# CONFIG
+# ======================================================================
+STATE_PATH: str = os.getenv("DRIVE_UPLOAD_STATE", "drive_upload_state.json")
+GZIP_FILE_IDS = {x.strip() for x in os.getenv("DRIVE_GZIP_FILE_IDS", "").split(",") if x.strip()}
+DRIVE_SCOPES = ("https://www.googleapis.com/auth/drive",)
+HTTP_TIMEOUT: int = int(os.getenv("DRIVE_HTTP_TIMEOUT", "120"))
+CSV_MIMETYPE = "text/csv"
+GZIP_MIMETYPE = "application/gzip"
+
+_CHUNK_UNIT = 256 * 1024                 # Drive กำหนดให้ chunk เป็นพหุคูณของ 256 KiB
+SIMPLE_UPLOAD_MAX = 5 * 1024 * 1024      # เล็กกว่านี้ไม่ต้อง resumable (ประหยัด 1 round-trip)
+MIN_CHUNK = 1024 * 1024
+MAX_CHUNK = 64 * 1024 * 1024
+DOWNLOAD_CHUNK: int = int(os.getenv("DRIVE_DOWNLOAD_CHUNK", str(8 * 1024 * 1024)))
+CSV_CHUNK_ROWS: int = int(os.getenv("DRIVE_CSV_CHUNK_ROWS", "100000"))
+
+# ======================================================================
+# SERVICE (cache ต่อ process)
+# ======================================================================
+_services: dict = {}
+_services_lock = threading.Lock()
+
+def build_http(timeout: int = HTTP_TIMEOUT):
+    """httplib2.Http ที่ไม่ตาม 308 (resumable upload ใช้ 308 = "รับ chunk แล้ว ส่งต่อ" ไม่ใช่ redirect)"""
+    import httplib2
+    http = httplib2.Http(timeout=timeout)
+    http.redirect_codes = http.redirect_codes - {308}
+    return http
+
+def get_service(service_account_file: str, scopes: tuple = DRIVE_SCOPES):
+    """
+    สร้าง Drive client ครั้งเดียวต่อ (ไฟล์ service account, scopes) แล้วใช้ซ้ำทั้ง process
+    token ถูก refresh อัตโนมัติเมื่อหมดอายุ และ httplib2.Http ตัวเดียวคง TLS connection ไว้
+    (client ไม่ thread-safe: ใช้จาก thread หลักเท่านั้น)
+    """
+    key = (os.path.abspath(str(service_account_file)), tuple(scopes))
+    with _services_lock:
+        svc = _services.get(key)
+        if svc is None:
+            from google.oauth2.service_account import Credentials
+            from google_auth_httplib2 import AuthorizedHttp
+            from googleapiclient.discovery import build
+            creds = Credentials.from_service_account_file(key[0], scopes=list(scopes))
+            http = AuthorizedHttp(creds, http=build_http())
+            svc = _services[key] = build("drive", "v3", http=http, cache_discovery=False)
+        return svc
+
+# reason ของ 403 ที่แปลว่าไม่มีสิทธิ์จริง (403 อื่น เช่น rateLimitExceeded = ให้ retry/raise ตามปกติ)
+NO_ACCESS_REASONS = {"forbidden", "notFound", "insufficientFilePermissions", "insufficientPermissions",
+                     "appNotAuthorizedToFile", "cannotModifyFile"}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "dailyLimitExceeded",
+                      "sharingRateLimitExceeded", "quotaExceeded"}
+
+def error_reasons(err) -> set:
+    """reason ทั้งหมดของ HttpError: จาก error_details ของ client หรือ body JSON {"error": {"errors": [...]}}"""
+    reasons = set()
+    details = getattr(err, "error_details", None)
+    if isinstance(details, list):
+        reasons |= {d.get("reason") for d in details if isinstance(d, dict)}
+    try:
+        content = getattr(err, "content", b"") or b""
+        payload = json.loads(content.decode("utf-8") if isinstance(content, bytes) else content)
+        error = payload.get("error") or {}
+        reasons |= {d.get("reason") for d in error.get("errors") or [] if isinstance(d, dict)}
+    except (ValueError, AttributeError, UnicodeDecodeError):
+        pass
+    reasons.discard(None)
+    return reasons
+
+def is_no_access(err) -> bool:
+    """
+    HttpError ที่แปลว่า service account ไม่มีสิทธิ์หรือไม่พบไฟล์ (ใช้แทนการ files().get ตรวจก่อน)
+    404 = เสมอ ; 403 = เฉพาะ reason แบบ forbidden/notFound (403 จาก rate limit/quota ไม่นับ)
+    """
+    status = getattr(getattr(err, "resp", None), "status", None)
+    if status == 404:
+        return True
+    if status != 403:
+        return False
+    reasons = error_reasons(err)
+    return not (reasons & RATE_LIMIT_REASONS) and bool(reasons & NO_ACCESS_REASONS)
+
+# ======================================================================
+# CONTENT HASH STATE
+# ======================================================================
+def file_sha1(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def load_state() -> dict:
+    try:
+        with open(STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f) or {}
+    except Exception:
+        return {}
+
+def _remember(file_id: str, sha1: str, size: int, gzipped: bool) -> None:
+    state = load_state()
+    state[file_id] = {"sha1": sha1, "size": size, "gzip": gzipped,
+                      "uploaded_at": datetime.now().isoformat(timespec="seconds")}
+    tmp = STATE_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, STATE_PATH)
+
+def is_unchanged(local_path: str, file_id: Optional[str], sha1: Optional[str] = None) -> bool:
+    if not file_id or not os.path.exists(local_path):
+        return False
+    entry = load_state().get(file_id) or {}
+    return entry.get("sha1") == (sha1 or file_sha1(local_path))
+
+# ======================================================================
+# MEDIA
+# ======================================================================
+def chunk_size_for(size: int) -> int:
+    """ประมาณ 8 chunk ต่อไฟล์ อยู่ในช่วง 1–64 MiB และปัดเป็นพหุคูณของ 256 KiB"""
+    target = min(max(size // 8, MIN_CHUNK), MAX_CHUNK)
+    return max(_CHUNK_UNIT, (target // _CHUNK_UNIT) * _CHUNK_UNIT)
+
+def _gzip_copy(local_path: str) -> str:
+    fd, out = tempfile.mkstemp(suffix=".gz")
+    with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as gz, \
+            open(local_path, "rb") as src:
+        shutil.copyfileobj(src, gz, 1024 * 1024)
+    return out
+
+def _media(path: str, mimetype: str):
+    from googleapiclient.http import MediaFileUpload
+    size = os.path.getsize(path)
+    if size <= SIMPLE_UPLOAD_MAX:
+        return MediaFileUpload(path, mimetype=mimetype, resumable=False)
+    return MediaFileUpload(path, mimetype=mimetype, resumable=True, chunksize=chunk_size_for(size))
+
+def _execute(request, media, retries: int) -> dict:
+    if not media.resumable():
+        return request.execute(num_retries=retries)
+    response = None
+    while response is None:
+        _, response = request.next_chunk(num_retries=retries)
+    return response
+
+# ======================================================================
+# UPLOAD
+# ======================================================================
+def upload(service, local_path: str, file_id: Optional[str] = None, folder_id: Optional[str] = None,
+           name: Optional[str] = None, mimetype: str = CSV_MIMETYPE, compress: Optional[bool] = None,
+           force: bool = False, retries: int = 3) -> Tuple[str, str]:
+    """
+    อัปเดต file_id (ถ้ามี) ไม่งั้นสร้างไฟล์ใหม่ใน folder_id; คืน (action, fileId)
+    action = "skip" (เนื้อไฟล์เท่ากับที่อัปโหลดล่าสุด) | "update" | "create"
+    compress=None -> gzip เฉพาะ fileId ที่อยู่ใน DRIVE_GZIP_FILE_IDS
+    """
+    if not os.path.exists(local_path):
+        raise FileNotFoundError(f"ไม่พบไฟล์ที่จะอัปโหลด: {local_path}")
+    sha1 = file_sha1(local_path)
+    if file_id and not force and is_unchanged(local_path, file_id, sha1):
+        return "skip", file_id
+
+    if compress is None:
+        compress = bool(file_id) and file_id in GZIP_FILE_IDS
+    path, mime = (_gzip_copy(local_path), GZIP_MIMETYPE) if compress else (local_path, mimetype)
+    try:
+        media = _media(path, mime)
+        if file_id:
+            req = service.files().update(fileId=file_id, media_body=media, fields="id",
+                                         supportsAllDrives=True)
+            action = "update"
+        else:
+            if not folder_id:
+                raise ValueError("ต้องระบุ file_id หรือ folder_id")
+            target = name or os.path.basename(local_path)
+            body = {"name": target + (".gz" if compress else ""), "parents": [folder_id]}
+            req = service.files().create(body=body, media_body=media, fields="id",
+                                         supportsAllDrives=True)
+            action = "create"
+        new_id = _execute(req, media, retries)["id"]
+    finally:
+        if compress:
+            os.remove(path)
+    _remember(new_id, sha1, os.path.getsize(local_path), compress)
+    return action, new_id
+
+# ======================================================================
+# STREAMING DOWNLOAD
+# ======================================================================
+class _DownloadStream(io.RawIOBase):
+    """file-like แบบอ่านอย่างเดียว: ดึงทีละ chunk จาก MediaIoBaseDownload เมื่อผู้อ่านต้องการ"""
+
+    def __init__(self, service, file_id: str, chunksize: int, retries: int = 3):
+        from googleapiclient.http import MediaIoBaseDownload
+        self._buf = io.BytesIO()
+        req = service.files().get_media(fileId=file_id, supportsAllDrives=True)
+        self._dl = MediaIoBaseDownload(self._buf, req, chunksize=chunksize)
+        self._retries = retries
+        self._pending = memoryview(b"")
+        self._done = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not len(self._pending) and not self._done:
+            _, self._done = self._dl.next_chunk(num_retries=self._retries)
+            self._pending = memoryview(self._buf.getvalue())
+            self._buf.seek(0)
+            self._buf.truncate()
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+def open_download(service, file_id: str, chunksize: Optional[int] = None) -> io.BufferedReader:
+    raw = _DownloadStream(service, file_id, chunksize or DOWNLOAD_CHUNK)
+    return io.BufferedReader(raw, buffer_size=1024 * 1024)
+
+def read_csv_chunks(service, file_id: str, rows: int = CSV_CHUNK_ROWS, **read_csv_kwargs) -> Iterator:
+    """
+    yield DataFrame ทีละ rows แถว ขณะที่ไฟล์ยังดาวน์โหลดอยู่
+    decode แบบ incremental (utf-8-sig ตัด BOM ให้) ; ไฟล์ว่าง = ไม่ yield อะไร
+    """
+    import pandas as pd
+    read_csv_kwargs.setdefault("encoding", "utf-8-sig")
+    read_csv_kwargs.setdefault("encoding_errors", "replace")
+    stream = open_download(service, file_id)
+    try:
+        try:
+            reader = pd.read_csv(stream, chunksize=rows, **read_csv_kwargs)
+        except pd.errors.EmptyDataError:
+            return
+        with reader:
+            yield from reader
+    finally:
+        stream.close()  # pandas ไม่ปิด handle ที่ผู้เรียกส่งเข้าไป
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+append-merge แบบ incremental: เก็บ hash ของ key ที่เคยเห็นไว้ข้างไฟล์ CSV
+แล้วต่อท้ายเฉพาะแถวที่ใหม่จริง ๆ (I/O ต่อรอบขึ้นกับจำนวนแถวใหม่ ไม่ใช่ประวัติทั้งหมด)
+
+- <csv>.keyidx      : uint64 ของ key เรียงลำดับ (เปิดแบบ memmap, เช็ค membership ด้วย binary search)
+- <csv>.keyidx.tail : key ที่เพิ่มหลัง compact (append-only, โหลดเป็น set) ถูก merge เข้าไฟล์หลักเมื่อเกิน TAIL_MAX
+- <csv>.rowidx      : hash ของทั้งแถว (รูปแบบเดียวกับ keyidx) ใช้แยก "แถวซ้ำเดิม" ออกจาก "ค่าที่ถูกแก้"
+- <csv>.state.json  : เวลาที่ compact ล่าสุด
+หน่วยความจำ ~ขนาด tail ไม่ใช่ทั้งประวัติ; ทุก merge (scrap2, scrap3_2, TMD.yml) ใช้ key_hashes เดียวกัน
+compact = เขียนไฟล์รวมใหม่ทั้งก้อน + สร้าง index ใหม่ ทำเป็นรอบ ๆ (COMPACT_EVERY_DAYS)
+หรือเมื่อไฟล์/index หาย
+ค่าใหม่ชนะค่าเก่าเสมอ (เหมือน drop_duplicates keep="last" เดิม): key เดิมที่ค่าเปลี่ยน (เว็บแก้ค่าย้อนหลัง)
+ทำให้รอบนั้นเขียนไฟล์ใหม่ทั้งก้อน ; key เดิมที่ค่าเหมือนเดิมถูกข้าม
+"""
+from __future__ import annotations
+
+import os, json
+from array import array
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from schema import Schema, apply_schema, csv_date_format
+
+COMPACT_EVERY_DAYS: int = int(os.getenv("COMPACT_EVERY_DAYS", "7"))
+TAIL_MAX: int = int(os.getenv("KEYIDX_TAIL_MAX", "200000"))
+
+# ---------- key hashing ----------
+def key_hashes(df: pd.DataFrame, key_cols: Sequence[str]) -> pd.Series:
+    """hash 64 บิตต่อแถวจากคอลัมน์ key (แปลงเป็น str ก่อน ให้ค่าจาก CSV กับค่าที่ scrape ได้ตรงกัน)"""
+    cols = [c for c in key_cols if c in df.columns] or list(df.columns)
+    keys = df[cols].astype("string").fillna("").astype(object)
+    return pd.util.hash_pandas_object(keys, index=False)
+
+def dedupe(df: pd.DataFrame, key_cols: Sequence[str] = ()) -> pd.DataFrame:
+    """ลบแถวซ้ำตาม hash ของ key_cols (ว่าง = ทุกคอลัมน์) เก็บตัวสุดท้าย แทน drop_duplicates"""
+    return df[~key_hashes(df, key_cols).duplicated(keep="last").values]
+
+# ---------- index ----------
+class KeyIndex:
+    """ชุด hash 64 บิตบนดิสก์: ไฟล์หลักเรียงแล้ว (memmap) + tail ที่ยังไม่เรียง (set ในหน่วยความจำ)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._main = np.empty(0, dtype=np.uint64)
+        self._tail: set[int] = set()
+
+    @property
+    def tail_path(self) -> str:
+        return f"{self.path}.tail"
+
+    @classmethod
+    def load(cls, path: str) -> "KeyIndex":
+        idx = cls(path)
+        if os.path.exists(path) and os.path.getsize(path) >= 8:
+            idx._main = np.memmap(path, dtype=np.uint64, mode="r")
+        if os.path.exists(idx.tail_path):
+            arr = array("Q")
+            with open(idx.tail_path, "rb") as f:
+                arr.frombytes(f.read())
+            idx._tail = set(arr)
+        return idx
+
+    def contains(self, hashes) -> np.ndarray:
+        """membership แบบ vectorized: binary search ในไฟล์หลัก + lookup ใน tail"""
+        h = np.asarray(hashes, dtype=np.uint64)
+        hit = np.zeros(len(h), dtype=bool)
+        if len(self._main):
+            pos = np.searchsorted(self._main, h)
+            ok = pos < len(self._main)
+            hit[ok] = self._main[pos[ok]] == h[ok]
+        if self._tail:
+            hit |= np.fromiter((int(x) in self._tail for x in h), dtype=bool, count=len(h))
+        return hit
+
+    def __contains__(self, h: int) -> bool:
+        return bool(self.contains([h])[0])
+
+    def __len__(self) -> int:
+        return len(self._main) + len(self._tail)
+
+    def add(self, hashes: Iterable[int]) -> None:
+        h = np.unique(np.asarray(list(hashes), dtype=np.uint64))
+        new = h[~self.contains(h)]
+        if not len(new):
+            return
+        self._tail.update(int(x) for x in new)
+        with open(self.tail_path, "ab") as f:
+            f.write(new.tobytes())
+        if len(self._tail) > TAIL_MAX:
+            self._merge_tail()
+
+    def close(self) -> None:
+        """ปล่อย memmap ของไฟล์หลัก (ต้องเรียกก่อนเขียนทับ/ลบไฟล์ index นี้จาก object อื่น)"""
+        main, self._main = self._main, np.empty(0, dtype=np.uint64)
+        mm = getattr(main, "_mmap", None)
+        if mm is not None:
+            try:
+                mm.close()
+            except (BufferError, ValueError):
+                pass  # ยังมี view อื่นอ้างถึงอยู่: ปล่อยให้ GC ปิดเมื่อ view หมด
+
+    def rebuild(self, hashes: Iterable[int]) -> None:
+        arr = hashes if isinstance(hashes, (np.ndarray, pd.Series)) else list(hashes)
+        self._write_main(np.unique(np.asarray(arr, dtype=np.uint64)))
+
+    def _merge_tail(self) -> None:
+        tail = np.fromiter(self._tail, dtype=np.uint64, count=len(self._tail))
+        self._write_main(np.union1d(np.asarray(self._main), tail))
+
+    def _write_main(self, sorted_keys: np.ndarray) -> None:
+        self.close()  # ปล่อย memmap ก่อนเขียนทับ
+        tmp = f"{self.path}.tmp"
+        sorted_keys.astype(np.uint64).tofile(tmp)
+        os.replace(tmp, self.path)
+        if os.path.exists(self.tail_path):
+            os.remove(self.tail_path)
+        self._tail = set()
+        self._main = np.memmap(self.path, dtype=np.uint64, mode="r") if len(sorted_keys) else sorted_keys
+
+# ---------- state ----------
+def _state_path(csv_path: str) -> str:
+    return f"{csv_path}.state.json"
+
+def _index_path(csv_path: str) -> str:
+    return f"{csv_path}.keyidx"
+
+def _row_index_path(csv_path: str) -> str:
+    return f"{csv_path}.rowidx"
+
+def row_hashes(df: pd.DataFrame, columns: Sequence[str]) -> pd.Series:
+    """hash ของทั้งแถวตามลำดับคอลัมน์ของไฟล์ (คอลัมน์ที่ไม่มี = ค่าว่าง)"""
+    return key_hashes(df.reindex(columns=list(columns)), list(columns))
+
+def needs_compaction(csv_path: str, every_days: int = COMPACT_EVERY_DAYS) -> bool:
+    if os.getenv("FORCE_COMPACT", "false").lower() == "true":
+        return True
+    if not os.path.exists(csv_path) or not os.path.exists(_index_path(csv_path)) \
+            or not os.path.exists(_row_index_path(csv_path)):
+        return True
+    try:
+        with open(_state_path(csv_path), "r", encoding="utf-8") as f:
+            last = datetime.fromisoformat(json.load(f)["last_compaction"])
+    except Exception:
+        return True
+    return datetime.now() - last >= timedelta(days=every_days)
+
+def _mark_compacted(csv_path: str, rows: int) -> None:
+    with open(_state_path(csv_path), "w", encoding="utf-8") as f:
+        json.dump({"last_compaction": datetime.now().isoformat(timespec="seconds"), "rows": rows}, f)
+
+# ---------- merge ----------
+def append_new_rows(df_new: pd.DataFrame, key_cols: Sequence[str], csv_path: str,
+                    schema: Optional[Schema] = None) -> tuple[int, int]:
+    """
+    ต่อท้ายเฉพาะแถวที่ key ยังไม่เคยมีใน csv_path; คืน (แถวที่เพิ่ม/แก้, จำนวน key ทั้งหมด)
+    key เดิมที่ค่าเปลี่ยน -> เขียนไฟล์ใหม่ทั้งก้อนโดยให้ค่าใหม่ชนะ (keep="last")
+    เรียกซ้ำด้วยข้อมูลเดิมได้ (idempotent) เพราะแถวที่เหมือนเดิมทุกค่าจะถูกข้าม
+    schema: ถ้า df_new ผ่าน apply_schema มาแล้ว ให้ส่ง schema เดียวกัน (ใช้ตอนอ่านไฟล์เดิม/เขียนวันที่)
+    """
+    index = KeyIndex.load(_index_path(csv_path))
+    hashes = key_hashes(df_new, key_cols)
+    # แถวซ้ำภายใน df_new เอง: เก็บตัวสุดท้าย (เหมือน drop_duplicates keep="last")
+    last = ~hashes.duplicated(keep="last")
+    seen = pd.Series(index.contains(hashes.values), index=hashes.index, dtype=bool)
+    fresh = last & ~seen
+
+    exists = os.path.exists(csv_path) and os.path.getsize(csv_path) > 0
+    header = list(pd.read_csv(csv_path, nrows=0, encoding="utf-8-sig").columns) if exists else list(df_new.columns)
+    extra = [c for c in df_new.columns if c not in header]
+
+    # key เดิม: ค่าเหมือนเดิมทุกคอลัมน์ = ซ้ำจริง ; ไม่เหมือน = ค่าถูกแก้ (ต้องแทนแถวเก่า)
+    changed = pd.Series(False, index=hashes.index)
+    if (last & seen).any():
+        rows = KeyIndex.load(_row_index_path(csv_path))
+        old = (last & seen).values
+        changed[old] = ~rows.contains(row_hashes(df_new[old], header).values)
+        rows.close()
+    if not fresh.any() and not changed.any():
+        return 0, len(index)
+
+    if extra or changed.any():
+        # มีคอลัมน์ใหม่ (ต้องเขียนหัวไฟล์ใหม่) หรือค่าถูกแก้ -> ทำแบบเต็มก้อนรอบนี้ ค่าใหม่ชนะ
+        index.close()  # ปล่อย memmap ก่อน compact เขียนทับไฟล์ index (Windows ล็อกไฟล์ที่ map อยู่)
+        if exists:
+            df_old = pd.read_csv(csv_path, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+            if schema:
+                df_old = apply_schema(df_old, schema)
+            df_all = pd.concat([df_old, df_new], ignore_index=True)
+        else:
+            df_all = df_new
+        compact(df_all, key_cols, csv_path, schema)
+        return int(fresh.sum() + changed.sum()), len(KeyIndex.load(_index_path(csv_path)))
+
+    df_add = df_new[fresh.values].reindex(columns=header)
+    os.makedirs(os.path.dirname(os.path.abspath(csv_path)), exist_ok=True)
+    df_add.to_csv(csv_path, mode="a", index=False, header=not exists,
+                  encoding="utf-8" if exists else "utf-8-sig",
+                  date_format=csv_date_format(schema) if schema else None)
+    index.add(hashes[fresh.values])
+    KeyIndex.load(_row_index_path(csv_path)).add(row_hashes(df_add, header))
+    return len(df_add), len(index)
+
+def compact(df_all: pd.DataFrame, key_cols: Sequence[str], csv_path: str,
+            schema: Optional[Schema] = None) -> int:
+    """เขียนไฟล์รวมใหม่ทั้งก้อน (dedupe ตาม key, keep last) และสร้าง index ใหม่"""
+    hashes = key_hashes(df_all, key_cols)
+    keep = ~hashes.duplicated(keep="last")
+    df_out = df_all[keep.values]
+    os.makedirs(os.path.dirname(os.path.abspath(csv_path)), exist_ok=True)
+    df_out.to_csv(csv_path, index=False, encoding="utf-8-sig",
+                  date_format=csv_date_format(schema) if schema else None)
+    KeyIndex(_index_path(csv_path)).rebuild(hashes[keep.values])
+    KeyIndex(_row_index_path(csv_path)).rebuild(row_hashes(df_out, list(df_out.columns)))
+    if os.path.exists(f"{csv_path}.keys"):  # index รูปแบบเดิม (unsorted) ไม่ใช้แล้ว
+        os.remove(f"{csv_path}.keys")
+    _mark_compacted(csv_path, len(df_out))
+    return len(df_out)
+
+def compact_chunks(chunks: Iterable[pd.DataFrame], key_cols: Sequence[str], csv_path: str,
+                   schema: Optional[Schema] = None, rows: int = 100000) -> int:
+    """
+    compact แบบ stream (ผลเหมือน compact(pd.concat(chunks))): ไม่ถือประวัติทั้งก้อนในหน่วยความจำ
+    รอบ 1: เขียนแต่ละก้อนลงไฟล์ชั่วคราว เก็บไว้แค่ hash ของ key/แถว (16 ไบต์ต่อแถว)
+    รอบ 2: อ่านไฟล์ชั่วคราวเป็นข้อความทีละ rows แถว เขียนเฉพาะแถวสุดท้ายของแต่ละ key
+    คอลัมน์ตามก้อนแรก ; ไม่มีก้อนเลย = ไม่แตะไฟล์เดิม (คืน 0)
+    """
+    staged, out_tmp = f"{csv_path}.stage.tmp", f"{csv_path}.tmp"
+    date_format = csv_date_format(schema) if schema else None
+    keys, whole, columns = [], [], None
+    try:
+        for chunk in chunks:
+            if columns is None:
+                columns = list(chunk.columns)
+            chunk = chunk.reindex(columns=columns)
+            keys.append(key_hashes(chunk, key_cols).to_numpy())
+            whole.append(row_hashes(chunk, columns).to_numpy())
+            chunk.to_csv(staged, mode="a" if len(keys) > 1 else "w", header=len(keys) == 1, index=False,
+                         encoding="utf-8", date_format=date_format)
+        if columns is None:
+            return 0
+        key_arr = np.concatenate(keys)
+        keep = ~pd.Series(key_arr).duplicated(keep="last").to_numpy()
+        del keys
+
+        os.makedirs(os.path.dirname(os.path.abspath(csv_path)), exist_ok=True)
+        pd.DataFrame(columns=columns).to_csv(out_tmp, index=False, encoding="utf-8-sig")
+        offset = 0
+        with pd.read_csv(staged, dtype=str, keep_default_na=False, encoding="utf-8", chunksize=rows) as reader:
+            for part in reader:
+                mask = keep[offset:offset + len(part)]
+                offset += len(part)
+                part[mask].to_csv(out_tmp, mode="a", header=False, index=False, encoding="utf-8")
+        os.replace(out_tmp, csv_path)
+    finally:
+        for p in (staged, out_tmp):
+            if os.path.exists(p):
+                os.remove(p)
+
+    KeyIndex(_index_path(csv_path)).rebuild(key_arr[keep])
+    KeyIndex(_row_index_path(csv_path)).rebuild(np.concatenate(whole)[keep])
+    if os.path.exists(f"{csv_path}.keys"):
+        os.remove(f"{csv_path}.keys")
+    total = int(keep.sum())
+    _mark_compacted(csv_path, total)
+    return total
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+วัดเวลาในเส้นทางหลักของทุกสคริปต์: WebDriver command + ช่วงงาน (phase) -> JSON หนึ่งไฟล์ต่อรอบ
+
+- instrument(driver): ห่อ command_executor.execute ของ driver นับจำนวน/เวลาของทุก remote command
+  แยกตามชนิด (get, findElements, executeScript, ...) ; get_attribute/is_displayed ของ Selenium 4
+  วิ่งผ่าน executeScript (JS atom) จึงแยกเป็นชื่อของมันเอง (make_chrome เรียกให้อัตโนมัติ)
+- phase(name): วัดเวลาช่วงงานแบบซ้อนกันได้ ชื่อมาตรฐาน = PHASES ; command ที่เกิดในช่วงนั้นถูกนับแยกให้ด้วย
+- run(script): ครอบ main ของสคริปต์ แล้วเขียน METRICS_DIR/<script>_<YYYYmmdd-HHMMSS>.json ตอนจบ
+- disable(): ปิดการวัดระหว่าง process -> คืน method เดิมของ WebElement และ executor ที่ห่อไว้
+
+    METRICS_ENABLED=true   (ค่าเริ่มต้น) ; false = ไม่ห่อ driver และไม่เขียนไฟล์
+    METRICS_DIR=run_metrics
+"""
+from __future__ import annotations
+
+import os, json, time, threading, weakref
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+# ======================================================================
+# CONFIG
+# ======================================================================
+METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_DIR: str = os.getenv("METRICS_DIR", "run_metrics")
+
+PAGE_LOAD = "page_load"
+SELECTOR = "selector_resolve"
+EXTRACT = "extraction"
+PARSE = "parse"
+MERGE = "merge"
+UPLOAD = "upload"
+PHASES = (PAGE_LOAD, SELECTOR, EXTRACT, PARSE, MERGE, UPLOAD)
+
+_local = threading.local()   # phase stack + ชื่อ command ที่ถูก override ต่อ thread
+_wrapped = weakref.WeakSet()  # executor ที่ห่อ execute ไว้ (คืนของเดิมตอน disable)
+
+# ======================================================================
+# RUN STATE
+# ======================================================================
+class _Stat:
+    __slots__ = ("count", "secs", "max", "errors")
+
+    def __init__(self):
+        self.count, self.secs, self.max, self.errors = 0, 0.0, 0.0, 0
+
+    def add(self, secs: float, ok: bool = True) -> None:
+        self.count += 1
+        self.secs += secs
+        self.max = max(self.max, secs)
+        if not ok:
+            self.errors += 1
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "secs": round(self.secs, 3), "max_secs": round(self.max, 3),
+                "errors": self.errors}
+
+class Run:
+    def __init__(self, script: str):
+        self.script = script
+        self.started = datetime.now()
+        self.t0 = time.perf_counter()
+        self.commands: Dict[str, _Stat] = defaultdict(_Stat)
+        self.phases: Dict[str, _Stat] = defaultdict(_Stat)
+        self.phase_commands: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.counters: Dict[str, float] = defaultdict(float)
+        self.lock = threading.Lock()
+
+    def record_command(self, name: str, secs: float, ok: bool, phase: Optional[str]) -> None:
+        with self.lock:
+            self.commands[name].add(secs, ok)
+            if phase:
+                self.phase_commands[phase][name] += 1
+
+    def record_phase(self, name: str, secs: float, ok: bool) -> None:
+        with self.lock:
+            self.phases[name].add(secs, ok)
+
+    def report(self) -> dict:
+        with self.lock:
+            cmds = sorted(self.commands.items(), key=lambda kv: -kv[1].secs)
+            return {
+                "script": self.script,
+                "started_at": self.started.isoformat(timespec="seconds"),
+                "total_secs": round(time.perf_counter() - self.t0, 3),
+                "webdriver": {
+                    "count": sum(s.count for _, s in cmds),
+                    "secs": round(sum(s.secs for _, s in cmds), 3),
+                    "commands": {k: s.to_dict() for k, s in cmds},
+                },
+                "phases": {k: {**s.to_dict(), "webdriver_calls": dict(self.phase_commands.get(k, {}))}
+                           for k, s in self.phases.items()},
+                "counters": dict(self.counters),
+            }
+
+_run: Optional[Run] = None
+
+def current() -> Optional[Run]:
+    return _run
+
+def count(name: str, n: float = 1) -> None:
+    """ตัวนับอิสระ เช่น rows/pages ให้ไปอยู่ในรายงานเดียวกัน"""
+    r = _run
+    if r is not None:
+        with r.lock:
+            r.counters[name] += n
+
+def _phase_stack() -> list:
+    st = getattr(_local, "phases", None)
+    if st is None:
+        st = _local.phases = []
+    return st
+
+@contextmanager
+def phase(name: str):
+    """with metrics.phase(metrics.EXTRACT): ... ; ไม่มี run อยู่ = ไม่ทำอะไร"""
+    r = _run
+    if r is None:
+        yield
+        return
+    st = _phase_stack()
+    st.append(name)
+    t0, ok = time.perf_counter(), False
+    try:
+        yield
+        ok = True
+    finally:
+        st.pop()
+        r.record_phase(name, time.perf_counter() - t0, ok)
+
+# ======================================================================
+# WEBDRIVER
+# ======================================================================
+@contextmanager
+def _label(name: str):
+    prev = getattr(_local, "label", None)
+    _local.label = name
+    try:
+        yield
+    finally:
+        _local.label = prev
+
+_ATOMS = (("get_attribute", "getAttribute"), ("is_displayed", "isDisplayed"))
+
+def _web_element():
+    try:
+        from selenium.webdriver.remote.webelement import WebElement
+    except ImportError:
+        return None
+    return WebElement
+
+def _patch_atoms() -> None:
+    """get_attribute/is_displayed ส่ง executeScript ตัวเดียวกับ execute_script -> ติดป้ายชื่อจริงให้"""
+    WebElement = _web_element()
+    if WebElement is None or "_metrics_originals" in WebElement.__dict__:
+        return
+    originals = {}
+    for attr, name in _ATOMS:
+        orig = originals[attr] = getattr(WebElement, attr)
+
+        def wrapper(self, *a, _orig=orig, _name=name, **kw):
+            with _label(_name):
+                return _orig(self, *a, **kw)
+
+        setattr(WebElement, attr, wrapper)
+    WebElement._metrics_originals = originals
+
+def _unpatch_atoms() -> None:
+    WebElement = _web_element()
+    originals = WebElement.__dict__.get("_metrics_originals") if WebElement is not None else None
+    if not originals:
+        return
+    for attr, orig in originals.items():
+        setattr(WebElement, attr, orig)
+    del WebElement._metrics_originals
+
+def instrument(driver):
+    """ห่อ command executor ของ driver (เรียกซ้ำได้ ; BrokeredDriver ถูกห่อที่ตัวจริงข้างใน)"""
+    if not METRICS_ENABLED or driver is None:
+        return driver
+    target = getattr(driver, "_driver", None) or driver
+    executor = getattr(target, "command_executor", None)
+    if executor is None or getattr(executor, "_metrics_wrapped", False):
+        return driver
+    _patch_atoms()
+    orig = executor.execute
+
+    def execute(command, params):
+        r = _run
+        if r is None or not METRICS_ENABLED:
+            return orig(command, params)
+        name = getattr(_local, "label", None) or command
+        st = _phase_stack()
+        t0, ok = time.perf_counter(), False
+        try:
+            resp = orig(command, params)
+            ok = True
+            return resp
+        finally:
+            r.record_command(name, time.perf_counter() - t0, ok, st[-1] if st else None)
+
+    executor.execute = execute
+    executor._metrics_wrapped = True
+    executor._metrics_orig = orig
+    _wrapped.add(executor)
+    return driver
+
+def disable() -> None:
+    """ปิด metrics ทั้ง process: คืน WebElement.get_attribute/is_displayed และ execute เดิมของทุก executor"""
+    global METRICS_ENABLED
+    METRICS_ENABLED = False
+    _unpatch_atoms()
+    for executor in list(_wrapped):
+        executor.execute = executor._metrics_orig
+        del executor._metrics_orig, executor._metrics_wrapped
+    _wrapped.clear()
+
+# ======================================================================
+# RUN / REPORT
+# ======================================================================
+def write_report(run_: Run, out_dir: Optional[str] = None) -> Optional[str]:
+    rep = run_.report()
+    out_dir = out_dir or METRICS_DIR
+    try:
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, f"{run_.script}_{run_.started.strftime('%Y%m%d-%H%M%S')}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(rep, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        print(f"⚠️ เขียน metrics ไม่สำเร็จ: {e}")
+        return None
+    wd = rep["webdriver"]
+    top = ", ".join(f"{k}×{v['count']} {v['secs']}s" for k, v in list(wd["commands"].items())[:4])
+    phases = ", ".join(f"{k} {v['secs']}s" for k, v in rep["phases"].items())
+    print(f"📊 metrics {path} | WebDriver {wd['count']} calls {wd['secs']}s ({top}) | {phases}")
+    return path
+
+@contextmanager
+def run(script: str):
+    """ครอบ main(); ถ้ามี run ค้างอยู่แล้ว (เช่นสคริปต์เรียกกันเอง) จะใช้ run เดิม"""
+    global _run
+    if not METRICS_ENABLED or _run is not None:
+        yield _run
+        return
+    _run = Run(script)
+    try:
+        yield _run
+    finally:
+        r, _run = _run, None
+        write_report(r)
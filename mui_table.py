@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+อ่านตาราง MUI (nationalthaiwater) ทั้งหน้าในการเรียก execute_script ครั้งเดียว
+
+เดิมต้องเรียก row.find_elements("td") + c.text ทีละเซลล์ (หลายพัน round-trip ต่อหน้า)
+"""
+from __future__ import annotations
+
+ROW_SELECTOR = ".MuiTable-root tbody tr"
+
+_READ_ROWS_JS = """
+const rows = document.querySelectorAll(arguments[0]);
+const out = new Array(rows.length);
+for (let i = 0; i < rows.length; i++) {
+  const tds = rows[i].querySelectorAll('td');
+  const cols = new Array(tds.length);
+  for (let j = 0; j < tds.length; j++) {
+    cols[j] = (tds[j].innerText || tds[j].textContent || '').trim();
+  }
+  out[i] = cols;
+}
+return out;
+"""
+
+def read_mui_table(driver, row_selector: str = ROW_SELECTOR) -> list[list[str]]:
+    """คืนค่า tbody ทั้งหมดเป็น list 2 มิติ (แถว x เซลล์) ข้อความ strip แล้ว"""
+    return driver.execute_script(_READ_ROWS_JS, row_selector) or []
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""
+ดึงตาราง nationalthaiwater (/waterlevel, /dam) จาก JSON API ที่หน้า SPA เรียก (ไม่ต้องกด Next ทีละหน้า)
+
+- endpoint + การจับคู่คอลัมน์ (JSON field -> คอลัมน์ในตาราง) ถูกเรียนรู้ครั้งแรกจาก Selenium (discover)
+  โดยเทียบ URL ของ XHR/fetch ที่หน้าเว็บโหลด กับข้อความแถวแรก ๆ ของตารางที่ render แล้ว
+  แล้วเก็บไว้ใน NTW_ENDPOINT_CACHE เช่น {"waterlevel": {"url": ..., "columns": ["station.name.th", ...]}}
+- ถ้า URL ที่หน้าเว็บเรียกมีพารามิเตอร์หน้า (page, pageNo, ...) จะถูกเก็บเป็น template {page}
+  แล้วดึงหลายหน้าพร้อมกัน (จำนวนหน้าจากยอดรวมใน JSON ถ้ามี ไม่งั้นจนเจอหน้าว่าง/หน้าสั้น)
+- ยอดรวมที่ API รายงาน (total, recordsTotal, ...) ใช้ตรวจว่าได้ครบ: ได้น้อยกว่า = raise ให้ผู้เรียก fallback
+- ผลลัพธ์เป็น list[list[str]] เรียงคอลัมน์เหมือน read_mui_table ใช้กับ save_and_upload / save_data_to_csv ได้ตรง ๆ
+"""
+from __future__ import annotations
+
+import os, re, json, math, threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qsl, quote
+
+import rate_limit
+
+# ======================================================================
+# CONFIG
+# ======================================================================
+ENDPOINT_CACHE: str = os.getenv("NTW_ENDPOINT_CACHE", "ntw_endpoints.json")
+HTTP_TIMEOUT: float = float(os.getenv("NTW_HTTP_TIMEOUT", "20"))
+HTTP_WORKERS: int = max(1, int(os.getenv("NTW_HTTP_WORKERS", "4")))
+# ความถี่เริ่มต้นของ host nationalthaiwater (คำขอ/วินาที รวมทุก worker/แท็บ ทั้ง HTTP และ Selenium)
+NTW_RATE: float = float(os.getenv("NTW_RATE", "1.0"))
+MAX_PAGES: int = 200
+DISCOVER_SAMPLE_ROWS: int = 10   # แถวบนหน้าเว็บที่ใช้จับคู่คอลัมน์ตอน discover
+USER_AGENT: str = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36")
+
+_cache_lock = threading.Lock()  # หลายแท็บค้นหา endpoint พร้อมกันได้
+_RE_SPACE = re.compile(r"\s+")
+_RE_NUM = re.compile(r"^[+-]?[\d,]*\.?\d+$")
+# ชื่อพารามิเตอร์เลขหน้า / ชื่อ field ยอดรวมที่ API แบบแบ่งหน้าใช้กันบ่อย (เทียบแบบไม่สนตัวพิมพ์)
+PAGE_PARAMS = ("page", "pageno", "page_no", "pagenumber", "page_number", "pageindex", "page_index", "p")
+TOTAL_KEYS = ("total", "totalcount", "total_count", "totalrecords", "total_records", "recordstotal",
+              "totalelements", "totalitems", "total_items", "totalrows")
+
+# ======================================================================
+# JSON -> ROWS
+# ======================================================================
+def find_records(payload) -> List[dict]:
+    """list ของ dict ที่ยาวที่สุดใน payload (API ส่วนใหญ่ห่อไว้ใน data/result/...)"""
+    best: List[dict] = []
+    stack = [payload]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, list):
+            if len(obj) > len(best) and obj and all(isinstance(x, dict) for x in obj):
+                best = obj
+            stack.extend(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+    return best
+
+def find_total(payload) -> Optional[int]:
+    """ยอดรวมที่ API รายงาน (เช่น {"total": 95, "data": [...]}) ค้นแค่ 2 ชั้นบน ; ไม่มี = None"""
+    level = [payload]
+    for _ in range(2):
+        nxt = []
+        for obj in level:
+            if not isinstance(obj, dict):
+                continue
+            for k, v in obj.items():
+                if str(k).lower() in TOTAL_KEYS and not isinstance(v, bool):
+                    try:
+                        return int(str(v).replace(",", ""))
+                    except ValueError:
+                        pass
+                if isinstance(v, dict):
+                    nxt.append(v)
+        level = nxt
+    return None
+
+def flatten(rec, prefix: str = "") -> Dict[str, object]:
+    """{"a": {"b": 1}} -> {"a.b": 1} (list ใช้ index เป็น key)"""
+    out: Dict[str, object] = {}
+    items = rec.items() if isinstance(rec, dict) else enumerate(rec)
+    for k, v in items:
+        key = f"{prefix}{k}"
+        if isinstance(v, (dict, list)):
+            out.update(flatten(v, key + "."))
+        else:
+            out[key] = v
+    return out
+
+def _text(v) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    return _RE_SPACE.sub(" ", str(v)).strip()
+
+def _same(cell: str, value) -> bool:
+    """ข้อความในเซลล์ตรงกับค่า JSON ไหม (ตัวเลขเทียบเป็นค่า เพราะตารางใส่คอมมา/ทศนิยมตายตัว)"""
+    a, b = _text(cell), _text(value)
+    if a == b:
+        return True
+    if a and b and _RE_NUM.match(a) and _RE_NUM.match(b):
+        try:
+            return abs(float(a.replace(",", "")) - float(b.replace(",", ""))) < 1e-6
+        except ValueError:
+            return False
+    return False
+
+def _match_score(row: List[str], f: Dict[str, object]) -> int:
+    values = list(f.values())
+    return sum(1 for c in row if c and any(_same(c, v) for v in values))
+
+def learn_columns(records: List[dict], sample_rows: List[List[str]]) -> Optional[List[Optional[str]]]:
+    """
+    หา JSON field ของแต่ละคอลัมน์จากแถวตัวอย่าง (แถวแรก ๆ ของตารางบนหน้าเว็บ)
+    จับคู่แถวตัวอย่างกับ record ที่ค่าตรงมากที่สุดก่อน (ตารางอาจเรียงต่างจาก JSON)
+    คืน None ถ้ามีคอลัมน์ที่มีข้อความแต่จับคู่ไม่ได้ (ใช้ endpoint นี้แทนตารางไม่ได้)
+    """
+    if not records or not sample_rows:
+        return None
+    flat_all = [flatten(r) for r in records]
+    pairs = []
+    for row in sample_rows:
+        f = max(flat_all, key=lambda f: _match_score(row, f))
+        pairs.append((row, f))
+    width = max(len(r) for r in sample_rows)
+    columns: List[Optional[str]] = []
+    for j in range(width):
+        cells = [(r[j] if j < len(r) else "", f) for r, f in pairs]
+        if not any(c for c, _ in cells):
+            columns.append(None)
+            continue
+        keys = [k for k in pairs[0][1] if all(_same(c, f.get(k)) for c, f in cells)]
+        if not keys:
+            return None
+        columns.append(keys[0])
+    return columns
+
+def records_to_rows(records: List[dict], columns: List[Optional[str]]) -> List[List[str]]:
+    rows = []
+    for rec in records:
+        f = flatten(rec)
+        rows.append([_text(f.get(k)) if k else "" for k in columns])
+    return rows
+
+# ======================================================================
+# HTTP
+# ======================================================================
+def make_session(pool_size: int = HTTP_WORKERS):
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    s = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    s.headers.update({
+        "User-Agent": USER_AGENT,
+        "Accept": "application/json, text/plain, */*",
+        "Accept-Encoding": "gzip, deflate",
+    })
+    return s
+
+def fetch_page(session, url: str) -> Tuple[List[dict], Optional[int]]:
+    """(records, ยอดรวมที่ API รายงาน หรือ None)"""
+    r = rate_limit.limited_get(session, url, rate=NTW_RATE, timeout=HTTP_TIMEOUT)
+    r.raise_for_status()
+    payload = r.json()
+    return find_records(payload), find_total(payload)
+
+def fetch_records(session, url: str) -> List[dict]:
+    return fetch_page(session, url)[0]
+
+def fetch_all_records(session, url: str, workers: int = HTTP_WORKERS, page_start: int = 1) -> List[dict]:
+    """
+    URL ไม่มี {page} = ดึงครั้งเดียว; มี {page} = หน้าแรกก่อน แล้วดึงหน้าที่เหลือพร้อมกัน workers หน้า
+    (รู้ยอดรวม = รู้จำนวนหน้า ; ไม่รู้ = ดึงทีละชุดจนเจอหน้าว่าง/หน้าสั้น)
+    raise ValueError ถ้าได้น้อยกว่ายอดรวมที่ API รายงาน หรือ API ไม่สนพารามิเตอร์หน้า
+    """
+    page_url = lambda p: url.replace("{page}", str(p))
+    first, total = fetch_page(session, page_url(page_start))
+    out: List[dict] = list(first)
+    if "{page}" in url and first:
+        size = len(first)
+        last = page_start + min(MAX_PAGES, math.ceil(total / size)) - 1 if total else page_start + MAX_PAGES - 1
+        page = page_start + 1
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            while page <= last:
+                batch = list(range(page, min(page + workers, last + 1)))
+                results = list(ex.map(lambda p: fetch_records(session, page_url(p)), batch))
+                done = False
+                for recs in results:
+                    if not recs:
+                        done = True
+                        break
+                    if recs[0] == first[0]:
+                        raise ValueError(f"API ไม่เปลี่ยนหน้าตามพารามิเตอร์: {url}")
+                    out.extend(recs)
+                    if len(recs) < size:
+                        done = True
+                        break
+                if done:
+                    break
+                page += len(batch)
+    if total is not None and len(out) < total:
+        raise ValueError(f"ได้ {len(out)} จาก {total} แถวที่ API รายงาน (endpoint แบ่งหน้า?): {url}")
+    return out
+
+# ======================================================================
+# ENDPOINT CACHE
+# ======================================================================
+def load_endpoints() -> Dict[str, dict]:
+    try:
+        with open(ENDPOINT_CACHE, "r", encoding="utf-8") as f:
+            return json.load(f) or {}
+    except Exception:
+        return {}
+
+def load_endpoint(dataset: str) -> Optional[dict]:
+    """env NTW_<DATASET>_URL + NTW_<DATASET>_COLUMNS (คั่นด้วย ,) มาก่อนไฟล์ cache"""
+    env = dataset.upper()
+    url = os.getenv(f"NTW_{env}_URL", "")
+    cols = os.getenv(f"NTW_{env}_COLUMNS", "")
+    if url and cols:
+        return {"url": url, "columns": [c.strip() or None for c in cols.split(",")]}
+    ep = load_endpoints().get(dataset)
+    return ep if ep and ep.get("url") and ep.get("columns") else None
+
+def save_endpoint(dataset: str, url: str, columns: List[Optional[str]], page_start: int = 1) -> None:
+    with _cache_lock:
+        data = load_endpoints()
+        data[dataset] = {"url": url, "columns": columns, "page_start": page_start,
+                         "discovered_at": datetime.now().isoformat(timespec="seconds")}
+        with open(ENDPOINT_CACHE, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+def fetch_table(dataset: str, session=None) -> List[List[str]]:
+    """ดึงทั้งตารางของ dataset ผ่าน HTTP; raise ถ้ายังไม่มี endpoint หรือดึงไม่ได้ (ให้ผู้เรียก fallback)"""
+    ep = load_endpoint(dataset)
+    if not ep:
+        raise LookupError(f"ยังไม่มี endpoint ของ {dataset} (รัน Selenium หนึ่งรอบเพื่อค้นหา)")
+    session = session or make_session()
+    records = fetch_all_records(session, ep["url"], page_start=int(ep.get("page_start", 1)))
+    if not records:
+        raise ValueError(f"endpoint ของ {dataset} ไม่มีข้อมูล: {ep['url']}")
+    return records_to_rows(records, ep["columns"])
+
+# ======================================================================
+# DISCOVERY (ใช้ driver ที่เปิดหน้าและ render ตารางแล้ว)
+# ======================================================================
+_XHR_URLS_JS = """
+return performance.getEntriesByType('resource')
+  .filter(e => e.initiatorType === 'xmlhttprequest' || e.initiatorType === 'fetch')
+  .map(e => e.name);
+"""
+
+_TABLE_TOTAL_JS = """
+return Array.from(document.querySelectorAll(
+  '.MuiTablePagination-displayedRows, .MuiTablePagination-caption'), e => e.textContent || '');
+"""
+_RE_TABLE_TOTAL = re.compile(r"(?:of|จาก)\s*(?:more than\s*|มากกว่า\s*)?([\d,]+)", re.I)
+
+def table_total(driver) -> Optional[int]:
+    """ยอดรวมแถวที่ตาราง MUI แสดง ("1–10 of 95") ; หาไม่เจอ = None"""
+    try:
+        texts = driver.execute_script(_TABLE_TOTAL_JS) or []
+    except Exception:
+        return None
+    for t in texts:
+        m = _RE_TABLE_TOTAL.search(t or "")
+        if m:
+            return int(m.group(1).replace(",", ""))
+    return None
+
+def page_template(url: str) -> Tuple[str, Optional[int]]:
+    """แทนค่าพารามิเตอร์เลขหน้าใน query ด้วย {page} ; คืน (template, เลขหน้าแรกที่หน้าเว็บขอ) หรือ (url, None)"""
+    parts = urlsplit(url)
+    for name, value in parse_qsl(parts.query, keep_blank_values=True):
+        if name.lower() in PAGE_PARAMS and value.isdigit():
+            pat = re.compile(r"(^|&)" + re.escape(quote(name, safe="")) + r"=" + re.escape(value) + r"(?=&|$)")
+            query, n = pat.subn(lambda m: f"{m.group(1)}{quote(name, safe='')}={{page}}", parts.query, count=1)
+            if n:
+                return parts._replace(query=query).geturl(), int(value)
+    return url, None
+
+def _candidate_urls(driver) -> Iterator[str]:
+    try:
+        urls = driver.execute_script(_XHR_URLS_JS) or []
+    except Exception:
+        urls = []
+    # ล่าสุดก่อน: หลังคลิกแท็บ request ของแท็บนั้นจะอยู่ท้าย
+    yield from dict.fromkeys(reversed(urls))
+
+def discover(driver, dataset: str, sample_rows: List[List[str]], session=None) -> bool:
+    """
+    ลอง URL ที่หน้าเว็บเรียกทีละตัว ตัวแรกที่ map คอลัมน์ได้ครบ (ทุกแถวของหน้าแรก) และได้ครบทุกแถว
+    (ทั้งหน้า หรือแบ่งหน้าด้วยพารามิเตอร์ที่ทำ template ได้) จะถูก cache ไว้
+    """
+    sample = [r for r in sample_rows if any(r)][:DISCOVER_SAMPLE_ROWS]
+    if not sample:
+        return False
+    session = session or make_session(1)
+    shown = table_total(driver)
+    for url in _candidate_urls(driver):
+        try:
+            records, total = fetch_page(session, url)
+        except Exception:
+            continue
+        columns = learn_columns(records, sample)
+        if not columns:
+            continue
+        template, page_start = page_template(url)
+        if page_start is None:
+            expected = max(total or 0, shown or 0)
+            if len(records) < expected:
+                print(f"⚠️ {url} ได้ {len(records)}/{expected} แถว แต่ไม่พบพารามิเตอร์หน้า -> ข้าม")
+                continue
+            page_start = 1
+        save_endpoint(dataset, template, columns, page_start)
+        print(f"💾 พบ endpoint {dataset}: {template}")
+        return True
+    print(f"⚠️ ค้นหา endpoint {dataset} ไม่สำเร็จ")
+    return False
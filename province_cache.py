@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+cache รายชื่อจังหวัดจาก dropdown (TMD #province-selector, DGR #country-dropdown)
+
+- ภายใน PROVINCE_CACHE_TTL_H ชั่วโมง: ใช้รายชื่อจาก cache ทันที ไม่อ่าน DOM
+- หมดอายุ: อ่าน <option> ทั้งหมดด้วย execute_script ครั้งเดียว แล้วเทียบ checksum
+  ตรงกัน = ต่ออายุ cache (แก้แค่ checked_at) ; ต่างกัน = บันทึกรายชื่อใหม่และแจ้งผู้เรียก (changed=True)
+  ให้ล้างค่าที่ผูกกับรายชื่อเดิม เช่น checkpoint รายจังหวัด ; อ่านได้น้อยผิดปกติ = ให้ผู้เรียกอ่านแบบเต็มเอง
+- invalidate(key): เรียกเมื่อ value ใน cache ไม่มีบนหน้าเว็บแล้ว (รอบถัดไปจะอ่านใหม่)
+
+รูปแบบไฟล์: {"tmd": {"options": [[name, value], ...], "checksum": "...", "checked_at": "..."}}
+"""
+from __future__ import annotations
+
+import os, json, hashlib, threading
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+# ======================================================================
+# CONFIG
+# ======================================================================
+CACHE_PATH: str = os.getenv("PROVINCE_CACHE", "province_cache.json")
+TTL_HOURS: float = float(os.getenv("PROVINCE_CACHE_TTL_H", "24"))
+MIN_OPTIONS: int = 10
+
+_lock = threading.Lock()
+
+_READ_OPTIONS_JS = """
+const s = typeof arguments[0] === 'string' ? document.querySelector(arguments[0]) : arguments[0];
+if (!s || !s.options) return [];
+return Array.prototype.map.call(s.options, o => [(o.text || '').trim(), (o.value || '').trim()]);
+"""
+
+Options = List[Tuple[str, str]]
+
+# ======================================================================
+# DOM
+# ======================================================================
+def read_options(driver, select) -> Options:
+    """[(ข้อความ, value)] ของทุก <option> ใน 1 WebDriver command ; select = element หรือ CSS selector"""
+    raw = driver.execute_script(_READ_OPTIONS_JS, select) or []
+    return [(str(t), str(v)) for t, v in raw]
+
+def checksum(options: Options) -> str:
+    return hashlib.sha1(json.dumps(list(options), ensure_ascii=False).encode("utf-8")).hexdigest()
+
+# ======================================================================
+# FILE
+# ======================================================================
+def _load_all() -> dict:
+    try:
+        with open(CACHE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f) or {}
+    except Exception:
+        return {}
+
+def _write_all(data: dict) -> None:
+    tmp = CACHE_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, CACHE_PATH)
+
+def save(key: str, options: Options) -> bool:
+    """บันทึกรายชื่อ ; คืน True ถ้ามีรายชื่อเดิมอยู่และไม่ตรงกับที่บันทึก (รายชื่อเปลี่ยน)"""
+    digest = checksum(options)
+    with _lock:
+        data = _load_all()
+        old = data.get(key) or {}
+        data[key] = {"options": [list(o) for o in options], "checksum": digest,
+                     "checked_at": datetime.now().isoformat(timespec="seconds")}
+        _write_all(data)
+    return bool(old.get("options")) and old.get("checksum") != digest
+
+def touch(key: str) -> None:
+    """ต่ออายุ entry เดิม (รายชื่อไม่เปลี่ยน) โดยไม่เขียนรายชื่อ/checksum ใหม่"""
+    with _lock:
+        data = _load_all()
+        if key in data:
+            data[key]["checked_at"] = datetime.now().isoformat(timespec="seconds")
+            _write_all(data)
+
+def invalidate(key: str) -> None:
+    with _lock:
+        data = _load_all()
+        if data.pop(key, None) is not None:
+            _write_all(data)
+            print(f"🗑 ล้าง cache รายชื่อจังหวัด ({key})")
+
+def _fresh(entry: dict) -> bool:
+    try:
+        return datetime.now() - datetime.fromisoformat(entry["checked_at"]) < timedelta(hours=TTL_HOURS)
+    except Exception:
+        return False
+
+# ======================================================================
+# LOOKUP
+# ======================================================================
+def _entry(key: str) -> dict:
+    with _lock:
+        return _load_all().get(key) or {}
+
+def fresh(key: str) -> Optional[Options]:
+    """รายชื่อใน cache ที่ยังไม่หมดอายุ (ไม่ต้องเปิดหน้าเว็บ) หรือ None"""
+    entry = _entry(key)
+    cached = [tuple(o) for o in entry.get("options") or []]
+    if cached and _fresh(entry):
+        print(f"📋 ใช้รายชื่อจังหวัดจาก cache ({key}: {len(cached)} รายการ)")
+        return cached
+    return None
+
+def lookup(key: str, driver, select, keep=None) -> Tuple[Optional[Options], bool]:
+    """
+    คืน (รายชื่อ [(name, value)] หรือ None, changed)
+    None = ให้ผู้เรียกอ่านแบบเต็ม แล้ว save เอง
+    changed = True เมื่อมีรายชื่อเดิมใน cache แต่ที่อ่านได้ไม่ตรง checksum (ผู้เรียกล้างค่าที่ผูกกับรายชื่อเดิม)
+    keep(name, value) -> bool ใช้กรอง option หัวรายการ เช่น "เลือกจังหวัด" / value ว่าง
+    """
+    cached = fresh(key)
+    if cached:
+        return cached, False
+    entry = _entry(key)
+
+    try:
+        options = read_options(driver, select)
+    except Exception:
+        return None, False
+    if keep is not None:
+        options = [(n, v) for n, v in options if keep(n, v)]
+    if len(options) < MIN_OPTIONS:
+        return None, False
+    if entry and checksum(options) == entry.get("checksum"):
+        print(f"📋 รายชื่อจังหวัดไม่เปลี่ยน ({key}: {len(options)} รายการ) ต่ออายุ cache")
+        touch(key)
+        return options, False
+    changed = save(key, options)
+    print(f"📋 บันทึกรายชื่อจังหวัด{'ที่เปลี่ยนไป' if changed else 'ใหม่'} ({key}: {len(options)} รายการ)")
+    return options, changed
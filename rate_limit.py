@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+ตัวคุมอัตราการยิงหน้าเว็บต่อ host แบบ token bucket + AIMD ใช้แทน sleep สุ่มคงที่
+
+    lim = rate_limit.for_host(URL, rate=1.0)     # ทุก worker (thread) ของ host เดียวกันได้ตัวเดียวกัน
+    lim.acquire()                                # รอจนถึงคิวของตัวเอง ก่อนโหลดหน้า/คลิกเปลี่ยนหน้า
+    lim.success(latency)                         # หน้าเร็ว (< slow_secs) -> เพิ่ม rate ทีละ increase
+    lim.failure("timeout")                       # timeout/error -> คูณ rate ด้วย decrease ทันที
+    lim.failure("stale")                         # stale element: ลดเฉพาะเมื่อเกิดถี่ (storm)
+    r = rate_limit.limited_get(session, url, rate=1.0, timeout=15)   # HTTP ตรง: ครบทั้ง 3 ขั้นในตัว
+
+rate คือจำนวนคำขอต่อวินาทีรวมทุก worker ของ host นั้น (ใน process เดียว) อยู่ในช่วง [min_rate, max_rate]
+ค่าเริ่มต้นทั้งหมดปรับได้ด้วย env RATE_* ; RATE_LIMIT_ENABLED=false = ไม่รอเลย
+"""
+from __future__ import annotations
+
+import os, time, random, threading
+from collections import deque
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import metrics
+
+# ======================================================================
+# CONFIG
+# ======================================================================
+RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+MIN_RATE: float = float(os.getenv("RATE_MIN_RPS", "0.2"))
+MAX_RATE: float = float(os.getenv("RATE_MAX_RPS", "5"))
+INCREASE: float = float(os.getenv("RATE_INCREASE", "0.1"))     # +req/s ต่อคำขอที่เร็วและสำเร็จ
+DECREASE: float = float(os.getenv("RATE_DECREASE", "0.5"))     # ×rate เมื่อ timeout/error
+SLOW_SECS: float = float(os.getenv("RATE_SLOW_SECS", "3"))     # ช้ากว่านี้ = ไม่เร่ง
+JITTER: float = float(os.getenv("RATE_JITTER", "0.2"))         # สุ่มเพิ่ม 0..JITTER ของช่วงห่าง
+STALE_STORM: int = int(os.getenv("RATE_STALE_STORM", "3"))     # stale กี่ครั้ง...
+STALE_WINDOW: float = float(os.getenv("RATE_STALE_WINDOW", "10"))  # ...ภายในกี่วินาที = storm
+
+# ======================================================================
+# LIMITER
+# ======================================================================
+class HostLimiter:
+    def __init__(self, host: str, rate: float = 1.0, min_rate: float = MIN_RATE, max_rate: float = MAX_RATE,
+                 burst: float = 1.0, increase: float = INCREASE, decrease: float = DECREASE,
+                 slow_secs: float = SLOW_SECS, jitter: float = JITTER):
+        self.host = host
+        self.min_rate, self.max_rate = min_rate, max(max_rate, min_rate)
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+        self.burst = max(1.0, burst)
+        self.increase, self.decrease = increase, decrease
+        self.slow_secs, self.jitter = slow_secs, jitter
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._stale: deque = deque()
+        self._cond = threading.Condition()
+        self.stats = {"requests": 0, "waited_secs": 0.0, "increases": 0, "decreases": 0}
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """รอจนได้ token (แชร์ระหว่าง thread); คืนเวลาที่รอ (วินาที)"""
+        if not RATE_LIMIT_ENABLED:
+            return 0.0
+        t0 = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    interval = 1.0 / self.rate
+                    break
+                self._cond.wait((1.0 - self._tokens) / self.rate)
+        # jitter นอก lock: ไม่ให้คำขอออกตรงจังหวะเดียวกันทุกครั้ง
+        if self.jitter > 0:
+            time.sleep(random.uniform(0, self.jitter * interval))
+        waited = time.monotonic() - t0
+        with self._cond:
+            self.stats["requests"] += 1
+            self.stats["waited_secs"] += waited
+        metrics.count("rate_wait_secs", waited)
+        return waited
+
+    def success(self, latency: Optional[float] = None) -> None:
+        with self._cond:
+            if latency is not None and latency >= self.slow_secs:
+                return
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+                self.stats["increases"] += 1
+
+    def failure(self, kind: str = "error") -> None:
+        with self._cond:
+            if kind == "stale":
+                now = time.monotonic()
+                self._stale.append(now)
+                while self._stale and now - self._stale[0] > STALE_WINDOW:
+                    self._stale.popleft()
+                if len(self._stale) < STALE_STORM:
+                    return
+                self._stale.clear()
+            old = self.rate
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            # ทิ้ง token ที่สะสมไว้ -> คำขอถัดไปรอครบช่วงใหม่
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = time.monotonic()
+            if self.rate < old:
+                self.stats["decreases"] += 1
+            self._cond.notify_all()
+        if self.rate < old:
+            print(f"🐢 {self.host}: ลดความถี่เป็น {self.rate:.2f} req/s ({kind})")
+
+    def summary(self) -> str:
+        s = self.stats
+        return (f"{self.host}: {self.rate:.2f} req/s | {s['requests']} คำขอ รอรวม {s['waited_secs']:.1f}s"
+                f" | เร่ง {s['increases']} ลด {s['decreases']}")
+
+# ======================================================================
+# REGISTRY (ต่อ process)
+# ======================================================================
+_limiters: Dict[str, HostLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def for_host(url_or_host: str, **kwargs) -> HostLimiter:
+    """limiter ของ host (สร้างครั้งแรกด้วย kwargs ; ครั้งต่อไปได้ตัวเดิมที่ปรับ rate มาแล้ว)"""
+    host = urlparse(url_or_host).netloc or url_or_host
+    with _limiters_lock:
+        lim = _limiters.get(host)
+        if lim is None:
+            lim = _limiters[host] = HostLimiter(host, **kwargs)
+        return lim
+
+# ======================================================================
+# HTTP (requests.Session)
+# ======================================================================
+def limited_get(session, url: str, rate: float = 1.0, **kwargs):
+    """
+    session.get ผ่าน limiter ของ host ใน url (ตัวเดียวกับที่ Selenium ของ host นั้นใช้ ; ปลอดภัยข้าม thread)
+    timeout = failure("timeout") ; เชื่อมต่อไม่ได้/429/5xx = failure("error") ; อื่น ๆ = success(latency)
+    """
+    lim = for_host(url, rate=rate)
+    lim.acquire()
+    t0 = time.perf_counter()
+    try:
+        r = session.get(url, **kwargs)
+    except Exception as e:
+        lim.failure("timeout" if "timeout" in type(e).__name__.lower() else "error")
+        raise
+    if r.status_code == 429 or r.status_code >= 500:
+        lim.failure("error")
+    else:
+        lim.success(time.perf_counter() - t0)
+    return r
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+รันหลายสคริปต์ต่อกันใน process เดียว โดยใช้ Chrome ชุดเดียวกัน (SessionBroker)
+
+    python run_all.py                  # scrap1 scrap2 scrap3 scrap4
+    python run_all.py scrap1 scrap3    # เลือกเฉพาะบางตัว
+"""
+import sys, time, runpy, traceback
+
+from driver_factory import use_broker
+
+DEFAULT_SCRIPTS = ["scrap1", "scrap2", "scrap3", "scrap4"]
+MAX_BROWSERS = 4
+
+def main(argv: list[str]) -> int:
+    scripts = argv or DEFAULT_SCRIPTS
+    failed = []
+    t0 = time.time()
+    with use_broker(MAX_BROWSERS):
+        for name in scripts:
+            t1 = time.time()
+            print(f"\n===== {name} =====")
+            try:
+                runpy.run_module(name, run_name="__main__")
+                print(f"✅ {name} เสร็จใน {time.time() - t1:.2f} วินาที")
+            except SystemExit as e:
+                if e.code not in (None, 0):
+                    failed.append(name)
+            except Exception:
+                traceback.print_exc()
+                failed.append(name)
+    print(f"\n⏱ รวม {time.time() - t0:.2f} วินาที | ล้มเหลว: {', '.join(failed) or '-'}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Schema + parsing ตอน scrape: แปลงข้อความจากหน้าเว็บเป็น dtype จริง
+
+kind ที่รองรับ:
+    "float32" | "Int32"       ตัวเลข (รองรับเลขไทย ๐-๙, คอมมา, %, ค่าว่าง/"-" = NA)
+    "category" | "string"     ข้อความ
+    "datetime:<fmt>"          วันที่ตาม strftime format ของหน้าเว็บ (เขียน CSV กลับด้วย format เดิม)
+ค่าที่หายไปเป็น NA จริง (ไม่ใช่ "0") ; kind กำหนดต่อคอลัมน์ตายตัว ไม่เดาจากค่าในแต่ละรอบ
+"""
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+import pandas as pd
+
+Schema = Dict[str, str]
+
+MISSING_TOKENS = ("", "-", "--", "–", "—", "N/A", "n/a", "null", "None", "nan")
+_THAI_DIGITS = str.maketrans("๐๑๒๓๔๕๖๗๘๙", "0123456789")
+
+WATERLEVEL_SCHEMA: Schema = {
+    "Station": "category",
+    "Location": "category",
+    "Time": "string",
+    "Water_Level": "float32",
+    "Bank_Level": "float32",
+    "Gauge_Zero": "float32",
+    "Capacity_Percent": "float32",
+    "Status": "category",
+    "Data_Time": "datetime:%m/%d/%y",
+}
+
+TMD_FORECAST_SCHEMA: Schema = {
+    "Province": "category",
+    "Weather": "category",
+    "RainChance": "float32",
+    "DateTime": "string",
+}
+
+# หัวคอลัมน์หลัง rename_th_to_en ของ scrap4
+DGR_SCHEMA: Schema = {
+    "Province": "category",
+    "No": "Int32",
+    "WellID": "string",
+    "Location": "string",
+    "Type": "category",
+    "Depth": "float32",
+    "Flow": "float32",
+    "NormalLevel": "float32",
+    "Drop": "float32",
+    "Capacity": "float32",
+    "CollectedAt": "string",
+}
+
+def dam_schema(columns) -> Schema:
+    """
+    ตารางเขื่อนไม่มีหัวคอลัมน์ กำหนด kind ตามตำแหน่ง (ไม่ขึ้นกับค่า -> ทุกรอบได้ type เดียวกัน):
+    คอลัมน์แรก = ชื่อ (string), ท้ายสุด 2 คอลัมน์ = วันที่ดึง + ชื่อแท็บ, ที่เหลือ = ตัวเลข float32 ("-" = NA)
+    """
+    cols = list(columns)
+    sch: Schema = {c: "float32" for c in cols}
+    base = [c for c in cols if c != "DamType"]
+    if base:
+        sch[base[0]] = "string"
+    if len(base) >= 3:
+        sch[base[-2]] = "datetime:%m/%d/%Y"
+        sch[base[-1]] = "category"
+    if "DamType" in sch:
+        sch["DamType"] = "category"
+    return sch
+
+def dam_key_columns(columns) -> list:
+    """คอลัมน์ที่ระบุตัวตนของแถวเขื่อน: ชื่อ + วันที่ดึง + แท็บ (+ DamType) ไม่รวมค่าตัวเลข"""
+    cols = list(columns)
+    base = [c for c in cols if c != "DamType"]
+    keys = [base[0]] + base[-2:] if len(base) >= 3 else base
+    return keys + (["DamType"] if "DamType" in cols else [])
+
+# ---------- parsers ----------
+def _clean_text(s: pd.Series) -> pd.Series:
+    s = s.astype("string").str.strip()
+    return s.mask(s.isin(MISSING_TOKENS))
+
+def parse_numeric(s: pd.Series, dtype: str = "float32") -> pd.Series:
+    t = _clean_text(s).str.translate(_THAI_DIGITS)
+    t = t.str.replace(r"[,\s%]", "", regex=True)
+    num = pd.to_numeric(t, errors="coerce")
+    if dtype == "Int32":
+        return num.round().astype("Int32")
+    return num.astype(dtype)
+
+def parse_column(s: pd.Series, kind: str) -> pd.Series:
+    if kind in ("float32", "float64", "Int32"):
+        return parse_numeric(s, kind)
+    if kind == "category":
+        return _clean_text(s).astype("category")
+    if kind == "string":
+        return _clean_text(s)
+    if kind.startswith("datetime:"):
+        return pd.to_datetime(_clean_text(s), format=kind.split(":", 1)[1], errors="coerce")
+    raise ValueError(f"unknown schema kind: {kind}")
+
+def apply_schema(df: pd.DataFrame, schema: Schema, default: Optional[str] = None) -> pd.DataFrame:
+    """คืน DataFrame ใหม่ที่แปลง dtype ตาม schema (คอลัมน์ที่ไม่อยู่ใน schema ใช้ default ถ้ามี)"""
+    out = df.copy()
+    for c in out.columns:
+        kind = schema.get(c, default)
+        if kind and not _already(out[c], kind):
+            out[c] = parse_column(out[c], kind)
+    return out
+
+def _already(s: pd.Series, kind: str) -> bool:
+    if kind.startswith("datetime:"):
+        return pd.api.types.is_datetime64_any_dtype(s)
+    if kind in ("float32", "float64", "Int32"):
+        return str(s.dtype) == kind
+    if kind == "category":
+        return isinstance(s.dtype, pd.CategoricalDtype)
+    return False
+
+def csv_date_format(schema: Schema) -> Optional[str]:
+    """format สำหรับ to_csv(date_format=...) เพื่อให้ไฟล์ CSV เดิมยังได้วันที่รูปแบบเดิม"""
+    for kind in schema.values():
+        if kind.startswith("datetime:"):
+            return kind.split(":", 1)[1]
+    return None
@@ -1,21 +1,27 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
-import os, re, time, random, pathlib
+import os, re, time, pathlib, queue, threading
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
-from contextlib import contextmanager
 
 import pandas as pd
 
 # -------- Selenium --------
 from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, StaleElementReferenceException
 
+import tmd_http
+import storage
+import metrics
+import province_cache
+import rate_limit
+from driver_factory import make_chrome
+from waits import wait_dom_quiet, wait_animation_frame, install_network_hook, wait_network_idle
+
 # ======================================================================
 # CONFIG
 # ======================================================================
@@ -29,11 +35,19 @@ WAIT_LONG: int = int(os.getenv("WAIT_LONG", "35"))
 
 RETRIES_PER_PROVINCE = int(os.getenv("RETRIES_PER_PROVINCE", "2"))
 MAX_SCRAPE_PASSES = int(os.getenv("MAX_SCRAPE_PASSES", "5"))
+# จำนวน Chrome ที่ดึงพร้อมกัน (แต่ละ worker มี driver ของตัวเอง)
+TMD_WORKERS = max(1, int(os.getenv("TMD_WORKERS", "1")))
+
+UI_IDLE_TIMEOUT = float(os.getenv("UI_IDLE_TIMEOUT", "3"))
+# เวลารอ select ด้วย locator ที่ cache ไว้ (หลัง refresh/เปลี่ยนหน้า) ก่อนถอยไปค้นเต็ม
+SELECT_REVALIDATE_TIMEOUT = float(os.getenv("SELECT_REVALIDATE_TIMEOUT", "6"))
 
-SLEEP_MIN = float(os.getenv("SLEEP_MIN", "0.7"))
-SLEEP_MAX = float(os.getenv("SLEEP_MAX", "1.2"))
+# ความถี่เริ่มต้น (จังหวัด/วินาที รวมทุก worker) ; ค่าเดียวกับ engine HTTP เพราะใช้ limiter ของ host เดียวกัน
+TMD_RATE = tmd_http.TMD_RATE
 
 PAGE_LOAD_STRATEGY: str = os.getenv("PAGE_LOAD_STRATEGY", "none")
+# selenium = เปิด Chrome ทุกจังหวัด | http = ยิง endpoint ตรง แล้ว fallback เป็น Selenium
+TMD_ENGINE: str = os.getenv("TMD_ENGINE", "selenium").lower()
 RE_INT = re.compile(r"(\d+)")
 
 # ======================================================================
@@ -92,19 +106,12 @@ def log_iframes(driver, tag="iframes"):
 # ======================================================================
 # ROBUST HELPERS: หา <select> ได้แม้ย้ายไปอยู่ใน iframe/combobox
 # ======================================================================
-@contextmanager
-def _default_content(driver):
-    try:
-        driver.switch_to.default_content()
-        yield
-    finally:
-        try:
-            driver.switch_to.default_content()
-        except Exception:
-            pass
+def wait_ui_idle(driver, quiet_ms: int = 300):
+    wait_dom_quiet(driver, quiet_ms=quiet_ms, timeout=UI_IDLE_TIMEOUT)
 
-def wait_ui_idle():
-    time.sleep(0.6)
+def _refresh_settle(driver):
+    driver.refresh()
+    wait_ui_idle(driver)
 
 def _click_if_present(driver, by, sel):
     try:
@@ -124,15 +131,15 @@ def try_dismiss_banners(driver):
             for b in btns[:3]:
                 try:
                     driver.execute_script("arguments[0].scrollIntoView({block:'center'});", b)
-                    time.sleep(0.1)
                     driver.execute_script("arguments[0].click();", b)
-                    time.sleep(0.2)
+                    wait_ui_idle(driver, quiet_ms=150)
                 except Exception:
                     pass
         except Exception:
             pass
 
 def _try_find_select_in_context(driver):
+    """คืน (element, locator) ที่เจอใน context ปัจจุบัน หรือ None"""
     # 1) หา <select> จริงก่อน
     CANDS = [
         (By.ID, "province-selector"),
@@ -143,7 +150,7 @@ def _try_find_select_in_context(driver):
     ]
     for how, what in CANDS:
         try:
-            return WebDriverWait(driver, 6).until(EC.presence_of_element_located((how, what)))
+            return WebDriverWait(driver, 6).until(EC.presence_of_element_located((how, what))), (how, what)
         except Exception:
             pass
 
@@ -155,43 +162,101 @@ def _try_find_select_in_context(driver):
     for how, what in CANDS_COMBO:
         try:
             el = WebDriverWait(driver, 3).until(EC.presence_of_element_located((how, what)))
-            return el
+            return el, (how, what)
         except Exception:
             pass
 
     return None
 
+# cache ผลการค้นหา: locator + เส้นทาง iframe (index) ที่เจอครั้งแรก ใช้ร่วมทุก driver
+# และ element ล่าสุดของแต่ละ driver (ตรวจด้วย command เดียว; stale หลัง refresh/เปลี่ยนหน้า)
+_select_hint: Optional[Tuple[Tuple[str, str], Tuple[int, ...]]] = None
+_select_el: Dict[int, object] = {}
+
+def _enter_frames(driver, path: Tuple[int, ...]) -> bool:
+    driver.switch_to.default_content()
+    for idx in path:
+        frames = driver.find_elements(By.TAG_NAME, "iframe")
+        if idx >= len(frames):
+            return False
+        driver.switch_to.frame(frames[idx])
+    return True
+
+def _cached_select(driver):
+    el = _select_el.get(id(driver))
+    if el is not None:
+        try:
+            el.is_enabled()
+            return el
+        except Exception:
+            pass
+    if _select_hint is None:
+        return None
+    locator, path = _select_hint
+    try:
+        if _enter_frames(driver, path):
+            return WebDriverWait(driver, SELECT_REVALIDATE_TIMEOUT).until(EC.presence_of_element_located(locator))
+    except Exception:
+        pass
+    return None
+
 def find_province_select(driver):
+    """
+    ใช้ element/locator ที่ cache ไว้ก่อน ค้นเต็ม (ทุก candidate + ทุก iframe) เฉพาะเมื่อ cache ใช้ไม่ได้
+    เจอใน iframe -> driver จะค้างอยู่ใน frame นั้นเพื่อให้ใช้ element ต่อได้
+    """
+    global _select_hint
+    with metrics.phase(metrics.SELECTOR):
+        el = _cached_select(driver)
+        if el is None:
+            found = _find_province_select(driver)
+            if found:
+                el, locator, path = found
+                _select_hint = (locator, path)
+        if el is None:
+            _select_el.pop(id(driver), None)
+        else:
+            _select_el[id(driver)] = el
+        return el
+
+def _find_province_select(driver):
     # search default
-    with _default_content(driver):
-        el = _try_find_select_in_context(driver)
-        if el: return el
+    driver.switch_to.default_content()
+    found = _try_find_select_in_context(driver)
+    if found:
+        return found[0], found[1], ()
 
     # DFS ทุก iframe (ลึกสุด 4)
-    def _dfs(depth=0, max_depth=4):
-        if depth > max_depth:
+    def _dfs(path=(), max_depth=4):
+        if len(path) > max_depth:
             return None
         frames = driver.find_elements(By.TAG_NAME, "iframe")
-        for fr in frames:
+        for i, fr in enumerate(frames):
             try:
                 driver.switch_to.frame(fr)
-                el = _try_find_select_in_context(driver)
-                if el: return el
-                deeper = _dfs(depth+1, max_depth)
-                if deeper: return deeper
+                found = _try_find_select_in_context(driver)
+                if found:
+                    return found[0], found[1], path + (i,)
+                deeper = _dfs(path + (i,), max_depth)
+                if deeper:
+                    return deeper
+                driver.switch_to.parent_frame()
             except Exception:
-                pass
-            finally:
-                driver.switch_to.default_content()
+                _enter_frames(driver, path)
         return None
 
-    with _default_content(driver):
-        return _dfs()
+    try:
+        found = _dfs()
+    except Exception:
+        found = None
+    if not found:
+        driver.switch_to.default_content()
+    return found
 
 def _scroll_into_view(driver, el):
     try:
         driver.execute_script("arguments[0].scrollIntoView({block:'center'});", el)
-        time.sleep(0.2)
+        wait_animation_frame(driver)
     except Exception:
         pass
 
@@ -199,27 +264,21 @@ def _scroll_into_view(driver, el):
 # SELENIUM BOOTSTRAP
 # ======================================================================
 def make_driver() -> webdriver.Chrome:
-    opt = Options()
-    opt.add_argument("--headless=new")
-    opt.add_argument("--no-sandbox")
-    opt.add_argument("--disable-dev-shm-usage")
-    opt.add_argument("--window-size=1920,1080")
-    # เพิ่มความเสถียรบน CI
-    opt.add_argument("--lang=th-TH")
-    opt.add_argument("--disable-blink-features=AutomationControlled")
-    opt.add_argument("--user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
-                     "(KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36")
-    opt.page_load_strategy = PAGE_LOAD_STRATEGY
-
-    drv = webdriver.Chrome(options=opt)  # Selenium Manager จะจัดการ chromedriver
-    drv.set_page_load_timeout(PAGELOAD_TIMEOUT)
-    drv.set_script_timeout(SCRIPT_TIMEOUT)
-    return drv
+    # Selenium Manager จะจัดการ chromedriver
+    return make_chrome(
+        window_size="1920,1080",
+        # เพิ่มความเสถียรบน CI
+        extra_args=("--lang=th-TH", "--disable-blink-features=AutomationControlled"),
+        page_load_strategy=PAGE_LOAD_STRATEGY,
+        page_load_timeout=PAGELOAD_TIMEOUT,
+        script_timeout=SCRIPT_TIMEOUT,
+    )
 
 def safe_get(driver, url, timeout=PAGELOAD_TIMEOUT):
     try:
         driver.set_page_load_timeout(timeout)
-        driver.get(url)
+        with metrics.phase(metrics.PAGE_LOAD):
+            driver.get(url)
     except TimeoutException:
         try:
             driver.execute_script("window.stop();")
@@ -228,13 +287,13 @@ def safe_get(driver, url, timeout=PAGELOAD_TIMEOUT):
 
 def open_home_ready(driver) -> None:
     safe_get(driver, HOME, timeout=WAIT_MED)
-    wait_ui_idle()
+    wait_ui_idle(driver)
     try_dismiss_banners(driver)
 
     el = find_province_select(driver)
     if not el:
         for _ in range(2):
-            driver.refresh(); wait_ui_idle(); try_dismiss_banners(driver)
+            _refresh_settle(driver); try_dismiss_banners(driver)
             el = find_province_select(driver)
             if el: break
 
@@ -243,7 +302,30 @@ def open_home_ready(driver) -> None:
         log_iframes(driver)
         raise TimeoutException("ไม่พบตัวเลือกจังหวัดบนหน้าแรก (เก็บไฟล์ดีบักแล้ว)")
 
+def _keep_option(name: str, val: str) -> bool:
+    return bool(name) and bool(val) and not name.startswith("เลือก")
+
+def _read_mapping(driver, sel) -> Dict[str, str]:
+    # <select> อ่านทุก option ใน command เดียว ; combobox (ไม่มี .options) อ่านทีละ element
+    mapping = {n: v for n, v in province_cache.read_options(driver, sel) if _keep_option(n, v)}
+    if mapping:
+        return mapping
+    for op in sel.find_elements(By.TAG_NAME, "option"):
+        name = (op.text or "").strip()
+        val  = (op.get_attribute("value") or "").strip()
+        if _keep_option(name, val):
+            mapping[name] = val
+    return mapping
+
 def collect_mapping_from_select(driver) -> Dict[str, str]:
+    # cache (TTL) / เทียบ checksum กับการอ่าน option ครั้งเดียว -> ไม่ต้องอ่านแบบเต็มถ้ารายชื่อไม่เปลี่ยน
+    sel = find_province_select(driver)
+    if sel:
+        with metrics.phase(metrics.EXTRACT):
+            cached, _ = province_cache.lookup("tmd", driver, sel, keep=_keep_option)  # ไม่มีสถานะผูกกับรายชื่อ
+        if cached:
+            return dict(cached)
+
     MAX_TRIES = 6
     for _ in range(MAX_TRIES):
         sel = find_province_select(driver)
@@ -251,26 +333,22 @@ def collect_mapping_from_select(driver) -> Dict[str, str]:
             _scroll_into_view(driver, sel)
             try:
                 driver.execute_script("arguments[0].focus();arguments[0].click();", sel)
-                wait_ui_idle()
+                wait_ui_idle(driver)
             except Exception:
                 pass
 
             mapping: Dict[str, str] = {}
             try:
-                options = sel.find_elements(By.TAG_NAME, "option")
-                for op in options:
-                    name = (op.text or "").strip()
-                    val  = (op.get_attribute("value") or "").strip()
-                    if not name or not val or name.startswith("เลือก"):
-                        continue
-                    mapping[name] = val
+                with metrics.phase(metrics.EXTRACT):
+                    mapping = _read_mapping(driver, sel)
             except StaleElementReferenceException:
                 mapping = {}
 
             if len(mapping) >= 10:
+                province_cache.save("tmd", list(mapping.items()))
                 return mapping
 
-        driver.refresh(); wait_ui_idle(); try_dismiss_banners(driver)
+        _refresh_settle(driver); try_dismiss_banners(driver)
 
     dump_dom_debug(driver, "map_failed")
     log_iframes(driver)
@@ -278,15 +356,26 @@ def collect_mapping_from_select(driver) -> Dict[str, str]:
 
 def _js_set_select_value(driver, sel, value: str) -> bool:
     try:
-        driver.execute_script("""
+        ok = driver.execute_script("""
             const s = arguments[0], v = arguments[1];
             s.value = v;
+            if (s.options && s.value !== v) return false;
             s.dispatchEvent(new Event('input', {bubbles:true}));
             s.dispatchEvent(new Event('change', {bubbles:true}));
+            return true;
         """, sel, value)
-        return True
     except Exception:
         return False
+    if ok is False:
+        # ไม่มี option นี้แล้ว -> รายชื่อใน cache เก่า (รอบถัดไปอ่านใหม่ ไม่เลือกจังหวัดผิด)
+        province_cache.invalidate("tmd")
+    return ok is not False
+
+def _wait_province_loaded(driver):
+    # รอ request ของจังหวัดใหม่จบ แล้วรอ DOM render นิ่ง
+    with metrics.phase(metrics.PAGE_LOAD):
+        wait_network_idle(driver, idle_ms=250, timeout=UI_IDLE_TIMEOUT)
+        wait_ui_idle(driver, quiet_ms=150)
 
 def select_province(driver, province_name: str, mapping: Dict[str, str]) -> bool:
     val = mapping.get(province_name, "")
@@ -298,33 +387,39 @@ def select_province(driver, province_name: str, mapping: Dict[str, str]) -> bool
         return False
 
     _scroll_into_view(driver, sel)
+    install_network_hook(driver)
 
     # 1) วิธีปกติ
     try:
         from selenium.webdriver.support.ui import Select
         Select(sel).select_by_value(val)
-        time.sleep(0.6)
+        _wait_province_loaded(driver)
         return True
     except Exception:
         pass
 
     # 2) สำรองด้วย JS
     if _js_set_select_value(driver, sel, val):
-        time.sleep(0.6)
+        _wait_province_loaded(driver)
         return True
 
     return False
 
 def wait_rain_info(driver):
-    WebDriverWait(driver, WAIT_MED).until(
-        EC.presence_of_element_located((By.XPATH, "//div[contains(text(),'%')]"))
-    )
+    with metrics.phase(metrics.PAGE_LOAD):
+        WebDriverWait(driver, WAIT_MED).until(
+            EC.presence_of_element_located((By.XPATH, "//div[contains(text(),'%')]"))
+        )
 
 def _extract_percent(text: str) -> Optional[float]:
     m = RE_INT.search(text or "")
     return (int(m.group(1)) / 100.0) if m else None
 
 def parse_today_fast(driver, province_name: str) -> Optional[Dict[str, str]]:
+    with metrics.phase(metrics.EXTRACT):
+        return _parse_today(driver, province_name)
+
+def _parse_today(driver, province_name: str) -> Optional[Dict[str, str]]:
     cards = driver.find_elements(By.CSS_SELECTOR, "div.card.card-shadow.text-center")
     for c in cards:
         try:
@@ -353,6 +448,46 @@ def parse_today_fast(driver, province_name: str) -> Optional[Dict[str, str]]:
 # ======================================================================
 # INTERNAL: scrape loop
 # ======================================================================
+def _limiter() -> rate_limit.HostLimiter:
+    return rate_limit.for_host(HOME, rate=TMD_RATE)
+
+def _scrape_one(driver, name: str, retries_per_province: int, mapping: Dict[str, str], tag: str) -> Optional[Dict[str, str]]:
+    limiter = _limiter()
+    for attempt in range(retries_per_province):
+        try:
+            limiter.acquire()
+            t0 = time.perf_counter()
+            if not select_province(driver, name, mapping):
+                raise RuntimeError("ตั้งค่า select ไม่สำเร็จ")
+
+            with metrics.phase(metrics.PAGE_LOAD):
+                WebDriverWait(driver, WAIT_MED).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, "div.card.card-shadow.text-center"))
+                )
+            wait_rain_info(driver)
+
+            row = parse_today_fast(driver, name)
+            if row:
+                metrics.count("rows")
+                limiter.success(time.perf_counter() - t0)
+                print(f"{tag} {name} ✔")
+                return row
+            raise RuntimeError("อ่าน card วันนี้ ไม่สำเร็จ")
+
+        except StaleElementReferenceException:
+            limiter.failure("stale")
+            _refresh_settle(driver)
+        except TimeoutException:
+            limiter.failure("timeout")
+            _refresh_settle(driver)
+        except Exception as e:
+            limiter.failure("error")
+            if attempt < retries_per_province - 1:
+                _refresh_settle(driver)
+            else:
+                print(f"{tag} {name} ✖ {e}")
+    return None
+
 def _try_scrape_provinces(driver, names: List[str], retries_per_province: int, mapping: Dict[str, str]) -> Tuple[List[Dict[str, str]], List[str]]:
     rows: List[Dict[str, str]] = []
     failed: List[str] = []
@@ -360,54 +495,146 @@ def _try_scrape_provinces(driver, names: List[str], retries_per_province: int, m
     print(f"เริ่มดึง {total} จังหวัด")
 
     for i, name in enumerate(names, 1):
-        ok = False
-        for attempt in range(retries_per_province):
-            try:
-                if not select_province(driver, name, mapping):
-                    raise RuntimeError("ตั้งค่า select ไม่สำเร็จ")
-
-                WebDriverWait(driver, WAIT_MED).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "div.card.card-shadow.text-center"))
-                )
-                wait_rain_info(driver)
-
-                row = parse_today_fast(driver, name)
-                if row:
-                    rows.append(row)
-                    ok = True
-                    print(f"[{i}/{total}] {name} ✔")
-                    time.sleep(random.uniform(SLEEP_MIN, SLEEP_MAX))
-                    break
-                else:
-                    raise RuntimeError("อ่าน card วันนี้ ไม่สำเร็จ")
-
-            except (StaleElementReferenceException, TimeoutException):
-                driver.refresh(); time.sleep(0.8)
-            except Exception as e:
-                if attempt < retries_per_province - 1:
-                    driver.refresh(); time.sleep(0.8)
-                else:
-                    print(f"[{i}/{total}] {name} ✖ {e}")
-
-        if not ok:
+        row = _scrape_one(driver, name, retries_per_province, mapping, f"[{i}/{total}]")
+        if row:
+            rows.append(row)
+        else:
             failed.append(name)
 
     return rows, failed
 
+def _try_scrape_provinces_pool(drivers: List[webdriver.Chrome], names: List[str], retries_per_province: int,
+                               mapping: Dict[str, str]) -> Tuple[List[Dict[str, str]], List[str]]:
+    """แจกจังหวัดจากคิวกลางให้ทุก driver (หนึ่ง thread ต่อหนึ่ง driver)"""
+    if len(drivers) <= 1:
+        return _try_scrape_provinces(drivers[0], names, retries_per_province, mapping)
+
+    total = len(names)
+    print(f"เริ่มดึง {total} จังหวัด ด้วย {len(drivers)} workers")
+
+    q: "queue.Queue[Tuple[int, str]]" = queue.Queue()
+    for i, name in enumerate(names, 1):
+        q.put((i, name))
+
+    results: Dict[str, Dict[str, str]] = {}
+    lock = threading.Lock()
+
+    def _worker(wid: int, driver) -> None:
+        while True:
+            try:
+                i, name = q.get_nowait()
+            except queue.Empty:
+                return
+            row = _scrape_one(driver, name, retries_per_province, mapping, f"[w{wid}][{i}/{total}]")
+            if row:
+                with lock:
+                    results[name] = row
+
+    threads = [threading.Thread(target=_worker, args=(wid, drv), daemon=True)
+               for wid, drv in enumerate(drivers, 1)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    # คงลำดับตามรายชื่อจังหวัดเดิม
+    rows = [results[n] for n in names if n in results]
+    failed = [n for n in names if n not in results]
+    return rows, failed
+
+def _make_ready_driver() -> webdriver.Chrome:
+    drv = make_driver()
+    try:
+        open_home_ready(drv)
+        return drv
+    except Exception:
+        try:
+            drv.quit()
+        except Exception:
+            pass
+        raise
+
+def _start_extra_drivers(n: int) -> List[webdriver.Chrome]:
+    """เปิด Chrome เพิ่ม n ตัวพร้อมกัน; ตัวที่เปิดไม่สำเร็จจะถูกข้าม"""
+    if n <= 0:
+        return []
+    drivers: List[webdriver.Chrome] = []
+    lock = threading.Lock()
+
+    def _start(wid: int) -> None:
+        try:
+            drv = _make_ready_driver()
+        except Exception as e:
+            print(f"⚠️ เปิด worker {wid} ไม่สำเร็จ: {e}")
+            return
+        with lock:
+            drivers.append(drv)
+
+    threads = [threading.Thread(target=_start, args=(wid,), daemon=True) for wid in range(2, n + 2)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return drivers
+
 # ======================================================================
-# MAIN
+# ENGINES: HTTP (ไม่เปิด Chrome) / Selenium
 # ======================================================================
-def main():
+def _scrape_via_http() -> Tuple[List[Dict[str, str]], Optional[List[str]]]:
+    """คืน (rows, จังหวัดที่ยังขาด) ; ถ้าใช้ HTTP ไม่ได้เลยคืน ([], None) ให้ Selenium ทำทั้งหมด"""
+    template = tmd_http.load_endpoint()
+    if not template:
+        print("ℹ️ ยังไม่รู้ endpoint ของ TMD -> ใช้ Selenium (จะค้นหา endpoint ระหว่างรัน)")
+        return [], None
+    try:
+        session = tmd_http.make_session(TMD_WORKERS)
+        mapping = tmd_http.fetch_province_mapping(session, HOME)
+    except Exception as e:
+        print(f"⚠️ HTTP engine ใช้ไม่ได้ ({e}) -> ใช้ Selenium")
+        return [], None
+    if len(mapping) < 10:
+        print("⚠️ อ่านรายชื่อจังหวัดผ่าน HTTP ไม่ได้ -> ใช้ Selenium")
+        return [], None
+
+    names = list(mapping.keys())
+    rows, failed = tmd_http.scrape_provinces(session, template, mapping, names, workers=TMD_WORKERS)
+    print(f"HTTP สำเร็จ {len(rows)} จังหวัด, พลาด {len(failed)} จังหวัด")
+    return rows, failed
+
+def _discover_http_endpoint(driver, mapping: Dict[str, str]) -> bool:
+    """ค้นหา endpoint ที่ select จังหวัดเรียก แล้ว cache ไว้ให้รอบถัดไปไม่ต้องเปิด Chrome"""
+    if not mapping or tmd_http.load_endpoint():
+        return False
+    name, value = next(iter(mapping.items()))
+    try:
+        tpl = tmd_http.discover_endpoint(driver, lambda: select_province(driver, name, mapping), value)
+        if tpl and tmd_http.fetch_today(tmd_http.make_session(1), tpl, value, name):
+            tmd_http.save_endpoint(tpl)
+            print(f"💾 พบ endpoint TMD: {tpl}")
+        else:
+            print("⚠️ ค้นหา endpoint TMD ไม่สำเร็จ")
+    except Exception as e:
+        print("⚠️ ค้นหา endpoint TMD ล้มเหลว:", e)
+    return True
+
+def _scrape_via_selenium(only: Optional[List[str]] = None) -> List[Dict[str, str]]:
     driver = make_driver()
+    drivers: List[webdriver.Chrome] = [driver]
     all_rows: List[Dict[str, str]] = []
     failed: List[str] = []
 
     try:
         open_home_ready(driver)
         mapping = collect_mapping_from_select(driver)
+        if TMD_ENGINE == "http" and _discover_http_endpoint(driver, mapping):
+            open_home_ready(driver)
         names = list(mapping.keys())
+        if only is not None:
+            wanted = set(only)
+            names = [n for n in names if n in wanted]
         print(f"พบจังหวัด {len(names)} รายการ")
 
+        n_workers = min(TMD_WORKERS, len(names))
+        if n_workers > 1:
+            drivers += _start_extra_drivers(n_workers - 1)
+            print(f"ใช้ {len(drivers)} workers")
+
         to_try = names[:]
         pass_num = 0
         prev_failed_count: Optional[int] = None
@@ -415,7 +642,7 @@ def main():
         while to_try and pass_num < MAX_SCRAPE_PASSES:
             pass_num += 1
             print(f"\nเริ่มรอบที่ {pass_num} (ลอง {len(to_try)} จังหวัด)")
-            rows, failed_this = _try_scrape_provinces(driver, to_try, RETRIES_PER_PROVINCE, mapping)
+            rows, failed_this = _try_scrape_provinces_pool(drivers, to_try, RETRIES_PER_PROVINCE, mapping)
             all_rows.extend(rows)
             print(f"รอบ {pass_num} สำเร็จ {len(rows)} จังหวัด, พลาด {len(failed_this)} จังหวัด")
 
@@ -434,21 +661,43 @@ def main():
         else:
             failed = to_try if to_try else []
     finally:
-        try:
-            driver.quit()
-        except Exception:
-            pass
+        for drv in drivers:
+            try:
+                drv.quit()
+            except Exception:
+                pass
+
+    if failed:
+        print(f"⚠️ จังหวัดที่ดึงไม่สำเร็จ: {', '.join(failed)}")
+    print(f"🚦 {_limiter().summary()}")
+    return all_rows
+
+# ======================================================================
+# MAIN
+# ======================================================================
+def main():
+    all_rows: List[Dict[str, str]] = []
+    pending: Optional[List[str]] = None  # None = ให้ Selenium ดึงทุกจังหวัด
+
+    if TMD_ENGINE == "http":
+        all_rows, pending = _scrape_via_http()
+
+    # Selenium เป็น fallback สำหรับจังหวัดที่ HTTP ดึงไม่ได้
+    if pending is None or pending:
+        all_rows.extend(_scrape_via_selenium(pending))
 
     new_df = pd.DataFrame(all_rows)
 
     if not new_df.empty:
-        # เรียงตาม DateTime (ใช้คอลัมน์ช่วย ไม่แก้ค่าเดิม)
-        if "DateTime" in new_df.columns:
-            sort_key = pd.to_datetime(new_df["DateTime"], errors="coerce")
-            new_df = new_df.assign(__dt=sort_key).sort_values("__dt").drop(columns="__dt")
-
-        new_df.to_csv(CSV_OUT, index=False, encoding="utf-8-sig")
-        print(f"\n📝 บันทึกข้อมูลลงไฟล์: {CSV_OUT} | rows={len(new_df)} (เรียงตาม DateTime แล้ว)")
+        with metrics.phase(metrics.MERGE):
+            # เรียงตาม DateTime (ใช้คอลัมน์ช่วย ไม่แก้ค่าเดิม)
+            if "DateTime" in new_df.columns:
+                sort_key = pd.to_datetime(new_df["DateTime"], errors="coerce")
+                new_df = new_df.assign(__dt=sort_key).sort_values("__dt").drop(columns="__dt")
+
+            new_df.to_csv(CSV_OUT, index=False, encoding="utf-8-sig")
+            print(f"\n📝 บันทึกข้อมูลลงไฟล์: {CSV_OUT} | rows={len(new_df)} (เรียงตาม DateTime แล้ว)")
+            storage.save_frame(new_df, "tmd_forecast", date_col="DateTime", date_format="%Y-%m-%d %H:%M:%S")
     else:
         print("⚠️ ไม่ได้ข้อมูลใหม่")
 
@@ -456,4 +705,5 @@ def main():
 # ENTRY
 # ======================================================================
 if __name__ == "__main__":
-    main()
+    with metrics.run("scrap1"):
+        main()
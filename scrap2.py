@@ -5,23 +5,28 @@ import os
 import re
 import time
 from datetime import datetime
-from typing import List, Tuple, Optional
+from typing import Iterator, List, Tuple, Optional
 
 import pandas as pd
 
 # -------- Selenium --------
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
 # -------- Google Drive API (Service Account) --------
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload
-from io import BytesIO
+
+import gdrive
+from mui_table import read_mui_table
+import ntw_api
+from driver_factory import make_chrome
+import storage
+import metrics
+import rate_limit
+from schema import WATERLEVEL_SCHEMA, apply_schema
+from incremental_merge import append_new_rows, compact_chunks, needs_compaction
 
 # ------------------------------- Runtime Config --------------------------------
 URL: str = "https://nationalthaiwater.onwr.go.th/waterlevel"
@@ -33,10 +38,14 @@ SERVICE_ACCOUNT_FILE: str = r"C:\Project_End\CodeProject\githubproject-467507-65
 DRIVE_FOLDER_ID: str = "1YV69Vah7gNvXbYZNKwjQyxQXT36MWjRH"
 CSV_MIMETYPE: str = "text/csv"
 DRIVE_FILE_ID: Optional[str] = "1zfUZeqp5qJrKxtgHu6XmqrN9omvaxVuP"
+DRIVE_FILE_ID_OVERRIDE: Optional[str] = os.getenv("DRIVE_FILE_ID") or DRIVE_FILE_ID
 
 PAGE_TIMEOUT: int = 40
 CLICK_TIMEOUT: int = 15
-SLEEP_BETWEEN_PAGES: float = 1.0
+# ความถี่เริ่มต้นของการเปลี่ยนหน้า (หน้า/วินาที) ; ค่าเดียวกับ scrap3/ntw_api (host เดียวกัน)
+NTW_RATE: float = ntw_api.NTW_RATE
+# selenium = กด Next ทีละหน้า (ค่าเดิม) | http = ดึง JSON API ตรง (fallback เป็น Selenium + ค้นหา endpoint)
+NTW_ENGINE: str = os.getenv("NTW_ENGINE", "selenium").lower()
 
 # ================= Email Notify (SMTP) =================
 EMAIL_ENABLED: bool = os.getenv("EMAIL_ENABLED", "true").lower() == "true"
@@ -81,141 +90,155 @@ def _check_prereq() -> None:
         raise ValueError("ต้องตั้ง DRIVE_FILE_ID (DRIVE_FILE_ID_OVERRIDE) เป็น fileId ของไฟล์ปลายทาง")
 
 def build_drive_service():
-    scopes = ["https://www.googleapis.com/auth/drive"]
-    creds = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=scopes)
-    return build("drive", "v3", credentials=creds, cache_discovery=False)
+    return gdrive.get_service(SERVICE_ACCOUNT_FILE)
+
+def _no_access_error(e: HttpError) -> RuntimeError:
+    return RuntimeError(f"Service Account ไม่มีสิทธิ์หรือหาไฟล์ไม่พบ (fileId={DRIVE_FILE_ID_OVERRIDE})")
 
-def drive_read_csv_as_df(service, file_id: str) -> Optional[pd.DataFrame]:
-    """ดาวน์โหลด CSV จาก Drive แล้วแปลงเป็น DataFrame (ถ้าไฟล์ว่าง คืน DataFrame ว่าง)"""
+def drive_history_chunks(service, file_id: str, df_new: pd.DataFrame,
+                         schema: Optional[dict] = None) -> Iterator[pd.DataFrame]:
+    """
+    ไฟล์รวมบน Drive ทีละก้อน (stream + แปลง dtype ทีละก้อน) ตามด้วย df_new ให้ compact_chunks
+    คอลัมน์ = คอลัมน์ของ df_new ที่มีในไฟล์เดิมด้วย ; ไฟล์ว่าง = df_new อย่างเดียว
+    ดาวน์โหลดล้มตั้งแต่ก้อนแรก = ใช้ df_new อย่างเดียว ; ล้มกลางไฟล์ = raise (ไม่เขียนประวัติที่ขาดหายทับ)
+    """
+    common, started = None, False
     try:
-        req = service.files().get_media(fileId=file_id)
-        fh = BytesIO()
-        downloader = MediaIoBaseDownload(fh, req)
-        done = False
-        while not done:
-            _, done = downloader.next_chunk()
-        fh.seek(0)
-        data = fh.read()
-        if not data:
-            return pd.DataFrame()
-        try:
-            text = data.decode("utf-8-sig")
-        except UnicodeDecodeError:
-            text = data.decode("utf-8", errors="replace")
-        if not text.strip():
-            return pd.DataFrame()
-        return pd.read_csv(pd.io.common.StringIO(text))
+        for chunk in gdrive.read_csv_chunks(service, file_id, dtype=str, keep_default_na=False):
+            if common is None:
+                common = [c for c in df_new.columns if c in chunk.columns]
+                if not common:
+                    break
+            started = True
+            chunk = chunk[common]
+            yield apply_schema(chunk, schema) if schema else chunk
     except HttpError as e:
+        if gdrive.is_no_access(e):
+            raise _no_access_error(e) from e
+        if started:
+            raise
         print(f"⚠️ ดาวน์โหลดไฟล์จาก Drive ไม่สำเร็จ: {e}")
-        return None
     except Exception as e:
-        print(f"⚠️ อ่าน CSV เป็น DataFrame ไม่สำเร็จ: {e}")
-        return None
+        if started:
+            raise
+        print(f"⚠️ อ่าน CSV จาก Drive ไม่สำเร็จ: {e}")
+    yield df_new[common] if common else df_new
 
 def drive_merge_and_update_df_update_only(
     df_new: pd.DataFrame,
     key_cols: tuple[str, ...],
-    local_out_path: Optional[str] = None,
+    local_out_path: str = CSV_OUT,
 ) -> tuple[str, str, int]:
     """
-    รวม df_new กับไฟล์เดิม (DRIVE_FILE_ID_OVERRIDE) แล้ว 'update' กลับไฟล์เดิมเท่านั้น
+    รวม df_new เข้าไฟล์รวมโลคอลแบบ incremental แล้ว 'update' กลับไฟล์เดิม (DRIVE_FILE_ID_OVERRIDE) เท่านั้น
+    - ปกติ: ต่อท้ายเฉพาะแถวที่ key ใหม่ (ไม่ดาวน์โหลด/ไม่ dedupe ทั้งประวัติ)
+    - รอบ compact (ทุก COMPACT_EVERY_DAYS หรือไฟล์โลคอล/index หาย): ดาวน์โหลดจาก Drive แล้วเขียนใหม่ทั้งก้อน
     - ไม่ค้นหา/ไม่สร้างใหม่ ถ้าเข้าถึงไฟล์เดิมไม่ได้ -> raise
     """
     _check_prereq()
     service = build_drive_service()
 
-    # ตรวจสิทธิ์/มีอยู่จริงของไฟล์เดิม
+    with metrics.phase(metrics.MERGE):
+        if needs_compaction(local_out_path):
+            # ดาวน์โหลดไฟล์เดิมทีละก้อนเข้า compact แบบ stream (ถือแค่ hash ของแถว + 1 ก้อน)
+            chunks = drive_history_chunks(service, DRIVE_FILE_ID_OVERRIDE, df_new, WATERLEVEL_SCHEMA)
+            total_rows = compact_chunks(chunks, key_cols, local_out_path, WATERLEVEL_SCHEMA)
+            print(f"🧹 compact ไฟล์รวม: {total_rows} แถว")
+        else:
+            added, total_rows = append_new_rows(df_new, key_cols, local_out_path, WATERLEVEL_SCHEMA)
+            print(f"➕ ต่อท้ายแถวใหม่ {added} แถว (รวม {total_rows})")
+
+    # อัปเดตไฟล์เดิมด้วยไฟล์รวมโลคอล (ข้ามถ้าเนื้อไฟล์เท่ากับที่อัปโหลดล่าสุด)
+    # สิทธิ์/การมีอยู่ของไฟล์ตรวจจาก error ของ get_media/update เอง (ไม่ต้อง files().get แยก)
     try:
-        service.files().get(fileId=DRIVE_FILE_ID_OVERRIDE, fields="id,name").execute()
+        with metrics.phase(metrics.UPLOAD):
+            action, file_id = gdrive.upload(service, local_out_path, file_id=DRIVE_FILE_ID_OVERRIDE,
+                                            mimetype=CSV_MIMETYPE)
     except HttpError as e:
-        raise RuntimeError(
-            f"Service Account ไม่มีสิทธิ์หรือหาไฟล์ไม่พบ (fileId={DRIVE_FILE_ID_OVERRIDE})"
-        ) from e
-
-    # ดาวน์โหลดไฟล์เดิมมารวม
-    df_old = drive_read_csv_as_df(service, DRIVE_FILE_ID_OVERRIDE)
-    if df_old is None or df_old.empty:
-        df_merged = df_new.copy()
-    else:
-        common = [c for c in df_new.columns if c in df_old.columns]
-        df_merged = pd.concat([df_old[common], df_new[common] if common else df_new], ignore_index=True)
-
-    # ลบซ้ำตาม key
-    effective_keys = [c for c in key_cols if c in df_merged.columns]
-    df_merged = df_merged.drop_duplicates(subset=effective_keys, keep="last") if effective_keys \
-                else df_merged.drop_duplicates(keep="last")
-
-    # บันทึกโลคอล (optional)
-    if local_out_path:
-        os.makedirs(os.path.dirname(local_out_path), exist_ok=True)
-        df_merged.to_csv(local_out_path, index=False, encoding="utf-8-sig")
-
-    # อัปเดตไฟล์เดิม (ต้องส่งเป็น bytes)
-    buf = BytesIO()
-    csv_bytes = df_merged.to_csv(index=False, encoding="utf-8-sig").encode("utf-8-sig")
-    buf.write(csv_bytes); buf.seek(0)
-    media = MediaIoBaseUpload(buf, mimetype=CSV_MIMETYPE, resumable=True)
-
-    updated = service.files().update(
-        fileId=DRIVE_FILE_ID_OVERRIDE,
-        media_body=media,
-        supportsAllDrives=True,
-    ).execute()
-
-    return "update", updated["id"], len(df_merged)
+        if gdrive.is_no_access(e):
+            raise _no_access_error(e) from e
+        raise
+    return action, file_id, total_rows
 
 # ============================= 3) Selenium scraper =============================
 def make_driver() -> webdriver.Chrome:
-    opt = Options()
-    opt.add_argument("--headless=new")
-    opt.add_argument("--no-sandbox")
-    opt.add_argument("--disable-dev-shm-usage")
-    opt.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
+    return make_chrome(
+        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                   "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+        window_size=None,
+        page_load_timeout=60,
     )
-    drv = webdriver.Chrome(options=opt)
-    drv.set_page_load_timeout(60)
-    return drv
+
+def _add_rows(all_data: list[list[str]], table_rows: list[list[str]], current_date: str) -> None:
+    for cols in table_rows:
+        if len(cols) < 5:
+            continue
+        # เติมคอลัมน์วันที่ท้ายตาราง
+        if len(cols) == 9:
+            cols[-1] = current_date
+        else:
+            cols.append(current_date)
+        all_data.append(cols)
+
+def scrape_waterlevel_http() -> list[list[str]]:
+    """ดึงทั้งตารางจาก JSON API (raise ถ้ายังไม่มี endpoint/ดึงไม่ได้)"""
+    all_data: list[list[str]] = []
+    with metrics.phase(metrics.EXTRACT):
+        table = ntw_api.fetch_table("waterlevel")
+    _add_rows(all_data, table, datetime.now().strftime("%m/%d/%y"))
+    print(f"🌐 HTTP: ได้ {len(all_data)} แถว")
+    return all_data
 
 def scrape_waterlevel() -> tuple[list[list[str]], float]:
     driver = make_driver()
     start_time = time.time()
     try:
-        driver.get(URL)
-        rows = WebDriverWait(driver, PAGE_TIMEOUT).until(
-            EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".MuiTable-root tbody tr"))
-        )
+        with metrics.phase(metrics.PAGE_LOAD):
+            driver.get(URL)
+            rows = WebDriverWait(driver, PAGE_TIMEOUT).until(
+                EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".MuiTable-root tbody tr"))
+            )
         all_data: list[list[str]] = []
         current_date = datetime.now().strftime("%m/%d/%y")
+        if NTW_ENGINE == "http" and not ntw_api.load_endpoint("waterlevel"):
+            # ค้นหา endpoint จากหน้าแรกไว้ให้รอบถัดไป
+            try:
+                ntw_api.discover(driver, "waterlevel", read_mui_table(driver))
+            except Exception as e:
+                print("⚠️ ค้นหา endpoint waterlevel ล้มเหลว:", e)
+        limiter = rate_limit.for_host(URL, rate=NTW_RATE)
         while True:
-            for row in rows:
-                cols = [c.text.strip() for c in row.find_elements(By.CSS_SELECTOR, "td")]
-                if len(cols) < 5:
-                    continue
-                # เติมคอลัมน์วันที่ท้ายตาราง
-                if len(cols) == 9:
-                    cols[-1] = current_date
-                else:
-                    cols.append(current_date)
-                all_data.append(cols)
+            with metrics.phase(metrics.EXTRACT):
+                table = read_mui_table(driver)
+            _add_rows(all_data, table, current_date)
+            metrics.count("pages")
+            clicked = False
             try:
-                next_btn = WebDriverWait(driver, CLICK_TIMEOUT).until(
-                    EC.element_to_be_clickable((By.XPATH, "//span[@title='Next Page']/button"))
-                )
-                if not next_btn.is_enabled():
+                with metrics.phase(metrics.SELECTOR):
+                    next_btn = WebDriverWait(driver, CLICK_TIMEOUT).until(
+                        EC.element_to_be_clickable((By.XPATH, "//span[@title='Next Page']/button"))
+                    )
+                    enabled = next_btn.is_enabled()
+                if not enabled:
                     break
                 first_row_old = rows[0]
+                limiter.acquire()
+                t_click = time.perf_counter()
                 driver.execute_script("arguments[0].click();", next_btn)
-                WebDriverWait(driver, PAGE_TIMEOUT).until(EC.staleness_of(first_row_old))
-                rows = WebDriverWait(driver, PAGE_TIMEOUT).until(
-                    EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".MuiTable-root tbody tr"))
-                )
-                if SLEEP_BETWEEN_PAGES > 0:
-                    time.sleep(SLEEP_BETWEEN_PAGES)
+                clicked = True
+                with metrics.phase(metrics.PAGE_LOAD):
+                    WebDriverWait(driver, PAGE_TIMEOUT).until(EC.staleness_of(first_row_old))
+                    rows = WebDriverWait(driver, PAGE_TIMEOUT).until(
+                        EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".MuiTable-root tbody tr"))
+                    )
+                limiter.success(time.perf_counter() - t_click)
                 print("➡️ Next Page Loaded")
             except Exception:
+                # หาปุ่มไม่เจอ = หน้าสุดท้าย ; คลิกแล้วหน้าไม่เปลี่ยน = เว็บช้า/ล้ม -> ลด rate รอบหน้า
+                if clicked:
+                    limiter.failure("timeout")
                 break
+        print(f"🚦 {limiter.summary()}")
         return all_data, start_time
     finally:
         driver.quit()
@@ -245,18 +268,23 @@ def save_and_upload(all_data: list[list[str]]) -> tuple[int, Optional[str], Opti
     if len(headers) < max_cols:
         headers += [f"Extra_{i + 1}" for i in range(max_cols - len(headers))]
 
-    df_new = pd.DataFrame(all_data, columns=headers)
-    # ถ้าค่าใน Station เป็นภาษาไทย ให้ดึงเฉพาะส่วนตัวอักษรไทยออกมา (เลือกจะคงไว้ก็ได้)
-    df_new["Station"] = df_new["Station"].apply(extract_thai)
+    with metrics.phase(metrics.PARSE):
+        df_new = pd.DataFrame(all_data, columns=headers)
+        # ถ้าค่าใน Station เป็นภาษาไทย ให้ดึงเฉพาะส่วนตัวอักษรไทยออกมา (เลือกจะคงไว้ก็ได้)
+        df_new["Station"] = df_new["Station"].apply(extract_thai)
+        # แปลงเป็น dtype จริง (float32/category/datetime, ค่าว่าง = NA)
+        df_new = apply_schema(df_new, WATERLEVEL_SCHEMA)
+    metrics.count("rows", len(df_new))
+    storage.save_frame(df_new, "waterlevel", date_col="Data_Time")
 
     drive_action = None
     drive_file_id = None
     merged_rows = 0
+    # ✅ คีย์ลบซ้ำเป็นภาษาอังกฤษ
+    key_cols = ("Station", "Time", "Data_Time")
 
     if ENABLE_GOOGLE_DRIVE_UPLOAD:
         try:
-            # ✅ คีย์ลบซ้ำเป็นภาษาอังกฤษ
-            key_cols = ("Station", "Time", "Data_Time")
             drive_action, drive_file_id, merged_rows = drive_merge_and_update_df_update_only(
                 df_new=df_new,
                 key_cols=key_cols,
@@ -266,16 +294,26 @@ def save_and_upload(all_data: list[list[str]]) -> tuple[int, Optional[str], Opti
             return merged_rows, drive_action, drive_file_id
         except Exception as e:
             print("⚠️ อัปเดตกลับ Drive ล้มเหลว:", e)
-            df_new.to_csv(CSV_OUT, index=False, encoding="utf-8-sig")
-            return len(df_new), None, None
+            # ต่อท้ายซ้ำได้ปลอดภัย: แถวที่ลงไฟล์ไปแล้วจะถูก index ข้าม
+            with metrics.phase(metrics.MERGE):
+                _, merged_rows = append_new_rows(df_new, key_cols, CSV_OUT, WATERLEVEL_SCHEMA)
+            return merged_rows, None, None
     else:
-        df_new.to_csv(CSV_OUT, index=False, encoding="utf-8-sig")
-        print(f"💾 บันทึก {len[df_new]} แถว -> {os.path.abspath(CSV_OUT)}")
-        return len(df_new), None, None
+        with metrics.phase(metrics.MERGE):
+            added, merged_rows = append_new_rows(df_new, key_cols, CSV_OUT, WATERLEVEL_SCHEMA)
+        print(f"💾 บันทึก +{added} แถว -> {os.path.abspath(CSV_OUT)}")
+        return merged_rows, None, None
 
 # ==================================== 6) Main ====================================
 def main() -> None:
-    all_data, t0 = scrape_waterlevel()
+    all_data, t0 = None, time.time()
+    if NTW_ENGINE == "http":
+        try:
+            all_data = scrape_waterlevel_http()
+        except Exception as e:
+            print(f"⚠️ HTTP ไม่สำเร็จ ({e}) -> ใช้ Selenium")
+    if not all_data:
+        all_data, _ = scrape_waterlevel()
     rows_saved, drive_action, drive_file_id = save_and_upload(all_data)
     elapsed = time.time() - t0
 
@@ -295,7 +333,8 @@ def main() -> None:
 
 if __name__ == "__main__":
     try:
-        main()
+        with metrics.run("scrap2"):
+            main()
     except Exception as e:
         when = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         subject = f"[WaterLevel] FAILED @ {when}"
@@ -1,21 +1,33 @@
 import os
 import time
+import threading
 import pandas as pd
 from datetime import datetime
 
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
+
+from mui_table import read_mui_table, ROW_SELECTOR
+import ntw_api
+from driver_factory import make_chrome
+import storage
+import metrics
+import rate_limit
+from schema import apply_schema, dam_schema, csv_date_format
+from waits import wait_dom_quiet, first_row_text, wait_first_row_text_change
 
 # ================================== CONFIG ================================== #
 URL = "https://nationalthaiwater.onwr.go.th/dam"
-
-options = Options()
-options.add_argument("--headless=new")
-options.add_argument("--no-sandbox")
-options.add_argument("--disable-dev-shm-usage")
+PAGE_TIMEOUT = 15
+# ชื่อแท็บบนหน้าเว็บ -> dam_type (ชื่อไฟล์) ; dataset ของ ntw_api = "dam_<dam_type>"
+TABS = {"แหล่งน้ำขนาดใหญ่": "large", "แหล่งน้ำขนาดกลาง": "medium"}
+# selenium = กด Next ทีละหน้า (ค่าเดิม) | http = ดึง JSON API ตรง (fallback เป็น Selenium + ค้นหา endpoint)
+NTW_ENGINE = os.getenv("NTW_ENGINE", "selenium").lower()
+# ความถี่เริ่มต้นของการเปลี่ยนหน้า (หน้า/วินาที รวมทุกแท็บ) ; ค่าเดียวกับ scrap2/ntw_api (host เดียวกัน)
+NTW_RATE = ntw_api.NTW_RATE
+# true = ส่ง DataFrame ที่ scrape ได้เข้าไฟล์รวม (scrap3_2) ต่อทันที ไม่ต้องรัน scrap3_2.py แยก
+DAM_PIPELINE = os.getenv("DAM_PIPELINE", "false").lower() == "true"
 
 # -------- Email --------
 EMAIL_ENABLED = os.getenv("EMAIL_ENABLED", "true").lower() == "true"
@@ -45,84 +57,196 @@ def send_email(subject: str, body: str):
         print("⚠️ ส่งอีเมลล้มเหลว:", e)
 
 # ================================== FUNCTIONS ================================== #
-def scrape_data(tab_name: str) -> list[list[str]]:
+def _add_rows(all_data: list[list[str]], table_rows: list[list[str]], current_date: str, tab_name: str) -> None:
+    for cols in table_rows:
+        if any(col not in ("", "-", None) for col in cols):
+            cols += [current_date, tab_name]
+            all_data.append(cols)
+
+def scrape_data_http(tab_name: str) -> list[list[str]]:
+    """ดึงทั้งแท็บจาก JSON API (raise ถ้ายังไม่มี endpoint/ดึงไม่ได้)"""
+    all_data = []
+    with metrics.phase(metrics.EXTRACT):
+        table = ntw_api.fetch_table(f"dam_{TABS[tab_name]}")
+    _add_rows(all_data, table, datetime.today().strftime("%m/%d/%Y"), tab_name)
+    print(f"🌐 HTTP {tab_name}: {len(all_data)} แถว")
+    return all_data
+
+NEXT_XPATH = "//span[@title='Next Page']/button"
+
+def _click_next(driver, limiter, button, first_text: str) -> None:
+    """
+    คลิก Next แล้วรอแถวแรกเปลี่ยน ; timeout = คลิกซ้ำอีก 1 ครั้ง (ถ้ายังไม่เปลี่ยนจริง)
+    ยังไม่เปลี่ยนอีก = raise (ไม่อ่านหน้าเดิมซ้ำ -> ไม่มีแถวซ้ำในไฟล์)
+    """
+    for attempt in range(2):
+        if attempt:
+            # คลิกแรกอาจเปลี่ยนหน้าช้ากว่า timeout: เช็คอีกครั้งก่อนคลิกซ้ำ (ไม่ข้ามหน้า)
+            if first_row_text(driver, ROW_SELECTOR) not in ("", first_text):
+                return
+            print("⏳ หน้าไม่เปลี่ยน คลิก Next ซ้ำ")
+            button = WebDriverWait(driver, 5).until(EC.element_to_be_clickable((By.XPATH, NEXT_XPATH)))
+        limiter.acquire()
+        t_click = time.perf_counter()
+        driver.execute_script("arguments[0].click();", button)
+        with metrics.phase(metrics.PAGE_LOAD):
+            changed = wait_first_row_text_change(driver, ROW_SELECTOR, first_text, timeout=PAGE_TIMEOUT)
+        if changed:
+            limiter.success(time.perf_counter() - t_click)
+            return
+        limiter.failure("timeout")
+    raise TimeoutError(f"ตารางไม่เปลี่ยนหน้าหลังคลิก Next 2 ครั้ง (แถวแรก: {first_text[:40]!r})")
+
+def scrape_data(driver, tab_name: str) -> list[list[str]]:
+    limiter = rate_limit.for_host(URL, rate=NTW_RATE)
     all_data = []
     current_date = datetime.today().strftime("%m/%d/%Y")
     page = 1
     print(f"\nเริ่มดึงข้อมูล: {tab_name}")
     while True:
-        time.sleep(2)
-        rows = driver.find_elements(By.CSS_SELECTOR, ".MuiTable-root tbody tr")
+        # รอตาราง render นิ่งก่อนอ่าน (แทน sleep 2 วินาที)
+        with metrics.phase(metrics.PAGE_LOAD):
+            wait_dom_quiet(driver, quiet_ms=300, timeout=PAGE_TIMEOUT)
         count_before = len(all_data)
-        for row in rows:
-            cols = [col.text.strip() for col in row.find_elements(By.CSS_SELECTOR, "td")]
-            if any(col not in ("", "-", None) for col in cols):
-                cols += [current_date, tab_name]
-                all_data.append(cols)
+        with metrics.phase(metrics.EXTRACT):
+            first_text = first_row_text(driver, ROW_SELECTOR)
+            table_rows = read_mui_table(driver)
+        metrics.count("pages")
+        dataset = f"dam_{TABS[tab_name]}"
+        if page == 1 and NTW_ENGINE == "http" and not ntw_api.load_endpoint(dataset):
+            try:
+                ntw_api.discover(driver, dataset, [list(r) for r in table_rows])
+            except Exception as e:
+                print(f"⚠️ ค้นหา endpoint {dataset} ล้มเหลว:", e)
+        _add_rows(all_data, table_rows, current_date, tab_name)
         scraped_this_page = len(all_data) - count_before
         print(f"หน้า {page}: เก็บข้อมูลแล้ว {scraped_this_page} แถว")
         try:
-            next_button = WebDriverWait(driver, 5).until(
-                EC.element_to_be_clickable((By.XPATH, "//span[@title='Next Page']/button"))
-            )
-            if next_button.is_enabled():
-                driver.execute_script("arguments[0].click();", next_button)
-                page += 1
-                print(f"ไปยังหน้า {page}...")
-                time.sleep(2)
-            else:
-                print(f"จบการดึงข้อมูล: {tab_name}")
-                break
+            with metrics.phase(metrics.SELECTOR):
+                next_button = WebDriverWait(driver, 5).until(
+                    EC.element_to_be_clickable((By.XPATH, NEXT_XPATH))
+                )
+                enabled = next_button.is_enabled()
         except:
             print(f"ไม่พบปุ่ม 'Next Page' หรือคลิกไม่ได้: {tab_name}")
             break
+        if not enabled:
+            print(f"จบการดึงข้อมูล: {tab_name}")
+            break
+        _click_next(driver, limiter, next_button, first_text)
+        page += 1
+        print(f"ไปยังหน้า {page}...")
     return all_data
 
-def save_data_to_csv(data: list[list[str]], dam_type: str) -> int:
+def save_data_to_csv(data: list[list[str]], dam_type: str) -> tuple[int, pd.DataFrame | None]:
+    """คืน (จำนวนแถวที่บันทึก, DataFrame ที่แปลง dtype แล้ว สำหรับ pipeline)"""
     if not data:
         print(f"⚠️ ไม่มีข้อมูล {dam_type} ให้บันทึก")
-        return 0
+        return 0, None
     file_path = f"waterdam_report_{dam_type}.csv"
     file_exists = os.path.exists(file_path)
-    df = pd.DataFrame(data)
-    df.replace("", pd.NA, inplace=True)
-    df.dropna(axis=1, how="all", inplace=True)
+    with metrics.phase(metrics.PARSE):
+        df = pd.DataFrame(data)
+        df.replace("", pd.NA, inplace=True)
+        df.dropna(axis=1, how="all", inplace=True)
+        # แปลง dtype ตอน scrape: ตัวเลข (เลขไทย/คอมมา) -> float32, "-" -> NA, วันที่ -> datetime
+        schema = dam_schema(df.columns)
+        df = apply_schema(df, schema)
     if file_exists:
         with open(file_path, encoding="utf-8-sig") as f:
             first_line = f.readline()
             existing_cols = len(first_line.strip().split(",")) if first_line else 0
         if existing_cols and existing_cols != df.shape[1]:
             print(f"⚠️ โครงสร้างไม่ตรงกับไฟล์เดิม ไม่บันทึก {dam_type}")
-            return 0
-    df.to_csv(file_path, mode="a", index=False, encoding="utf-8-sig", header=not file_exists)
+            return 0, None
+    with metrics.phase(metrics.MERGE):
+        df.to_csv(file_path, mode="a", index=False, encoding="utf-8-sig", header=not file_exists,
+                  date_format=csv_date_format(schema))
+        storage.save_frame(df.assign(DamType=dam_type), "waterdam")
+    metrics.count("rows", len(df))
     print(f"💾 บันทึกข้อมูล {dam_type} ลงไฟล์ {file_path} แล้ว ({len(df)} แถว)")
-    return len(df)
+    return len(df), df
+
+def _open_tab(driver, index: int) -> None:
+    rate_limit.for_host(URL, rate=NTW_RATE).acquire()
+    with metrics.phase(metrics.PAGE_LOAD):
+        _open_tab_page(driver, index)
+
+def _open_tab_page(driver, index: int) -> None:
+    driver.get(URL)
+    WebDriverWait(driver, 15).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, ".MuiTable-root tbody tr"))
+    )
+    if index == 0:
+        return
+    tab_button = WebDriverWait(driver, 15).until(
+        EC.presence_of_element_located((By.XPATH, f"//button[@aria-controls='tabpanel-{index}']"))
+    )
+    try:
+        WebDriverWait(driver, 10).until_not(
+            EC.presence_of_element_located((By.CLASS_NAME, "MuiBackdrop-root"))
+        )
+    except: pass
+    first_text = first_row_text(driver, ROW_SELECTOR)
+    driver.execute_script("arguments[0].click();", tab_button)
+    WebDriverWait(driver, 10).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, ".MuiTable-root tbody tr"))
+    )
+    wait_first_row_text_change(driver, ROW_SELECTOR, first_text, timeout=PAGE_TIMEOUT)
+
+def scrape_tab(index: int, tab_name: str) -> list[list[str]]:
+    """1 แท็บ = 1 browser ของตัวเอง (ถ้าใช้ run_all.py จะได้แท็บใหม่จาก browser ที่แชร์กัน)"""
+    driver = make_chrome(user_agent=None, window_size=None)
+    try:
+        _open_tab(driver, index)
+        return scrape_data(driver, tab_name)
+    finally:
+        driver.quit()
+
+def scrape_all_selenium() -> dict:
+    """ดึงทุกแท็บใน TABS พร้อมกัน -> {dam_type: rows}; เวลารวม ≈ แท็บที่ช้าที่สุด"""
+    results, errors = {}, []
+    lock = threading.Lock()
+
+    def _run(index: int, tab_name: str):
+        try:
+            rows = scrape_tab(index, tab_name)
+            with lock:
+                results[TABS[tab_name]] = rows
+        except Exception as e:
+            with lock:
+                errors.append(f"{tab_name}: {e!r}")
+
+    threads = [threading.Thread(target=_run, args=(i, name), daemon=True)
+               for i, name in enumerate(TABS)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    if errors:
+        raise RuntimeError("; ".join(errors))
+    return {dam_type: results[dam_type] for dam_type in TABS.values()}
+
+def scrape_all() -> dict:
+    if NTW_ENGINE == "http":
+        try:
+            return {TABS[name]: scrape_data_http(name) for name in TABS}
+        except Exception as e:
+            print(f"⚠️ HTTP ไม่สำเร็จ ({e}) -> ใช้ Selenium")
+    return scrape_all_selenium()
 
 # ================================== MAIN ================================== #
 if __name__ == "__main__":
     start_time = time.time()
-    driver = webdriver.Chrome(options=options)
     try:
-        driver.get(URL)
-        WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, ".MuiTable-root tbody tr"))
-        )
-        large_dam_data = scrape_data("แหล่งน้ำขนาดใหญ่")
-        medium_tab_button = WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.XPATH, "//button[@aria-controls='tabpanel-1']"))
-        )
-        try:
-            WebDriverWait(driver, 10).until_not(
-                EC.presence_of_element_located((By.CLASS_NAME, "MuiBackdrop-root"))
-            )
-        except: pass
-        driver.execute_script("arguments[0].click();", medium_tab_button)
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, ".MuiTable-root tbody tr"))
-        )
-        medium_dam_data = scrape_data("แหล่งน้ำขนาดกลาง")
-        rows_large = save_data_to_csv(large_dam_data, "large")
-        rows_medium = save_data_to_csv(medium_dam_data, "medium")
+        with metrics.run("scrap3"):
+            data = scrape_all()
+            rows_large, df_large = save_data_to_csv(data["large"], "large")
+            rows_medium, df_medium = save_data_to_csv(data["medium"], "medium")
+            merged = None
+            if DAM_PIPELINE:
+                import scrap3_2
+                frames = {t: df for t, df in (("large", df_large), ("medium", df_medium)) if df is not None}
+                if frames:
+                    merged = scrap3_2.run_pipeline(frames)
         elapsed = time.time() - start_time
         when = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         subject = f"[WaterDam] Finish OK large={rows_large} medium={rows_medium} @ {when}"
@@ -132,10 +256,10 @@ if __name__ == "__main__":
             f"- Medium: {rows_medium} แถว\n"
             f"- ใช้เวลา: {elapsed:.2f} วินาที\n"
         )
+        if merged:
+            body += f"- ไฟล์รวม: {merged[1]} ({merged[0]} แถว) Drive: {merged[2] or '-'} (id={merged[3] or '-'})\n"
         send_email(subject, body)
     except Exception as e:
         when = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         send_email(f"[WaterDam] FAILED @ {when}", f"Error: {repr(e)}")
         raise
-    finally:
-        driver.quit()
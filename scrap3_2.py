@@ -3,9 +3,14 @@ import os, time, json
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
-from googleapiclient.http import MediaFileUpload
 from googleapiclient.errors import HttpError
 
+import gdrive
+import metrics
+
+from schema import apply_schema, dam_schema, dam_key_columns
+from incremental_merge import append_new_rows, compact, key_hashes, needs_compaction
+
 # ============== I/O (ไฟล์เข้า/ออก) ============== #
 LARGE_CSV  = Path(r"C:\Project_End\CodeProject\waterdam_report_large.csv").resolve()
 MEDIUM_CSV = Path(r"C:\Project_End\CodeProject\waterdam_report_medium.csv").resolve()
@@ -49,11 +54,7 @@ def send_email(subject: str, body_text: str) -> None:
 
 # ================= Drive Helpers ================= #
 def _build_drive_service_with_service_account():
-    from google.oauth2.service_account import Credentials
-    from googleapiclient.discovery import build
-    scopes = ["https://www.googleapis.com/auth/drive"]
-    creds = Credentials.from_service_account_file(str(SERVICE_ACCOUNT_FILE), scopes=scopes)
-    return build("drive", "v3", credentials=creds, cache_discovery=False)
+    return gdrive.get_service(str(SERVICE_ACCOUNT_FILE))
 
 def drive_upload_or_update_csv(local_path, drive_folder_id, target_name=None, max_retries=3):
     local_path = Path(local_path).resolve()
@@ -62,78 +63,114 @@ def drive_upload_or_update_csv(local_path, drive_folder_id, target_name=None, ma
     if not local_path.exists():
         raise FileNotFoundError(f"ไม่พบไฟล์ที่จะอัปโหลด: {local_path}")
 
-    service = _build_drive_service_with_service_account()
-    media = MediaFileUpload(str(local_path), mimetype=CSV_MIMETYPE, resumable=True)
-
-    # ใช้ fileId เดิม (ถ้ามี)
+    # ใช้ fileId เดิม (ถ้ามี); เนื้อไฟล์ไม่เปลี่ยน -> ไม่ต้องสร้าง service/อัปโหลด
     file_id = DRIVE_FILE_ID_OVERRIDE
+    if file_id and gdrive.is_unchanged(str(local_path), file_id):
+        print("☁️ ข้ามอัปโหลด (ไฟล์ไม่เปลี่ยน)")
+        return "skip", file_id
+
+    service = _build_drive_service_with_service_account()
     if file_id:
         try:
-            updated = service.files().update(
-                fileId=file_id, media_body=media, supportsAllDrives=True
-            ).execute()
-            print(f"☁️ อัปเดตไฟล์สำเร็จ (id={updated.get('id')})")
-            return "update", updated.get("id")
+            action, updated_id = gdrive.upload(service, str(local_path), file_id=file_id, mimetype=CSV_MIMETYPE,
+                                               retries=max_retries)
+            print(f"☁️ อัปเดตไฟล์สำเร็จ (id={updated_id})")
+            return action, updated_id
         except HttpError as e:
+            if not gdrive.is_no_access(e):
+                raise  # rate limit/5xx: ไม่สร้างไฟล์ซ้ำ
             print(f"⚠️ อัปเดตไฟล์ไม่สำเร็จ: {e}")
 
     # ถ้าไม่มี -> สร้างใหม่
-    file_metadata = {"name": target_name, "parents": [drive_folder_id]}
-    created = service.files().create(
-        body=file_metadata,
-        media_body=media,
-        fields="id,webViewLink",
-        supportsAllDrives=True,
-    ).execute()
-    new_id = created.get("id")
+    action, new_id = gdrive.upload(service, str(local_path), folder_id=drive_folder_id,
+                                   name=target_name, mimetype=CSV_MIMETYPE, retries=max_retries)
     print(f"☁️ อัปโหลดไฟล์ใหม่สำเร็จ (id={new_id})")
-    return "create", new_id
+    return action, new_id
 
 # ======================== Core (รวมไฟล์ + Clean) ======================== #
 def read_csv_smart(path: Path) -> pd.DataFrame:
-    for enc in ("utf-8-sig", "utf-8"):
-        try:
-            return pd.read_csv(path, encoding=enc)
-        except UnicodeDecodeError:
-            continue
-    return pd.read_csv(path)
+    # utf-8-sig อ่านได้ทั้งไฟล์ที่มี/ไม่มี BOM -> parse ครั้งเดียว; ไฟล์ที่ไม่ใช่ utf-8 แทนอักขระเสีย
+    return pd.read_csv(path, encoding="utf-8-sig", encoding_errors="replace", dtype=str, keep_default_na=False)
+
+def align_frames(frames: dict) -> tuple[pd.DataFrame, dict]:
+    """{dam_type: df} -> DataFrame เดียว (คอลัมน์ตามตัวแรก + DamType) แปลง dtype ตาม dam_schema"""
+    ordered_cols, parts = None, []
+    for dam_type, df in frames.items():
+        df = df.copy()
+        df.columns = [str(c) for c in df.columns]  # ให้ตรงกับหัวไฟล์ CSV ("0", "1", ...)
+        if ordered_cols is None:
+            ordered_cols = list(df.columns)
+        df = df.reindex(columns=ordered_cols)
+        df["DamType"] = dam_type
+        parts.append(df)
+    df = pd.concat(parts, ignore_index=True)
+    # แปลงเป็น dtype จริง: ตัวเลข -> float32, "-"/ค่าว่าง -> NA (ไม่แทนด้วย "0")
+    schema = dam_schema(df.columns)
+    return apply_schema(df, schema), schema
+
+def _history_frames() -> dict:
+    # ไฟล์รายแท็บใช้เฉพาะตอนยังไม่มี OUT_CSV (รอบแรก)
+    return {t: read_csv_smart(p) for t, p in (("large", LARGE_CSV), ("medium", MEDIUM_CSV)) if p.exists()}
+
+def merge_frames(frames: dict) -> tuple[int, int]:
+    """
+    รวมข้อมูลที่เพิ่ง scrape (ในหน่วยความจำ) เข้า OUT_CSV แบบ incremental; คืน (แถวที่เพิ่ม, แถวรวม)
+    - ปกติ: ต่อท้ายเฉพาะแถวที่ไม่ซ้ำ (ไม่อ่าน/ไม่ลบซ้ำประวัติทั้งหมด)
+    - รอบ compact (ทุก COMPACT_EVERY_DAYS หรือ OUT_CSV/index หาย): อ่านประวัติแล้วเขียนใหม่ทั้งก้อน
+    """
+    df_new, schema = align_frames(frames)
+    # key = ชื่อเขื่อน + วันที่ + แท็บ (ไม่ใช้ค่าตัวเลข -> hash ไม่ขึ้นกับรูปแบบตัวเลข) ค่าที่ดึงใหม่ชนะ
+    key_cols = dam_key_columns(df_new.columns)
+    OUT_CSV.parent.mkdir(parents=True, exist_ok=True)
+    if not needs_compaction(str(OUT_CSV)):
+        return append_new_rows(df_new, key_cols, str(OUT_CSV), schema)
+
+    history = {} if OUT_CSV.exists() else _history_frames()
+    if OUT_CSV.exists():
+        df_old = apply_schema(read_csv_smart(OUT_CSV), schema)
+    elif history:
+        df_old, _ = align_frames(history)
+    else:
+        df_old = df_new.iloc[0:0]
+    total = compact(pd.concat([df_old, df_new], ignore_index=True), key_cols, str(OUT_CSV), schema)
+    print(f"🧹 compact ไฟล์รวม: {total:,} แถว")
+    return max(total - key_hashes(df_old, key_cols).nunique(), 0), total
+
+def upload_merged():
+    if not ENABLE_GOOGLE_DRIVE_UPLOAD:
+        return None, None
+    try:
+        with metrics.phase(metrics.UPLOAD):
+            drive_action, drive_id = drive_upload_or_update_csv(OUT_CSV, DRIVE_FOLDER_ID, OUT_CSV.name)
+        print(f"✅ Drive: {drive_action} (id={drive_id})")
+        return drive_action, drive_id
+    except Exception as e:
+        print(f"⚠️ อัปโหลด Drive ล้มเหลว: {e}")
+        return None, None
+
+def run_pipeline(frames: dict):
+    """เรียกจาก scrap3 (DAM_PIPELINE=true): ส่ง DataFrame ที่เพิ่ง scrape มารวมต่อโดยตรง"""
+    with metrics.phase(metrics.MERGE):
+        added, total = merge_frames(frames)
+    print(f"💾 รวมไฟล์แล้ว: {OUT_CSV} (+{added:,} แถว, รวม {total:,} แถว)")
+    drive_action, drive_id = upload_merged() if added else (None, None)
+    if not added:
+        print("☁️ ข้ามอัปโหลด Google Drive (ไม่มีแถวใหม่)")
+    return total, str(OUT_CSV), drive_action, drive_id
 
 def run_merge_only():
-    df_large  = read_csv_smart(LARGE_CSV)
-    df_medium = read_csv_smart(MEDIUM_CSV)
-
-    # ให้คอลัมน์ตรงกัน
-    ordered_cols = list(df_large.columns)
-    for c in ordered_cols:
-        if c not in df_medium.columns:
-            df_medium[c] = pd.NA
-    df_medium = df_medium[ordered_cols]
-
-    df_large["DamType"]  = "large"
-    df_medium["DamType"] = "medium"
-
-    df = pd.concat([df_large, df_medium], ignore_index=True)
-
-    # ✅ แทนค่า missing ให้เป็น "0"
-    df = df.fillna("0")
-    df = df.replace({"-": "0", "--": "0", "–": "0", "—": "0", "": "0"})
-
-    # ลบแถวซ้ำ
-    df = df.drop_duplicates()
+    """รวมจากไฟล์รายแท็บทั้งก้อน (ใช้เมื่อรัน scrap3_2.py แยก) + สร้าง index ให้ pipeline ใช้ต่อ"""
+    with metrics.phase(metrics.PARSE):
+        df, schema = align_frames({"large": read_csv_smart(LARGE_CSV), "medium": read_csv_smart(MEDIUM_CSV)})
 
+    # ลบแถวซ้ำ + เขียนใหม่
     OUT_CSV.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(OUT_CSV, index=False, encoding="utf-8-sig")
-    print(f"💾 รวมไฟล์แล้ว: {OUT_CSV} ({len(df):,} แถว)")
-
-    drive_action = drive_id = None
-    if ENABLE_GOOGLE_DRIVE_UPLOAD:
-        try:
-            drive_action, drive_id = drive_upload_or_update_csv(OUT_CSV, DRIVE_FOLDER_ID, OUT_CSV.name)
-            print(f"✅ Drive: {drive_action} (id={drive_id})")
-        except Exception as e:
-            print(f"⚠️ อัปโหลด Drive ล้มเหลว: {e}")
+    with metrics.phase(metrics.MERGE):
+        rows = compact(df, dam_key_columns(df.columns), str(OUT_CSV), schema)
+    print(f"💾 รวมไฟล์แล้ว: {OUT_CSV} ({rows:,} แถว)")
 
-    return len(df), str(OUT_CSV), drive_action, drive_id
+    drive_action, drive_id = upload_merged()
+    return rows, str(OUT_CSV), drive_action, drive_id
 
 # ================================== MAIN ================================== #
 def main():
@@ -155,4 +192,5 @@ def main():
     send_email(subject, body)
 
 if __name__ == "__main__":
-    main()
+    with metrics.run("scrap3_2"):
+        main()
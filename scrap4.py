@@ -1,15 +1,20 @@
 # -*- coding: utf-8 -*-
-import os, time, random, re, json, hashlib, shutil
+import os, time, re, json, shutil, queue, threading
 from datetime import datetime
 import pandas as pd
 
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
-from urllib.parse import urlparse
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException, TimeoutException
+
+from driver_factory import make_chrome
+import storage
+import gdrive
+import metrics
+import province_cache
+import rate_limit
+from waits import wait_dom_quiet, wait_row_count_change, row_count, install_network_hook, wait_network_idle
 
 URL = "http://app.dgr.go.th/newpasutara/xml/search.php"
 OUT_DIR = r"C:\Project_End\CodeProject\dgr_results"
@@ -26,6 +31,14 @@ RUN_STARTED_AT = datetime.now().isoformat(timespec="seconds")
 RUN_LOG_PATH = os.path.join(OUT_DIR, "dgr_run_log.csv")
 SESSION_SUMMARY_PATH = os.path.join(OUT_DIR, f"dgr_session_{RUN_ID}.json")
 
+# Sharded mode: แต่ละ worker มี Chrome ของตัวเอง เขียนไฟล์รายจังหวัด + checkpoint แล้ว merge ครั้งเดียวตอนท้าย
+DGR_WORKERS = max(1, int(os.getenv("DGR_WORKERS", "1")))
+PROVINCE_DIR = os.path.join(OUT_DIR, "provinces")
+CHECKPOINT_PATH = os.path.join(OUT_DIR, "dgr_checkpoint.json")
+CHECKPOINT_MAX_AGE_H = float(os.getenv("DGR_CHECKPOINT_MAX_AGE_H", "20"))
+# ความถี่เริ่มต้น (โหลดหน้า/วินาที รวมทุก worker) ; rate_limit ปรับขึ้นลงตามความเร็ว/ข้อผิดพลาดของเว็บ
+DGR_RATE = float(os.getenv("DGR_RATE", "1.5"))
+
 # Google Drive
 ENABLE_GOOGLE_DRIVE_UPLOAD = True
 SERVICE_ACCOUNT_FILE = r"C:/Project_End/CodeProject/githubproject-467507-653192ee67bf.json"
@@ -61,42 +74,96 @@ RENAME_PATTERNS = [
 def _normalize_colname(name: str) -> str:
     return re.sub(r"\s+", " ", (name or "").strip())
 
-def rename_th_to_en(df: pd.DataFrame) -> pd.DataFrame:
-    # 1) exact mapping ก่อน
-    if df is None or df.empty:
-        return df
-    df = df.rename(columns={k: v for k, v in RENAME_EXACT.items() if k in df.columns})
-
-    # 2) pattern mapping
+def _rename_map(columns) -> dict:
     renamed = {}
-    for col in df.columns:
+    for col in columns:
+        # 1) exact mapping ก่อน
+        if col in RENAME_EXACT:
+            renamed[col] = RENAME_EXACT[col]
+            continue
         if col in RENAME_EXACT.values():
             continue
+        # 2) pattern mapping
         c_norm = _normalize_colname(col)
         for pat, newname in RENAME_PATTERNS:
             if pat.match(c_norm):
                 renamed[col] = newname
                 break
-    if renamed:
-        df = df.rename(columns=renamed)
+    return renamed
 
+def _front_first(columns) -> list:
     # 3) จัดลำดับใหม่นำหน้าเป็น Province, CollectedAt (ถ้ามี)
-    front = [c for c in ["Province", "CollectedAt"] if c in df.columns]
-    others = [c for c in df.columns if c not in front]
-    return df[front + others] if front else df
+    front = [c for c in ["Province", "CollectedAt"] if c in columns]
+    return front + [c for c in columns if c not in front]
 
-def migrate_existing_csv_headers(csv_path: str):
-    """แปลงหัวคอลัมน์ไฟล์เก่า (ถ้ามี) ให้เป็นอังกฤษครั้งเดียว และสำรองไฟล์ .bak"""
+def rename_columns_th_to_en(columns) -> list:
+    """เหมือน rename_th_to_en แต่ทำกับรายชื่อหัวคอลัมน์ (ไม่ต้องมีข้อมูล)"""
+    renamed = _rename_map(columns)
+    return _front_first([renamed.get(c, c) for c in columns])
+
+def rename_th_to_en(df: pd.DataFrame) -> pd.DataFrame:
+    if df is None or df.empty:
+        return df
+    renamed = _rename_map(df.columns)
+    if renamed:
+        df = df.rename(columns=renamed)
+    cols = _front_first(list(df.columns))
+    return df[cols] if cols != list(df.columns) else df
+
+# ---------- Header registry ----------
+# หัวคอลัมน์ของไฟล์รวมเก็บไว้ใน sidecar <csv>.header.json (+ cache ในหน่วยความจำต่อรอบ)
+# append ไม่ต้อง parse ไฟล์ข้อมูลอีก; sidecar ใช้ได้เมื่อขนาดไฟล์ตรงกับที่บันทึกไว้
+LEGACY_DROP_COLS = ["run_id", "fetched_at"]
+_header_cache: dict = {}
+
+def _header_sidecar(csv_path: str) -> str:
+    return f"{csv_path}.header.json"
+
+def _save_header(csv_path: str, columns: list, migrated: bool = True):
+    entry = {"columns": list(columns), "migrated": migrated, "size": os.path.getsize(csv_path)}
+    _header_cache[csv_path] = entry
+    with open(_header_sidecar(csv_path), "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+
+def load_header(csv_path: str):
+    """คืน entry {"columns", "migrated", "size"} ของไฟล์ หรือ None ถ้ายังไม่มีไฟล์"""
     if not os.path.exists(csv_path):
-        return
+        _header_cache.pop(csv_path, None)
+        return None
+    size = os.path.getsize(csv_path)
+    entry = _header_cache.get(csv_path)
+    if entry is None:
+        try:
+            with open(_header_sidecar(csv_path), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except Exception:
+            entry = None
+    if entry is None or entry.get("size") != size:
+        # ไฟล์ถูกแก้จากที่อื่น: อ่านเฉพาะบรรทัดหัว (ไม่ parse ข้อมูล)
+        cols = list(pd.read_csv(csv_path, nrows=0, encoding="utf-8-sig").columns)
+        migrated = bool(entry and entry.get("migrated") and entry.get("columns") == cols)
+        entry = {"columns": cols, "migrated": migrated, "size": size}
+    _header_cache[csv_path] = entry
+    return entry
+
+def migrate_existing_csv_headers(csv_path: str):
+    """แปลงหัวคอลัมน์ไฟล์เก่าเป็นอังกฤษ + ตัดคอลัมน์เลิกใช้ ครั้งเดียว (สำรอง .bak); ไฟล์ที่ migrate แล้วไม่ถูกอ่านซ้ำ"""
     try:
-        _df = pd.read_csv(csv_path)
-        new_df = rename_th_to_en(_df.copy())
-        if list(new_df.columns) != list(_df.columns):
+        entry = load_header(csv_path)
+        if entry is None or entry["migrated"]:
+            return
+        cols = entry["columns"]
+        renamed = rename_columns_th_to_en(cols)
+        drop_cols = [c for c in LEGACY_DROP_COLS if c in renamed]
+        if renamed != cols or drop_cols:
+            _df = pd.read_csv(csv_path, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+            new_df = rename_th_to_en(_df).drop(columns=drop_cols)
             bak = f"{csv_path}.bak.{datetime.now().strftime('%Y%m%d-%H%M%S')}"
             shutil.copy2(csv_path, bak)
             new_df.to_csv(csv_path, index=False, encoding="utf-8-sig")
+            cols = list(new_df.columns)
             print(f"🔁 Migrated headers to EN (backup: {bak})")
+        _save_header(csv_path, cols)
     except Exception as e:
         print(f"⚠️ migrate headers skipped: {e}")
 
@@ -111,15 +178,32 @@ def format_secs(sec: float) -> str:
     h, m = divmod(int(m), 60)
     return f"{h}h {m}m {s:.0f}s"
 
-def extract_cell_text(td):
-    imgs = td.find_elements(By.TAG_NAME, "img")
-    if imgs:
-        src = imgs[0].get_attribute("src") or ""
-        filename = os.path.basename(urlparse(src).path)
-        if filename in TYPE_MAP: return TYPE_MAP[filename]
-        alt = (imgs[0].get_attribute("alt") or "").strip()
+# อ่านตารางทั้งก้อนใน browser ครั้งเดียว: หัวตาราง + [textContent, ชื่อไฟล์ img, alt] ต่อเซลล์
+_SERIALIZE_TABLE_JS = """
+const t = arguments[0];
+const headers = Array.from(t.querySelectorAll('thead th'), th => th.textContent || '');
+const rows = Array.from(t.querySelectorAll('tbody tr'), tr =>
+  Array.from(tr.querySelectorAll('th,td'), td => {
+    const img = td.querySelector('img');
+    if (!img) return [td.textContent || '', null, ''];
+    let name = '';
+    try { name = new URL(img.getAttribute('src') || '', location.href).pathname.split('/').pop(); } catch (e) {}
+    return [td.textContent || '', name, img.getAttribute('alt') || ''];
+  }));
+return {headers: headers, rows: rows};
+"""
+
+def serialize_table(table_el) -> tuple[list, list]:
+    payload = table_el.parent.execute_script(_SERIALIZE_TABLE_JS, table_el) or {}
+    return payload.get("headers") or [], payload.get("rows") or []
+
+def resolve_cell(cell) -> str:
+    text, img_name, alt = cell
+    if img_name is not None:
+        if img_name in TYPE_MAP: return TYPE_MAP[img_name]
+        alt = (alt or "").strip()
         if alt: return alt
-    return clean_text(td.get_attribute("textContent"))
+    return clean_text(text)
 
 def normalize_headers(headers):
     out = [clean_text(h) for h in headers]
@@ -127,18 +211,15 @@ def normalize_headers(headers):
         if not h: out[i] = f"col_{i+1}"
     return out
 
-def drop_empty_columns(df: pd.DataFrame) -> pd.DataFrame:
-    empty_cols = [c for c in df.columns if df[c].replace("", pd.NA).isna().all()]
-    return df.drop(columns=empty_cols)
-
 def table_to_dataframe(table_el):
-    ths = table_el.find_elements(By.CSS_SELECTOR, "thead th")
-    headers = normalize_headers([th.get_attribute("textContent") for th in ths])
+    with metrics.phase(metrics.EXTRACT):
+        raw_headers, raw_rows = serialize_table(table_el)
+    with metrics.phase(metrics.PARSE):
+        return rows_to_dataframe(raw_headers, raw_rows)
 
-    rows = []
-    for tr in table_el.find_elements(By.CSS_SELECTOR, "tbody tr"):
-        cells = tr.find_elements(By.CSS_SELECTOR, "th,td")
-        rows.append([extract_cell_text(td) for td in cells])
+def rows_to_dataframe(raw_headers, raw_rows):
+    headers = normalize_headers(raw_headers)
+    rows = [[resolve_cell(cell) for cell in tr] for tr in raw_rows]
 
     if not rows:
         return pd.DataFrame()
@@ -147,41 +228,41 @@ def table_to_dataframe(table_el):
     if len(headers) != max_len:
         headers = (headers + [f"col_{i+1}" for i in range(len(headers), max_len)])[:max_len]
     rows = [r + [""]*(max_len - len(r)) for r in rows]
-    df = pd.DataFrame(rows, columns=headers)
 
-    df = drop_empty_columns(df)
+    # ตัดคอลัมน์ที่ว่างทั้งคอลัมน์ (ทำบน list ก่อนสร้าง DataFrame)
+    keep = [j for j in range(max_len) if any(r[j] for r in rows)]
+    headers = [headers[j] for j in keep]
+    rows = [[r[j] for j in keep] for r in rows]
 
     # ตัดบรรทัด "ค่าเฉลี่ย" ทุกคอลัมน์
-    if not df.empty:
-        mask_avg = pd.Series(False, index=df.index)
-        for c in df.columns:
-            mask_avg |= df[c].astype(str).str.contains(r"ค่าเฉลี่ย", na=False)
-        df = df[~mask_avg].reset_index(drop=True)
+    rows = [r for r in rows if not any("ค่าเฉลี่ย" in v for v in r)]
 
     # รีเนมคอลัมน์ประเภทบ่อถ้า pattern ตรง TYPE_MAP
     type_values = set(TYPE_MAP.values())
-    for c in df.columns:
-        vals = set(v for v in df[c].unique() if isinstance(v, str) and v)
-        if vals and vals.issubset(type_values) and (c.startswith("col_") or not c):
-            df = df.rename(columns={c: "ประเภทบ่อ"})
+    for j, h in enumerate(headers):
+        vals = {r[j] for r in rows if r[j]}
+        if vals and vals.issubset(type_values) and (h.startswith("col_") or not h):
+            headers[j] = "ประเภทบ่อ"
             break
-    return df
+    return pd.DataFrame(rows, columns=headers)
 
 def scroll_container_load_all(driver, container, pause=0.6, max_rounds=40):
-    last_count, stable = -1, 0
+    # เลื่อนจนสุดแล้วรอจำนวนแถวเปลี่ยน (pause = เพดานเวลารอต่อรอบ)
+    # จำนวนแถวไม่เปลี่ยน 2 รอบติดกัน (รอบที่สองรอ request ที่ค้างให้จบก่อน) = โหลดครบ
+    install_network_hook(driver)
+    count, stable = row_count(driver, "tbody tr", container), 0
     for _ in range(max_rounds):
-        try:
-            count = len(container.find_element(By.TAG_NAME, "tbody").find_elements(By.TAG_NAME, "tr"))
-        except Exception:
-            count = 0
         driver.execute_script("arguments[0].scrollTop = arguments[0].scrollHeight;", container)
-        time.sleep(pause)
-        if count == last_count:
+        new_count = wait_row_count_change(driver, "tbody tr", count, timeout=pause, root=container)
+        if new_count == count:
             stable += 1
-            if stable >= 2: break
-        else:
-            stable = 0
-            last_count = count
+            if stable >= 2:
+                break
+            wait_network_idle(driver, idle_ms=250, timeout=pause * 5)
+            continue
+        stable = 0
+        wait_dom_quiet(driver, quiet_ms=150, timeout=pause, root=container)
+        count = row_count(driver, "tbody tr", container)
 
 def find_next_button(driver):
     css_candidates = [
@@ -203,53 +284,111 @@ def find_next_button(driver):
     except Exception:
         return None
 
+# DataTables: ขยาย page length เป็น "All" (-1) หรือค่าสูงสุดใน lengthMenu ถ้าเป็น server-side
+# แล้วรอ event draw ครั้งเดียว -> 1 จังหวัดโหลดใน 1 request แทนการกด next ทีละหน้า
+DT_MAX_PAGE_LEN = int(os.getenv("DGR_PAGE_LEN", "-1"))
+_DT_EXPAND_JS = """
+const root = arguments[0], want = arguments[1], timeoutMs = arguments[2];
+const done = arguments[arguments.length - 1];
+const $ = window.jQuery;
+const t = root.querySelector('table');
+if (!$ || !$.fn || !$.fn.dataTable || !t || !$.fn.dataTable.isDataTable(t)) return done(null);
+const api = $(t).DataTable(), st = api.settings()[0];
+const server = !!(st.oFeatures && st.oFeatures.bServerSide);
+const lm = st.aLengthMenu || [];
+let menu = Array.isArray(lm[0]) ? lm[0] : lm;  // [10, 25] หรือ [[10, 25, -1], ['10', '25', 'All']]
+menu = menu.map(Number).filter(n => !isNaN(n));
+let len = want;
+if (server || want > 0) {
+  // server-side ไม่ใช้ -1 ถ้า lengthMenu ไม่ได้ประกาศไว้ (server อาจไม่รองรับ)
+  const best = menu.includes(-1) && want < 0 ? -1 : Math.max.apply(null, menu.filter(n => n > 0).concat([api.page.len()]));
+  len = want > 0 ? Math.max(want, api.page.len()) : best;
+}
+const info = () => { const i = api.page.info(); return {server: server, len: api.page.len(), pages: i.pages, total: i.recordsDisplay}; };
+if (api.page.len() === len) return done(info());
+const timer = setTimeout(() => done(info()), timeoutMs);
+$(t).one('draw.dt', () => { clearTimeout(timer); done(info()); });
+api.page.len(len).draw(false);
+"""
+
+def expand_datatable(driver, container, timeout=20.0):
+    """คืน {"server", "len", "pages", "total"} ถ้าหน้าใช้ DataTables; None = ไม่ใช่ DataTables (ใช้การกด next ตามเดิม)"""
+    try:
+        return driver.execute_async_script(_DT_EXPAND_JS, container, DT_MAX_PAGE_LEN, int(timeout * 1000))
+    except Exception:
+        return None
+
 def collect_table_all_pages(driver, wait):
     t0 = time.perf_counter()
-    container = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div#myTable.table-responsive")))
-    driver.set_window_size(1920, 1400)
+    with metrics.phase(metrics.PAGE_LOAD):
+        container = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div#myTable.table-responsive")))
+        driver.set_window_size(1920, 1400)
 
-    scroll_container_load_all(driver, container)
-    table_el = container.find_element(By.TAG_NAME, "table")
+        dt = expand_datatable(driver, container)
+        if dt:
+            print(f"  📄 DataTables {'server' if dt['server'] else 'client'}-side: {dt['total']} แถว, page len {dt['len']} ({dt['pages']} หน้า)")
+            container = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div#myTable.table-responsive")))
+        scroll_container_load_all(driver, container)
+        table_el = container.find_element(By.TAG_NAME, "table")
     frames = [table_to_dataframe(table_el)]
+    metrics.count("pages")
 
     while True:
-        nxt = find_next_button(driver)
+        with metrics.phase(metrics.SELECTOR):
+            nxt = find_next_button(driver)
         if not nxt: break
         old_tbody = container.find_element(By.TAG_NAME, "tbody")
+        limiter = _limiter()
+        limiter.acquire()
+        t_click = time.perf_counter()
         nxt.click()
-        wait.until(EC.staleness_of(old_tbody))
-        container = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div#myTable.table-responsive")))
-        scroll_container_load_all(driver, container)
-        table_el = container.find_element(By.TAG_NAME, "table")
+        with metrics.phase(metrics.PAGE_LOAD):
+            wait.until(EC.staleness_of(old_tbody))
+            container = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div#myTable.table-responsive")))
+            limiter.success(time.perf_counter() - t_click)
+            scroll_container_load_all(driver, container)
+            table_el = container.find_element(By.TAG_NAME, "table")
         frames.append(table_to_dataframe(table_el))
-        time.sleep(random.uniform(0.4, 0.8))
+        metrics.count("pages")
 
     out = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
     return out, (time.perf_counter() - t0)
 
-# ---- append_save: ต่อท้ายเสมอ + ลบคอลัมน์ run_id / fetched_at ออกจากไฟล์เก่า (ถ้ามี) ----
+# ---- append_save: ต่อท้ายเสมอ โดยใช้หัวคอลัมน์จาก registry (ไม่อ่านไฟล์ข้อมูล) ----
 def append_save(df_new: pd.DataFrame, csv_path: str) -> int:
+    df_new, entry, exists = _align_to_header(df_new, csv_path)
+    return _append_rows(df_new, csv_path, entry, exists)
+
+def _align_to_header(df_new: pd.DataFrame, csv_path: str):
+    """จัดคอลัมน์ตามหัวไฟล์ (คอลัมน์ใหม่ = เขียนหัวไฟล์ใหม่ก่อน) ; หลังจากนี้การต่อท้ายเป็น append ล้วน"""
     exists = os.path.exists(csv_path)
-    if exists:
-        try:
-            sample = pd.read_csv(csv_path, nrows=0)
-            # one-time migration: drop columns we no longer use
-            drop_cols = [c for c in ["run_id", "fetched_at"] if c in sample.columns]
-            if drop_cols:
-                df_old = pd.read_csv(csv_path)
-                df_old = df_old.drop(columns=drop_cols)
-                df_old.to_csv(csv_path, index=False, encoding="utf-8-sig")
-                sample = pd.read_csv(csv_path, nrows=0)  # refresh header
-
-            cols = list(sample.columns)
-            for c in df_new.columns:
-                if c not in cols:
-                    cols.append(c)
+    entry = None
+    try:
+        entry = load_header(csv_path)
+        if entry is not None:
+            cols = list(entry["columns"])
+            extra = [c for c in df_new.columns if c not in cols]
+            if extra:
+                # คอลัมน์ใหม่ -> ต้องเขียนหัวไฟล์ใหม่ (กรณีนี้เท่านั้นที่อ่านไฟล์ทั้งก้อน)
+                df_old = pd.read_csv(csv_path, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+                df_old.reindex(columns=cols + extra).to_csv(csv_path, index=False, encoding="utf-8-sig")
+                cols += extra
             df_new = df_new.reindex(columns=cols)
-        except Exception:
-            pass
+    except Exception as e:
+        # หัวไฟล์/sidecar เสีย: ต่อท้ายตามเดิม ไม่ให้การบันทึกล้ม (รอบถัดไปอ่านหัวจากไฟล์ใหม่)
+        print(f"⚠️ อ่านหัวคอลัมน์ {csv_path} ไม่ได้ ({e}) ต่อท้ายโดยไม่จัดคอลัมน์")
+        entry = None
+    return df_new, entry, exists
 
+def _append_rows(df_new: pd.DataFrame, csv_path: str, entry, exists: bool) -> int:
     df_new.to_csv(csv_path, mode="a", header=not exists, index=False, encoding="utf-8-sig")
+    try:
+        if entry is not None or not exists:
+            _save_header(csv_path, list(df_new.columns), migrated=True if entry is None else entry["migrated"])
+        else:
+            _header_cache.pop(csv_path, None)
+    except Exception as e:
+        print(f"⚠️ บันทึก header registry ไม่สำเร็จ: {e}")
     return len(df_new)
 
 def ensure_outdir(): os.makedirs(OUT_DIR, exist_ok=True)
@@ -257,7 +396,17 @@ def ensure_outdir(): os.makedirs(OUT_DIR, exist_ok=True)
 def write_run_log(row: dict):
     ensure_outdir()
     df = pd.DataFrame([row])
-    df.to_csv(RUN_LOG_PATH, mode="a", header=not os.path.exists(RUN_LOG_PATH), index=False, encoding="utf-8-sig")
+    exists = os.path.exists(RUN_LOG_PATH)
+    if exists:
+        cols = list(pd.read_csv(RUN_LOG_PATH, nrows=0, encoding="utf-8-sig").columns)
+        extra = [c for c in df.columns if c not in cols]
+        if extra:
+            # log เล็ก: คอลัมน์ใหม่ = เขียนหัวไฟล์ใหม่ (แถวเก่าคงค่าใต้ชื่อคอลัมน์เดิม)
+            old = pd.read_csv(RUN_LOG_PATH, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+            old.reindex(columns=cols + extra).to_csv(RUN_LOG_PATH, index=False, encoding="utf-8-sig")
+            cols += extra
+        df = df.reindex(columns=cols)
+    df.to_csv(RUN_LOG_PATH, mode="a", header=not exists, index=False, encoding="utf-8-sig")
 
 def save_session_summary(summary: dict):
     ensure_outdir()
@@ -266,10 +415,7 @@ def save_session_summary(summary: dict):
 
 # === Google Drive (ขั้นต่ำที่จำเป็น) ===
 def _build_drive_service_with_service_account():
-    from google.oauth2.service_account import Credentials
-    from googleapiclient.discovery import build
-    creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=["https://www.googleapis.com/auth/drive"])
-    return build("drive", "v3", credentials=creds, cache_discovery=False)
+    return gdrive.get_service(SERVICE_ACCOUNT_FILE)
 
 def drive_find_file_in_folder(service, filename, folder_id):
     from googleapiclient.errors import HttpError
@@ -284,75 +430,38 @@ def drive_find_file_in_folder(service, filename, folder_id):
         raise RuntimeError(f"ค้นหาไฟล์บน Drive ล้มเหลว: {e}")
 
 def drive_upload_or_update_csv(service, local_path, drive_folder_id, target_name=None, max_retries=3):
-    from googleapiclient.http import MediaFileUpload
     from googleapiclient.errors import HttpError
 
     if target_name is None:
         target_name = os.path.basename(local_path)
 
-    # ยืนยันสิทธิ์เข้าถึงโฟลเดอร์
-    service.files().get(fileId=drive_folder_id, fields="id", supportsAllDrives=True).execute()
-
-    media = MediaFileUpload(local_path, mimetype=CSV_MIMETYPE, resumable=True)
+    # ---------- 1) fileId จาก ENV  2) fileId จาก cache (state)  3) ค้นจากชื่อไฟล์ในโฟลเดอร์ ----------
+    def _candidates():
+        yield DRIVE_FILE_ID_OVERRIDE
+        yield _get_cached_file_id()
+        for f in drive_find_file_in_folder(service, target_name, drive_folder_id):
+            yield f["id"]
 
-    # ---------- 1) ใช้ fileId จาก ENV ----------
-    file_id = DRIVE_FILE_ID_OVERRIDE
-    if file_id:
-        for attempt in range(1, max_retries + 1):
-            try:
-                r = service.files().update(fileId=file_id, media_body=media, supportsAllDrives=True).execute()
-                _set_cached_file_id(r.get("id"))
-                return ("update", r.get("id"))
-            except HttpError as e:
-                if attempt == max_retries:
-                    break
-                time.sleep(2 * attempt)
-
-    # ---------- 2) ใช้ fileId จาก cache (state) ----------
-    file_id = _get_cached_file_id()
-    if file_id:
-        for attempt in range(1, max_retries + 1):
-            try:
-                r = service.files().update(fileId=file_id, media_body=media, supportsAllDrives=True).execute()
-                return ("update", r.get("id"))
-            except HttpError:
-                if attempt == max_retries:
-                    break
-                time.sleep(2 * attempt)
-
-    # ---------- 3) ค้นจากชื่อไฟล์ในโฟลเดอร์ ----------
-    exists = drive_find_file_in_folder(service, target_name, drive_folder_id)
-    if exists:
-        file_id = exists[0]["id"]
-        for attempt in range(1, max_retries + 1):
-            try:
-                r = service.files().update(fileId=file_id, media_body=media, supportsAllDrives=True).execute()
-                _set_cached_file_id(r.get("id"))
-                return ("update", r.get("id"))
-            except HttpError:
-                if attempt == max_retries:
-                    raise
-                time.sleep(2 * attempt)
+    tried = set()
+    for file_id in _candidates():
+        if not file_id or file_id in tried:
+            continue
+        tried.add(file_id)
+        try:
+            action, new_id = gdrive.upload(service, local_path, file_id=file_id,
+                                           mimetype=CSV_MIMETYPE, retries=max_retries)
+            _set_cached_file_id(new_id)
+            return (action, new_id)
+        except HttpError as e:
+            if not gdrive.is_no_access(e):
+                raise  # rate limit/5xx: ไม่ลองไฟล์อื่นหรือสร้างไฟล์ซ้ำ
+            continue
 
     # ---------- 4) ไม่พบ -> สร้างใหม่ + cache ----------
-    meta = {"name": target_name, "parents": [drive_folder_id]}
-    for attempt in range(1, max_retries + 1):
-        try:
-            r = service.files().create(
-                body=meta, media_body=media, fields="id,webViewLink", supportsAllDrives=True
-            ).execute()
-            _set_cached_file_id(r.get("id"))
-            return ("create", r.get("id"))
-        except HttpError:
-            if attempt == max_retries:
-                raise
-            time.sleep(2 * attempt)
-
-def _sha1(path: str) -> str:
-    h = hashlib.sha1()
-    with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(1024 * 1024), b""): h.update(chunk)
-    return h.hexdigest()
+    action, new_id = gdrive.upload(service, local_path, folder_id=drive_folder_id, name=target_name,
+                                   mimetype=CSV_MIMETYPE, retries=max_retries)
+    _set_cached_file_id(new_id)
+    return (action, new_id)
 
 def _load_upload_state() -> dict:
     if os.path.exists(UPLOAD_STATE_PATH):
@@ -374,108 +483,307 @@ def _set_cached_file_id(file_id: str) -> None:
     st["all_csv_file_id"] = file_id
     _save_upload_state(st)
 
-# === Main ===
-def run_all_provinces(headless=True):
-    ensure_outdir()
+# === Checkpoint / resume ===
+_ckpt_lock = threading.Lock()
 
-    options = webdriver.ChromeOptions()
-    if headless: options.add_argument("--headless=new")
-    options.add_argument("--no-sandbox"); options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--window-size=1920,1400")
+def _new_checkpoint() -> dict:
+    return {"run_id": RUN_ID, "started_at": RUN_STARTED_AT, "done": {}}
 
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    wait = WebDriverWait(driver, 25)
+def load_checkpoint() -> dict:
+    """checkpoint ที่ยังไม่หมดอายุ = รันก่อนหน้าค้าง -> ทำต่อเฉพาะจังหวัดที่เหลือ"""
+    if not os.path.exists(CHECKPOINT_PATH):
+        return _new_checkpoint()
+    try:
+        with open(CHECKPOINT_PATH, "r", encoding="utf-8") as f:
+            cp = json.load(f)
+        started = datetime.fromisoformat(cp["started_at"])
+        if (datetime.now() - started).total_seconds() > CHECKPOINT_MAX_AGE_H * 3600:
+            print("ℹ️ checkpoint เก่าเกินกำหนด เริ่มรอบใหม่")
+            return _new_checkpoint()
+        cp.setdefault("done", {})
+        return cp
+    except Exception:
+        return _new_checkpoint()
+
+def save_checkpoint(cp: dict):
+    tmp = CHECKPOINT_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cp, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, CHECKPOINT_PATH)
+
+def mark_province_done(cp: dict, value: str, label: str, rows: int, path: str):
+    with _ckpt_lock:
+        cp["done"][value] = {"label": label, "rows": rows, "file": path, "merged": not path}
+        save_checkpoint(cp)
+
+def drop_stale_done(cp: dict, provinces) -> None:
+    """
+    รายชื่อจังหวัดเปลี่ยน: value ที่ยังมีอยู่แต่ชื่อไม่ตรงกับที่ checkpoint จำไว้ -> ลบออกให้ดึงใหม่
+    (ไฟล์รายจังหวัดจะถูกเขียนทับ) ; value ที่หายไปจากรายชื่อเก็บไว้ให้ merge ข้อมูลที่ดึงมาแล้วตามปกติ
+    """
+    labels = dict(provinces)
+    with _ckpt_lock:
+        stale = [v for v, e in cp["done"].items() if v in labels and e.get("label") != labels[v]]
+        for v in stale:
+            del cp["done"][v]
+        if stale:
+            save_checkpoint(cp)
+    if stale:
+        print(f"🗑 รายชื่อจังหวัดเปลี่ยน: ดึงใหม่ {len(stale)} จังหวัดที่ checkpoint จำชื่อไว้ไม่ตรง")
+
+def province_out_path(value: str) -> str:
+    safe = re.sub(r"[^0-9A-Za-z_-]+", "_", value) or "province"
+    return os.path.join(PROVINCE_DIR, f"{safe}.csv")
+
+def _rollback_merge(cp: dict) -> None:
+    """
+    merge รอบก่อนตายระหว่างต่อท้ายกับบันทึก merged=True -> ตัด ALL_PATH กลับเป็นขนาดก่อนต่อท้าย
+    (journal "merging" ใน checkpoint) แล้ว merge จังหวัดชุดเดิมใหม่ -> ไม่มีแถวซ้ำ
+    """
+    with _ckpt_lock:
+        j = cp.pop("merging", None)
+    if not j:
+        return
+    size = j.get("size")
+    if os.path.exists(ALL_PATH):
+        if size is None:
+            os.remove(ALL_PATH)
+        elif os.path.getsize(ALL_PATH) > size:
+            with open(ALL_PATH, "r+b") as f:
+                f.truncate(size)
+        _header_cache.pop(ALL_PATH, None)
+    print(f"↩️ ยกเลิกการ merge ที่ค้างจากรอบก่อน ({len(j.get('values') or [])} จังหวัด) แล้ว merge ใหม่")
+    with _ckpt_lock:
+        save_checkpoint(cp)
+
+def merge_province_outputs(cp: dict) -> int:
+    """
+    ขั้นตอน merge เดียว: รวมไฟล์รายจังหวัดที่ยังไม่ได้ merge ต่อท้าย ALL_PATH แล้วลบทิ้ง
+    บันทึก journal (ขนาด ALL_PATH ก่อนต่อท้าย) ลง checkpoint ก่อนเขียน -> resume หลัง crash ไม่ต่อท้ายซ้ำ
+    """
+    _rollback_merge(cp)
+    pending = [(v, e) for v, e in cp["done"].items() if not e.get("merged") and e.get("file")]
+    frames, merged_values = [], []
+    for v, e in pending:
+        if os.path.exists(e["file"]):
+            frames.append(pd.read_csv(e["file"], dtype=str, keep_default_na=False, encoding="utf-8-sig"))
+        merged_values.append(v)
+    added = 0
+    if frames:
+        migrate_existing_csv_headers(ALL_PATH)
+        df, entry, exists = _align_to_header(pd.concat(frames, ignore_index=True), ALL_PATH)
+        with _ckpt_lock:
+            cp["merging"] = {"values": merged_values, "size": os.path.getsize(ALL_PATH) if exists else None}
+            save_checkpoint(cp)
+        added = _append_rows(df, ALL_PATH, entry, exists)
+    with _ckpt_lock:
+        for v in merged_values:
+            cp["done"][v]["merged"] = True
+        cp.pop("merging", None)
+        save_checkpoint(cp)
+    for v, e in pending:
+        try:
+            os.remove(e["file"])
+        except OSError:
+            pass
+    return added
 
-    total_start = time.perf_counter()
-    done_count = 0; per_prov_times = []
-    session_added_total = 0; session_rows_total = 0; session_errors = []
+# === Main ===
+def make_dgr_driver(headless=True):
+    # lean profile: ไม่ดาวน์โหลดรูป แต่ <img src> ยังอ่านได้สำหรับ TYPE_MAP
+    # path ของ chromedriver ถูก cache ไว้ (ไม่เรียก ChromeDriverManager().install() ทุกรอบ)
+    return make_chrome(headless=headless, user_agent=None, window_size="1920,1400")
 
-    try:
+def _limiter() -> rate_limit.HostLimiter:
+    return rate_limit.for_host(URL, rate=DGR_RATE)
+
+def open_search(driver, wait) -> Select:
+    limiter = _limiter()
+    limiter.acquire()
+    t0 = time.perf_counter()
+    with metrics.phase(metrics.PAGE_LOAD):
         driver.get(URL)
         select = Select(wait.until(EC.presence_of_element_located((By.ID, "country-dropdown"))))
-        provinces = [(opt.get_attribute("value").strip(), clean_text(opt.text)) for opt in select.options]
-        provinces = [(v, t) for v, t in provinces if v]
-        print(f"พบจังหวัดทั้งหมด {len(provinces)} จังหวัด")
-
-        for i, (value, label) in enumerate(provinces, 1):
-            prov_start = time.perf_counter()
-            print(f"\n[{i}/{len(provinces)}] ดึงข้อมูล: {label}")
-            status, error_msg = "success", ""
-            prov_rows = added_this = 0; collect_secs = 0.0
-
-            try:
-                select.select_by_value(value)
-                driver.find_element(By.CSS_SELECTOR,"button.btn.btn-primary[type='submit'], button.btn.btn-primary").click()
+    limiter.success(time.perf_counter() - t0)
+    return select
 
-                df, collect_secs = collect_table_all_pages(driver, wait)
-                prov_rows = len(df)
-                if df.empty:
-                    print(f"  ⚠️ ตารางว่างของ {label} ({format_secs(collect_secs)})")
-                else:
-                    # 1) เพิ่มจังหวัด + เวลาเก็บข้อมูล (ไทย)
-                    df.insert(0, "จังหวัด", label)
-                    df.insert(1, "วันที่เก็บข้อมูล", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+def scrape_province(driver, wait, value: str, label: str):
+    select = open_search(driver, wait)
+    try:
+        select.select_by_value(value)
+    except NoSuchElementException:
+        # value จาก cache ไม่มีบนหน้าแล้ว -> รอบถัดไปอ่านรายชื่อใหม่
+        province_cache.invalidate("dgr")
+        raise
+    driver.find_element(By.CSS_SELECTOR,"button.btn.btn-primary[type='submit'], button.btn.btn-primary").click()
+
+    df, collect_secs = collect_table_all_pages(driver, wait)
+    if not df.empty:
+        # 1) เพิ่มจังหวัด + เวลาเก็บข้อมูล (ไทย)
+        df.insert(0, "จังหวัด", label)
+        df.insert(1, "วันที่เก็บข้อมูล", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        # 2) รีเนมไทย -> อังกฤษ ตามที่กำหนด
+        df = rename_th_to_en(df)
+    return df, collect_secs
+
+def _start_workers(n: int, headless: bool) -> list:
+    drivers, lock = [], threading.Lock()
+    def _start():
+        try:
+            drv = make_dgr_driver(headless)
+        except Exception as e:
+            print(f"⚠️ เปิด worker ไม่สำเร็จ: {e}")
+            return
+        with lock:
+            drivers.append(drv)
+    threads = [threading.Thread(target=_start, daemon=True) for _ in range(n)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return drivers
+
+def run_all_provinces(headless=True, workers=DGR_WORKERS):
+    ensure_outdir()
+    os.makedirs(PROVINCE_DIR, exist_ok=True)
 
-                    # 2) รีเนมไทย -> อังกฤษ ตามที่กำหนด
-                    df = rename_th_to_en(df)
+    driver = make_dgr_driver(headless)
+    drivers = [driver]
 
-                    # 3) one-time: แปลงหัวไฟล์เก่าให้เป็นอังกฤษก่อน append (กันหัวปน)
-                    migrate_existing_csv_headers(ALL_PATH)
+    total_start = time.perf_counter()
+    stats = {"done": 0, "added": 0, "rows": 0}
+    per_prov_times = []; session_errors = []
+    stats_lock = threading.Lock()
 
-                    # 4) append save
-                    added_this = append_save(df, ALL_PATH)
-                    print(f"  ✅ บันทึกลงไฟล์รวม (+{added_this} แถว) | {format_secs(collect_secs)}")
-                    session_added_total += added_this; session_rows_total += prov_rows
-                done_count += 1
+    try:
+        # cache ยังไม่หมดอายุ = ไม่ต้องเปิดหน้าค้นหาเพื่ออ่านรายชื่อ
+        options, changed = province_cache.fresh("dgr"), False
+        if options is None:
+            select = open_search(driver, WebDriverWait(driver, 25))
+            with metrics.phase(metrics.EXTRACT):
+                options, changed = province_cache.lookup("dgr", driver, "#country-dropdown",
+                                                         keep=lambda n, v: bool(v))
+                if options is None:
+                    options = [(opt.text, opt.get_attribute("value").strip()) for opt in select.options]
+                    options = [(n, v) for n, v in options if v]
+                    changed = province_cache.save("dgr", options)
+        provinces = [(v, clean_text(n)) for n, v in options]
+        print(f"พบจังหวัดทั้งหมด {len(provinces)} จังหวัด")
 
-            except Exception as e:
-                status, error_msg = "error", str(e)
-                session_errors.append({"province": label, "error": error_msg})
-                print(f"  ❌ {label}: {e}")
-
-            prov_dur = time.perf_counter() - prov_start
-            per_prov_times.append(prov_dur)
-            write_run_log({
-                "run_id": RUN_ID, "started_at": RUN_STARTED_AT, "province": label, "province_value": value,
-                "rows_collected": prov_rows, "rows_appended_all_file": added_this,
-                "collect_secs": round(collect_secs, 3), "duration_secs": round(prov_dur, 3),
-                "status": status, "error": error_msg
-            })
-
-            # กลับหน้าเลือกจังหวัด
-            driver.get(URL)
-            select = Select(wait.until(EC.presence_of_element_located((By.ID, "country-dropdown"))))
-            time.sleep(random.uniform(0.8, 1.5))
+        cp = load_checkpoint()
+        if changed:
+            drop_stale_done(cp, provinces)
+        todo = [(v, t) for v, t in provinces if v not in cp["done"]]
+        if len(todo) < len(provinces):
+            print(f"↩️ ทำต่อจาก checkpoint (run {cp['run_id']}): เหลือ {len(todo)}/{len(provinces)} จังหวัด")
+
+        n_workers = max(1, min(workers, len(todo)))
+        if n_workers > 1:
+            drivers += _start_workers(n_workers - 1, headless)
+            print(f"ใช้ {len(drivers)} workers")
+
+        q = queue.Queue()
+        for i, pv in enumerate(todo, 1):
+            q.put((i, pv))
+
+        def _worker(drv):
+            wait = WebDriverWait(drv, 25)
+            while True:
+                try:
+                    i, (value, label) = q.get_nowait()
+                except queue.Empty:
+                    return
+                prov_start = time.perf_counter()
+                print(f"\n[{i}/{len(todo)}] ดึงข้อมูล: {label}")
+                status, error_msg = "success", ""
+                prov_rows = 0; collect_secs = 0.0
+
+                try:
+                    df, collect_secs = scrape_province(drv, wait, value, label)
+                    prov_rows = len(df)
+                    metrics.count("rows", prov_rows)
+                    if df.empty:
+                        print(f"  ⚠️ ตารางว่างของ {label} ({format_secs(collect_secs)})")
+                        mark_province_done(cp, value, label, 0, "")
+                    else:
+                        # 3) เขียนไฟล์รายจังหวัด แล้วบันทึกลง checkpoint (merge รวมตอนท้าย)
+                        out_path = province_out_path(value)
+                        df.to_csv(out_path, index=False, encoding="utf-8-sig")
+                        storage.save_frame(df, "dgr", date_col="CollectedAt", date_format="%Y-%m-%d %H:%M:%S")
+                        mark_province_done(cp, value, label, prov_rows, out_path)
+                        print(f"  ✅ บันทึกไฟล์รายจังหวัด ({prov_rows} แถว) | {format_secs(collect_secs)}")
+                    with stats_lock:
+                        stats["done"] += 1; stats["rows"] += prov_rows
+
+                except Exception as e:
+                    status, error_msg = "error", str(e)
+                    kind = ("stale" if isinstance(e, StaleElementReferenceException)
+                            else "timeout" if isinstance(e, TimeoutException) else "error")
+                    _limiter().failure(kind)
+                    with stats_lock:
+                        session_errors.append({"province": label, "error": error_msg})
+                    print(f"  ❌ {label}: {e}")
+
+                prov_dur = time.perf_counter() - prov_start
+                with stats_lock:
+                    per_prov_times.append(prov_dur)
+                    write_run_log({
+                        "run_id": RUN_ID, "started_at": RUN_STARTED_AT, "province": label, "province_value": value,
+                        # แถวที่เขียนลงไฟล์รายจังหวัด ; จำนวนที่ต่อท้ายไฟล์รวมจริงอยู่ใน session summary (merge ตอนท้าย)
+                        "rows_collected": prov_rows,
+                        "rows_written_province_file": prov_rows if status == "success" else 0,
+                        "collect_secs": round(collect_secs, 3), "duration_secs": round(prov_dur, 3),
+                        "status": status, "error": error_msg
+                    })
+
+        threads = [threading.Thread(target=_worker, args=(drv,), daemon=True) for drv in drivers]
+        for t in threads: t.start()
+        for t in threads: t.join()
+
+        # รวมไฟล์รายจังหวัด -> dgr_all_provinces.csv (ครั้งเดียวต่อรอบ)
+        with metrics.phase(metrics.MERGE):
+            stats["added"] = merge_province_outputs(cp)
+        print(f"\n🧩 รวมไฟล์รายจังหวัดลงไฟล์รวม (+{stats['added']} แถว)")
+        all_done = all(v in cp["done"] for v, _ in provinces)
+        if all_done:
+            os.remove(CHECKPOINT_PATH)
 
         total_dur = time.perf_counter() - total_start
+        print(f"🚦 {_limiter().summary()}")
         avg = (sum(per_prov_times) / len(per_prov_times)) if per_prov_times else 0.0
-        print("\n🎉 เสร็จสิ้นเก็บทุกจังหวัด")
-        print(f"⏱ รวม: {format_secs(total_dur)} | เฉลี่ย/จังหวัด: {format_secs(avg)} | สำเร็จ {done_count}/{len(provinces)}")
+        print("\n🎉 เสร็จสิ้นเก็บทุกจังหวัด" if all_done else "\n⚠️ ยังเหลือจังหวัดที่ไม่สำเร็จ (รันใหม่เพื่อทำต่อจาก checkpoint)")
+        print(f"⏱ รวม: {format_secs(total_dur)} | เฉลี่ย/จังหวัด: {format_secs(avg)} | สำเร็จ {stats['done']}/{len(todo)}")
 
         save_session_summary({
             "run_id": RUN_ID, "started_at": RUN_STARTED_AT, "finished_at": datetime.now().isoformat(timespec="seconds"),
-            "provinces_total": len(provinces), "provinces_done": done_count,
-            "session_rows_collected": session_rows_total, "session_rows_appended": session_added_total,
+            "provinces_total": len(provinces), "provinces_done": len(provinces) - len(todo) + stats["done"],
+            "session_rows_collected": stats["rows"], "session_rows_appended": stats["added"],
             "avg_secs_per_province": round(avg, 3), "duration_secs_total": round(total_dur, 3), "errors": session_errors,
         })
 
-        # อัปโหลดครั้งเดียว + skip ถ้าไฟล์ไม่เปลี่ยน
+        # อัปโหลดครั้งเดียว + skip ถ้าไฟล์ไม่เปลี่ยน (sha1 ต่อ fileId เก็บใน gdrive)
         if ENABLE_GOOGLE_DRIVE_UPLOAD and os.path.exists(ALL_PATH):
             try:
-                new_sha1 = _sha1(ALL_PATH)
-                state = _load_upload_state(); old_sha1 = state.get("all_csv_sha1")
-                if old_sha1 == new_sha1:
+                if gdrive.is_unchanged(ALL_PATH, DRIVE_FILE_ID_OVERRIDE or _get_cached_file_id()):
                     print("☁️ ข้ามอัปโหลด Google Drive (ไฟล์ไม่เปลี่ยน)")
                 else:
-                    service = _build_drive_service_with_service_account()
-                    action, file_id = drive_upload_or_update_csv(service, ALL_PATH, DRIVE_FOLDER_ID, os.path.basename(ALL_PATH))
-                    print(f"☁️ {'อัปเดต' if action=='update' else 'อัปโหลดใหม่'} ไปยัง Google Drive (fileId={file_id})")
-                    state["all_csv_sha1"] = new_sha1; _save_upload_state(state)
+                    with metrics.phase(metrics.UPLOAD):
+                        service = _build_drive_service_with_service_account()
+                        action, file_id = drive_upload_or_update_csv(service, ALL_PATH, DRIVE_FOLDER_ID, os.path.basename(ALL_PATH))
+                    print(f"☁️ {'อัปโหลดใหม่' if action=='create' else 'อัปเดต'} ไปยัง Google Drive (fileId={file_id})")
             except Exception as e:
                 print(f"⚠️ อัปโหลด Google Drive ล้มเหลว: {e}")
 
     finally:
-        driver.quit()
+        for drv in drivers:
+            try:
+                drv.quit()
+            except Exception:
+                pass
 
 if __name__ == "__main__":
-    run_all_provinces(headless=True)
+    import sys
+    if sys.argv[1:2] == ["migrate"]:
+        # offline: python scrap4.py migrate  (แปลงหัวไฟล์รวมโดยไม่ต้องเปิด browser)
+        migrate_existing_csv_headers(ALL_PATH)
+    else:
+        with metrics.run("scrap4"):
+            run_all_provinces(headless=True)
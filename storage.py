@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Output backend แบบ Parquet แบ่ง partition ตามวันที่เก็บ (+ จังหวัด/ประเภทเขื่อน ถ้ามี)
+
+    STORAGE_BACKEND=csv      (ค่าเดิม) ไม่เขียน Parquet
+    STORAGE_BACKEND=parquet  เขียน Parquet เพิ่มจาก CSV เดิมของแต่ละสคริปต์
+    PARQUET_ROOT=parquet_store
+
+โครงสร้าง: <PARQUET_ROOT>/<dataset>/collect_date=YYYY-MM-DD/[Province=...]/part-<run>-<n>.parquet
+อ่านช่วงวัน/สถานีด้วย read() จะแตะเฉพาะ partition ที่เกี่ยวข้อง
+export เป็น CSV ให้ฝั่ง Drive:  python storage.py export waterlevel out.csv --since 2025-01-01
+"""
+from __future__ import annotations
+
+import os, sys, itertools
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Union
+
+import pandas as pd
+
+from schema import (Schema, apply_schema, parse_numeric, dam_schema,
+                    TMD_FORECAST_SCHEMA, WATERLEVEL_SCHEMA, DGR_SCHEMA)
+
+STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "csv").lower()
+PARQUET_ROOT: str = os.getenv("PARQUET_ROOT", "parquet_store")
+DATE_PART = "collect_date"
+
+# dataset -> คอลัมน์ partition เพิ่มเติม (นอกจาก collect_date)
+DATASETS: Dict[str, List[str]] = {
+    "tmd_forecast": [],
+    "waterlevel": [],
+    "waterdam": ["DamType"],
+    "dgr": ["Province"],
+}
+
+# dataset -> schema คงที่ (หรือฟังก์ชันจากรายชื่อคอลัมน์) ; คอลัมน์ที่ไม่อยู่ใน schema = string
+# type ไม่ขึ้นกับค่าในแต่ละรอบ -> ทุกไฟล์ใน dataset อ่านรวมกันได้
+DATASET_SCHEMAS: Dict[str, Union[Schema, Callable[..., Schema]]] = {
+    "tmd_forecast": TMD_FORECAST_SCHEMA,
+    "waterlevel": WATERLEVEL_SCHEMA,
+    "waterdam": dam_schema,
+    "dgr": DGR_SCHEMA,
+}
+
+RUN_TAG = datetime.now().strftime("%Y%m%d-%H%M%S")
+_write_seq = itertools.count(1)
+
+def enabled() -> bool:
+    return STORAGE_BACKEND == "parquet"
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.dataset  # noqa: F401
+    except ImportError as e:
+        raise ImportError("STORAGE_BACKEND=parquet ต้องติดตั้ง pyarrow (pip install pyarrow)") from e
+
+# ---------- typing ----------
+def dataset_schema(dataset: str, columns) -> Schema:
+    sch = DATASET_SCHEMAS.get(dataset) or {}
+    return sch(columns) if callable(sch) else dict(sch)
+
+def _disk_schema(dataset: str, root: str):
+    """schema ของไฟล์ที่มีอยู่แล้วใน dataset (None = ยังไม่มี)"""
+    import pyarrow.dataset as ds
+    path = os.path.join(root, dataset)
+    if not os.path.isdir(path):
+        return None
+    try:
+        return ds.dataset(path, format="parquet", partitioning=_partitioning(dataset)).schema
+    except Exception:
+        return None
+
+def conform_to(table, disk):
+    """cast คอลัมน์ของ batch ใหม่ให้เป็น type เดียวกับไฟล์เดิม (ข้อความที่ไม่ใช่ตัวเลขในคอลัมน์ตัวเลข = NA)"""
+    import pyarrow as pa
+    if disk is None:
+        return table
+    for i, name in enumerate(table.column_names):
+        if name not in disk.names:
+            continue
+        target, col = disk.field(name).type, table.column(i)
+        if col.type == target:
+            continue
+        if pa.types.is_string(col.type) or pa.types.is_large_string(col.type):
+            if pa.types.is_integer(target) or pa.types.is_floating(target):
+                col = pa.array(parse_numeric(col.to_pandas(), "float64"), from_pandas=True)
+            elif pa.types.is_timestamp(target):
+                col = pa.array(pd.to_datetime(col.to_pandas(), errors="coerce"), from_pandas=True)
+        table = table.set_column(i, name, col.cast(target, safe=False))
+    return table
+
+# ---------- write ----------
+def _partitioning(dataset: str):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    cols = [DATE_PART] + DATASETS.get(dataset, [])
+    return ds.partitioning(pa.schema([(c, pa.string()) for c in cols]), flavor="hive")
+
+def write_partitioned(df: pd.DataFrame, dataset: str, date_col: Optional[str] = None,
+                      date_format: Optional[str] = None, root: str = PARQUET_ROOT) -> int:
+    """เขียน df ลง dataset; collect_date มาจาก date_col (ถ้ามี) ไม่งั้นใช้วันนี้"""
+    if df is None or df.empty:
+        return 0
+    _require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    part_cols = DATASETS.get(dataset, [])
+    today = datetime.now().strftime("%Y-%m-%d")
+    if date_col and date_col in df.columns:
+        dates = pd.to_datetime(df[date_col], format=date_format, errors="coerce").dt.strftime("%Y-%m-%d")
+        dates = dates.fillna(today)
+    else:
+        dates = today
+
+    df = apply_schema(df, dataset_schema(dataset, df.columns), default="string")
+    df.columns = [str(c) if not isinstance(c, int) else f"col_{c + 1}" for c in df.columns]
+    df[DATE_PART] = dates
+    for c in part_cols:
+        df[c] = df[c].astype("string").fillna("") if c in df.columns else ""
+
+    for c in df.columns:
+        # ให้ทุกไฟล์ใน dataset มี type เดียวกัน (category -> string, datetime -> us)
+        if isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype("string")
+        elif pd.api.types.is_datetime64_any_dtype(df[c]):
+            df[c] = df[c].astype("datetime64[us]")
+    table = conform_to(pa.Table.from_pandas(df, preserve_index=False), _disk_schema(dataset, root))
+    ds.write_dataset(
+        table, os.path.join(root, dataset), format="parquet",
+        partitioning=_partitioning(dataset),
+        basename_template=f"part-{RUN_TAG}-{next(_write_seq)}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    return len(df)
+
+def save_frame(df: pd.DataFrame, dataset: str, date_col: Optional[str] = None,
+               date_format: Optional[str] = None) -> int:
+    """เรียกจากสคริปต์หลังบันทึก CSV ตามปกติ; ไม่ทำอะไรถ้า STORAGE_BACKEND=csv"""
+    if not enabled():
+        return 0
+    try:
+        n = write_partitioned(df, dataset, date_col=date_col, date_format=date_format)
+        print(f"🗂 Parquet: {dataset} +{n} แถว -> {os.path.join(PARQUET_ROOT, dataset)}")
+        return n
+    except Exception as e:
+        print(f"⚠️ เขียน Parquet ({dataset}) ไม่สำเร็จ: {e}")
+        return 0
+
+# ---------- read / export ----------
+def read(dataset: str, since: Optional[str] = None, until: Optional[str] = None,
+         where: Optional[Dict[str, str]] = None, columns: Optional[List[str]] = None,
+         root: str = PARQUET_ROOT) -> pd.DataFrame:
+    """
+    อ่านเฉพาะ partition ที่ต้องใช้ เช่น 7 วันล่าสุดของสถานี X:
+        read("waterlevel", since="2025-06-01", where={"Station": "X"})
+    """
+    _require_pyarrow()
+    import pyarrow.dataset as ds
+
+    path = os.path.join(root, dataset)
+    if not os.path.isdir(path):
+        return pd.DataFrame()
+    dset = ds.dataset(path, format="parquet", partitioning=_partitioning(dataset))
+    flt = None
+    def _and(a, b):
+        return b if a is None else (a & b)
+    if since:
+        flt = _and(flt, ds.field(DATE_PART) >= since)
+    if until:
+        flt = _and(flt, ds.field(DATE_PART) <= until)
+    for k, v in (where or {}).items():
+        flt = _and(flt, ds.field(k) == v)
+    return dset.to_table(filter=flt, columns=columns).to_pandas()
+
+def export_csv(dataset: str, out_path: str, since: Optional[str] = None, until: Optional[str] = None,
+               root: str = PARQUET_ROOT) -> int:
+    df = read(dataset, since=since, until=until, root=root)
+    df.to_csv(out_path, index=False, encoding="utf-8-sig")
+    print(f"💾 export {dataset} -> {out_path} ({len(df):,} แถว)")
+    return len(df)
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Parquet store utilities")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ex = sub.add_parser("export", help="export dataset เป็น CSV")
+    ex.add_argument("dataset", choices=sorted(DATASETS))
+    ex.add_argument("out")
+    ex.add_argument("--since")
+    ex.add_argument("--until")
+    ex.add_argument("--root", default=PARQUET_ROOT)
+    args = ap.parse_args()
+    if args.cmd == "export":
+        export_csv(args.dataset, args.out, since=args.since, until=args.until, root=args.root)
+        sys.exit(0)
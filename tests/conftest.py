@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+fixture ร่วมของชุดทดสอบ: โมดูลของ repo อยู่ที่ราก (flat) + HTTP server ในเครื่องแทนเว็บจริง
+
+    def test_x(local_server):
+        srv = local_server(lambda req: (200, "text/html", "<html>...</html>"))
+        srv.url("/path")    # http://127.0.0.1:<port>/path
+        srv.requests        # [Request(method, path, query, headers, body), ...]
+"""
+from __future__ import annotations
+
+import os, sys, json, threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple, Union
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+def fixture_text(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+def fixture_json(name: str):
+    return json.loads(fixture_text(name))
+
+@pytest.fixture(autouse=True)
+def _no_rate_limit(monkeypatch):
+    """ทดสอบไม่ต้องรอ token ; limiter ต่อ host เริ่มใหม่ทุก test (test ที่ตรวจ limiter เปิดเอง)"""
+    import rate_limit
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", False)
+    monkeypatch.setattr(rate_limit, "_limiters", {})
+
+# ======================================================================
+# LOCAL SERVER
+# ======================================================================
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: Dict[str, List[str]]
+    headers: Dict[str, str]
+    body: bytes = b""
+
+# handler(req) -> (status, content_type, body) หรือ (status, headers_dict, body)
+Reply = Tuple[int, Union[str, Dict[str, str]], Union[str, bytes, dict, list]]
+
+@dataclass
+class Server:
+    base: str
+    requests: List[Request] = field(default_factory=list)
+
+    def url(self, path: str = "/") -> str:
+        return self.base + path
+
+def _make_handler(handler: Callable[[Request], Reply], log: List[Request], lock: threading.Lock):
+    class _H(BaseHTTPRequestHandler):
+        def log_message(self, *a):
+            pass
+
+        def _serve(self):
+            u = urlparse(self.path)
+            n = int(self.headers.get("Content-Length") or 0)
+            req = Request(self.command, u.path, parse_qs(u.query, keep_blank_values=True),
+                          {k.lower(): v for k, v in self.headers.items()}, self.rfile.read(n) if n else b"")
+            with lock:
+                log.append(req)
+            status, head, body = handler(req)
+            headers = {"Content-Type": head} if isinstance(head, str) else dict(head)
+            if isinstance(body, (dict, list)):
+                body = json.dumps(body, ensure_ascii=False)
+                headers.setdefault("Content-Type", "application/json")
+            data = body.encode("utf-8") if isinstance(body, str) else (body or b"")
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _serve
+
+    return _H
+
+@pytest.fixture
+def local_server():
+    servers: List[ThreadingHTTPServer] = []
+
+    def _start(handler: Callable[[Request], Reply]) -> Server:
+        log: List[Request] = []
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(handler, log, threading.Lock()))
+        httpd.daemon_threads = True
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        servers.append(httpd)
+        return Server(f"http://127.0.0.1:{httpd.server_address[1]}", log)
+
+    yield _start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""driver_factory: SessionBroker แยก browser ตาม option ที่เปลี่ยนหลังเปิดไม่ได้, quit() ปิดแค่ tab, cache path chromedriver"""
+from __future__ import annotations
+
+import json
+import os
+
+import pytest
+
+pytest.importorskip("selenium")
+
+import driver_factory as df
+import metrics
+
+class _SwitchTo:
+    def __init__(self, chrome):
+        self.chrome = chrome
+
+    def new_window(self, kind):
+        if self.chrome.dead:
+            raise RuntimeError("chrome not reachable")
+        self.chrome.current = self.chrome._open()
+
+    def window(self, handle):
+        assert handle in self.chrome.window_handles
+        self.chrome.current = handle
+
+class FakeChrome:
+    """webdriver.Chrome จำลอง: จด option ตอนเปิด + tab ที่เปิด/ปิด ; ไม่มี command_executor"""
+    launched: list = []
+
+    def __init__(self, options=None, service=None):
+        self.options, self.service = options, service
+        self.window_handles, self.closed, self.cdp = [], [], []
+        self.quit_called, self.cookies_cleared, self._n = 0, 0, 0
+        self.dead = False
+        self.switch_to = _SwitchTo(self)
+        self.current = self._open()
+        FakeChrome.launched.append(self)
+
+    def _open(self):
+        self._n += 1
+        h = f"tab-{self._n}"
+        self.window_handles.append(h)
+        return h
+
+    def close(self):
+        self.window_handles.remove(self.current)
+        self.closed.append(self.current)
+
+    def quit(self):
+        self.quit_called += 1
+
+    def execute_cdp_cmd(self, cmd, params):
+        self.cdp.append((cmd, params))
+
+    def delete_all_cookies(self):
+        self.cookies_cleared += 1
+
+    def set_window_size(self, w, h):
+        pass
+
+    def set_page_load_timeout(self, secs):
+        self.page_load_timeout = secs
+
+    def set_script_timeout(self, secs):
+        pass
+
+@pytest.fixture
+def chrome(monkeypatch):
+    FakeChrome.launched = []
+    monkeypatch.setattr(df.webdriver, "Chrome", FakeChrome)
+    monkeypatch.setattr(df, "chromedriver_service", lambda: None)
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+    return FakeChrome
+
+def _blocked(drv):
+    return [p["urls"] for c, p in drv.cdp if c == "Network.setBlockedURLs"][-1]
+
+def test_pool_key_separates_launch_options():
+    key = df.SessionBroker._pool_key
+    base = key(True, True, ("tmd.go.th", ""), None, ())
+    assert base == key(True, True, ["", "tmd.go.th"], "normal", [])
+    assert base != key(True, False, ("tmd.go.th",), None, ())
+    assert base != key(True, True, (), None, ())
+    assert base != key(False, True, ("tmd.go.th",), None, ())
+    assert base != key(True, True, ("tmd.go.th",), "eager", ())
+    assert base != key(True, True, ("tmd.go.th",), None, ("--lang=th",))
+
+def test_different_allow_or_lean_gets_different_browser(chrome):
+    with df.use_broker() as broker:
+        a = df.make_chrome(allow=["leaflet"])
+        b = df.make_chrome(allow=["maps.gstatic.com"])
+        c = df.make_chrome(lean=False)
+        assert isinstance(a, df.BrokeredDriver)
+        assert len({id(a._driver), id(b._driver), id(c._driver)}) == 3
+        assert "--blink-settings=imagesEnabled=false" not in c._driver.options.arguments
+        assert "*maps.gstatic.com*" in _blocked(a._driver) and "*maps.gstatic.com*" not in _blocked(b._driver)
+        leaflet = a._driver
+        a.quit()
+        d = df.make_chrome(lean=False)   # ไม่หยิบ browser lean ที่ว่างอยู่
+        assert d._driver is not leaflet and len(chrome.launched) == 4
+        e = df.make_chrome(allow=["leaflet"])
+        assert e._driver is leaflet and len(chrome.launched) == 4
+    assert all(drv.quit_called == 1 for drv in chrome.launched)
+    assert broker._all == [] and broker._idle == {}
+
+def test_quit_closes_only_its_tab(chrome):
+    with df.use_broker() as broker:
+        drv = df.make_chrome(page_load_timeout=30)
+        inner, key = drv._driver, drv._key
+        assert drv.page_load_timeout == 30   # proxy ไปที่ driver จริง
+        assert inner.window_handles == ["tab-1"]
+        drv.quit()
+        drv.quit()   # เรียกซ้ำไม่คืนเข้า pool ซ้ำ
+        assert inner.quit_called == 0 and inner.closed == ["tab-1"]
+        assert inner.window_handles == ["tab-2"] and inner.current == "tab-2"
+        assert inner.cookies_cleared == 1 and broker._idle[key] == [inner]
+        again = df.make_chrome()
+        assert again._driver is inner and inner.window_handles == ["tab-2"]
+        assert len(chrome.launched) == 1
+    assert inner.quit_called == 1
+
+def test_release_beyond_max_browsers_quits(chrome):
+    with df.use_broker(max_browsers=1):
+        a, b = df.make_chrome(), df.make_chrome()
+        a.quit()
+        b.quit()
+        kept, extra = chrome.launched
+        assert kept.quit_called == 0 and kept.window_handles == ["tab-2"]
+        assert extra.quit_called == 1
+
+def test_dead_browser_is_not_pooled(chrome):
+    with df.use_broker() as broker:
+        drv = df.make_chrome()
+        inner = drv._driver
+        inner.dead = True
+        drv.quit()
+        assert inner.quit_called == 1 and broker._all == [] and not any(broker._idle.values())
+
+def test_without_broker_make_chrome_launches_plain_driver(chrome):
+    drv = df.make_chrome(lean=False)
+    assert isinstance(drv, FakeChrome) and len(chrome.launched) == 1
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    path = tmp_path / "cache" / "chromedriver.json"
+    monkeypatch.setattr(df, "CHROMEDRIVER_CACHE", str(path))
+    monkeypatch.delenv("CHROMEDRIVER_PATH", raising=False)
+    binary = tmp_path / "chromedriver"
+    binary.write_text("#!/bin/sh\n")
+    binary.chmod(0o755)
+    lookups = []
+    monkeypatch.setattr(df, "_resolve_driver_path_uncached", lambda: lookups.append(1) or str(binary))
+    return path, str(binary), lookups
+
+def test_driver_path_cache_is_read_back(cache, monkeypatch):
+    path, binary, lookups = cache
+    assert df.resolve_driver_path() == binary
+    assert json.loads(path.read_text(encoding="utf-8")) == {"path": binary}
+    assert df.resolve_driver_path() == binary and len(lookups) == 1
+
+    os.chmod(binary, 0o644)   # path ใน cache รันไม่ได้แล้ว -> หาใหม่
+    assert df._cached_driver_path() == ""
+    os.chmod(binary, 0o755)
+    monkeypatch.setenv("CHROMEDRIVER_PATH", "/opt/chromedriver")
+    assert df.resolve_driver_path() == "/opt/chromedriver" and len(lookups) == 1
+
+def test_stale_cached_path_is_forgotten(cache, monkeypatch):
+    path, binary, _ = cache
+    df.resolve_driver_path()
+    calls = []
+
+    class Chrome(FakeChrome):
+        def __init__(self, options=None, service=None):
+            calls.append(service)
+            if service is not None:
+                raise RuntimeError("session not created: version mismatch")
+            super().__init__(options, service)
+
+    monkeypatch.setattr(df.webdriver, "Chrome", Chrome)
+    monkeypatch.setattr(df, "Service", lambda executable_path: ("svc", executable_path))
+    drv = df._launch(df.build_options())
+    assert isinstance(drv, Chrome) and calls == [("svc", binary), None]
+    assert not path.exists()
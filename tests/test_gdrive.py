@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+gdrive กับ Drive ปลอมในเครื่อง: upload (simple/resumable ตามขนาด, ข้ามไฟล์ที่ sha1 ไม่เปลี่ยน, ปลายทาง gzip)
+และ download แบบ stream (read_csv_chunks)
+"""
+from __future__ import annotations
+
+import gzip, json, re, threading
+from email.parser import BytesParser
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+httplib2 = pytest.importorskip("httplib2")
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+import gdrive
+
+# ======================================================================
+# FAKE DRIVE
+# ======================================================================
+class FakeDrive:
+    """
+    รับ files.update/files.create ของ upload endpoint:
+    uploadType=media|multipart = ครั้งเดียว ; uploadType=resumable = เปิด session แล้ว PUT ทีละ chunk
+    และ files.get_media (alt=media) ตาม header Range ; denied = {fileId: (status, reason)}
+    """
+
+    def __init__(self):
+        self.files = {}        # fileId -> (content_type, bytes)
+        self.meta = {}         # fileId -> metadata ของ multipart
+        self.sessions = {}     # session -> [fileId, content_type, bytearray]
+        self.denied = {}
+        self.lock = threading.Lock()
+        self.base = ""
+
+    def __call__(self, req):
+        with self.lock:
+            if req.path.startswith("/upload/session/"):
+                return self._chunk(req)
+            if req.method == "GET":
+                return self._media(req)
+            m = re.fullmatch(r"/upload/drive/v3/files(?:/([^/]+))?", req.path)
+            if not m:
+                return 404, {}, {"error": {"code": 404, "message": req.path}}
+            file_id = m.group(1) or f"new{len(self.files) + 1}"
+            kind = req.query["uploadType"][0]
+            if kind == "resumable":
+                sid = str(len(self.sessions) + 1)
+                self.sessions[sid] = [file_id, req.headers.get("x-upload-content-type", ""), bytearray()]
+                return 200, {"Location": f"{self.base}/upload/session/{sid}"}, b""
+            if kind == "multipart":
+                meta, ctype, data = _split_multipart(req)
+                self.meta[file_id] = meta
+            else:
+                ctype, data = req.headers.get("content-type", ""), req.body
+            self.files[file_id] = (ctype, data)
+            return 200, {}, {"id": file_id}
+
+    def _chunk(self, req):
+        file_id, ctype, buf = self.sessions[req.path.rsplit("/", 1)[1]]
+        buf += req.body
+        total = req.headers.get("content-range", "").rsplit("/", 1)[-1]
+        if total == "*" or len(buf) < int(total):
+            return 308, {"Range": f"bytes=0-{len(buf) - 1}"}, b""
+        self.files[file_id] = (ctype, bytes(buf))
+        return 200, {}, {"id": file_id}
+
+    def _media(self, req):
+        file_id = req.path.rsplit("/", 1)[1]
+        if file_id in self.denied or file_id not in self.files:
+            status, reason = self.denied.get(file_id, (404, "notFound"))
+            return status, {}, {"error": {"code": status, "errors": [{"reason": reason}], "message": reason}}
+        data = self.files[file_id][1]
+        m = re.fullmatch(r"bytes=(\d+)-(\d+)", req.headers.get("range", ""))
+        if not data or not m:
+            return 200, "text/csv", data
+        start, end = int(m.group(1)), min(int(m.group(2)), len(data) - 1)
+        return 206, {"Content-Type": "text/csv", "Content-Range": f"bytes {start}-{end}/{len(data)}"}, \
+            data[start:end + 1]
+
+    def uploads(self, srv):
+        return [r for r in srv.requests if r.path.startswith("/upload/drive/")]
+
+def _split_multipart(req):
+    msg = BytesParser().parsebytes(b"Content-Type: " + req.headers["content-type"].encode() + b"\r\n\r\n" + req.body)
+    meta, media = msg.get_payload()
+    return json.loads(meta.get_payload(decode=True)), media.get_content_type(), media.get_payload(decode=True)
+
+@pytest.fixture
+def drive(local_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(gdrive, "STATE_PATH", str(tmp_path / "state.json"))
+    monkeypatch.setattr(gdrive, "GZIP_FILE_IDS", set())
+    fake = FakeDrive()
+    srv = local_server(fake)
+    fake.base = srv.base
+    return _service(srv), fake, srv
+
+def _service(srv):
+    """Drive v3 client จาก discovery document ที่มากับ googleapiclient แต่ชี้ไปที่ server ในเครื่อง"""
+    doc = json.loads(get_static_doc("drive", "v3"))
+    doc["rootUrl"] = srv.url("/")
+    doc["baseUrl"] = srv.url("/" + doc["servicePath"])
+    return build_from_document(doc, http=gdrive.build_http(timeout=10))
+
+def _write(tmp_path, name, size, seed=b"Station,Level\n"):
+    path = tmp_path / name
+    line = b"\xe0\xb8\x81\xe0\xb8\x97\xe0\xb8\xa1,12.5\n"
+    path.write_bytes((seed + line * (size // len(line) + 1))[:size])
+    return str(path)
+
+# ======================================================================
+# SIMPLE / RESUMABLE
+# ======================================================================
+def test_small_file_uses_single_request(drive, tmp_path):
+    service, fake, srv = drive
+    path = _write(tmp_path, "small.csv", gdrive.SIMPLE_UPLOAD_MAX)
+    assert gdrive.upload(service, path, file_id="f1") == ("update", "f1")
+    (req,) = fake.uploads(srv)
+    assert (req.method, req.query["uploadType"]) == ("PATCH", ["media"])
+    assert fake.files["f1"] == ("text/csv", open(path, "rb").read())
+
+def test_large_file_uses_resumable_chunks(drive, tmp_path, monkeypatch):
+    service, fake, srv = drive
+    monkeypatch.setattr(gdrive, "SIMPLE_UPLOAD_MAX", 64 * 1024)
+    monkeypatch.setattr(gdrive, "MIN_CHUNK", gdrive._CHUNK_UNIT)
+    path = _write(tmp_path, "large.csv", 2 * gdrive._CHUNK_UNIT + 1000)
+    assert gdrive.chunk_size_for(2 * gdrive._CHUNK_UNIT + 1000) == gdrive._CHUNK_UNIT
+
+    assert gdrive.upload(service, path, file_id="f2") == ("update", "f2")
+    (start,) = fake.uploads(srv)
+    assert start.query["uploadType"] == ["resumable"]
+    chunks = [r for r in srv.requests if r.path.startswith("/upload/session/")]
+    assert [len(r.body) for r in chunks] == [gdrive._CHUNK_UNIT, gdrive._CHUNK_UNIT, 1000]
+    assert fake.files["f2"][1] == open(path, "rb").read()
+
+def test_just_over_threshold_switches_to_resumable(drive, tmp_path, monkeypatch):
+    service, fake, srv = drive
+    monkeypatch.setattr(gdrive, "SIMPLE_UPLOAD_MAX", 4096)
+    gdrive.upload(service, _write(tmp_path, "a.csv", 4096), file_id="a")
+    gdrive.upload(service, _write(tmp_path, "b.csv", 4097), file_id="b")
+    assert [r.query["uploadType"][0] for r in fake.uploads(srv)] == ["media", "resumable"]
+
+def test_create_sends_name_and_parent(drive, tmp_path):
+    service, fake, srv = drive
+    path = _write(tmp_path, "all.csv", 500)
+    action, new_id = gdrive.upload(service, path, folder_id="folder", name="รวม.csv")
+    assert action == "create"
+    assert fake.meta[new_id] == {"name": "รวม.csv", "parents": ["folder"]}
+    assert fake.files[new_id][1] == open(path, "rb").read()
+
+# ======================================================================
+# CONTENT HASH
+# ======================================================================
+def test_unchanged_content_is_skipped(drive, tmp_path):
+    service, fake, srv = drive
+    path = _write(tmp_path, "same.csv", 2000)
+    assert gdrive.upload(service, path, file_id="f3")[0] == "update"
+    assert gdrive.upload(service, path, file_id="f3") == ("skip", "f3")
+    assert len(fake.uploads(srv)) == 1
+    assert gdrive.load_state()["f3"]["sha1"] == gdrive.file_sha1(path)
+
+    # mtime เปลี่ยนแต่เนื้อเท่าเดิม = ยังข้าม ; เนื้อเปลี่ยน = อัปโหลด ; force = อัปโหลดเสมอ
+    _write(tmp_path, "same.csv", 2000)
+    assert gdrive.upload(service, path, file_id="f3")[0] == "skip"
+    _write(tmp_path, "same.csv", 2001)
+    assert gdrive.upload(service, path, file_id="f3")[0] == "update"
+    assert gdrive.upload(service, path, file_id="f3", force=True)[0] == "update"
+    assert len(fake.uploads(srv)) == 3
+
+def test_other_file_id_is_not_skipped(drive, tmp_path):
+    service, fake, srv = drive
+    path = _write(tmp_path, "x.csv", 300)
+    gdrive.upload(service, path, file_id="f4")
+    assert gdrive.upload(service, path, file_id="f5")[0] == "update"
+
+# ======================================================================
+# GZIP TARGETS
+# ======================================================================
+def test_gzip_target_uploads_compressed(drive, tmp_path, monkeypatch):
+    service, fake, srv = drive
+    monkeypatch.setattr(gdrive, "GZIP_FILE_IDS", {"gz1"})
+    path = _write(tmp_path, "big.csv", 50_000)
+    raw = open(path, "rb").read()
+
+    assert gdrive.upload(service, path, file_id="gz1") == ("update", "gz1")
+    ctype, data = fake.files["gz1"]
+    assert ctype == gdrive.GZIP_MIMETYPE
+    assert len(data) < len(raw) and gzip.decompress(data) == raw
+    # state เก็บ sha1/size ของไฟล์ต้นฉบับ -> รอบถัดไปข้ามได้
+    assert gdrive.load_state()["gz1"] == {**gdrive.load_state()["gz1"], "sha1": gdrive.file_sha1(path),
+                                          "size": len(raw), "gzip": True}
+    assert gdrive.upload(service, path, file_id="gz1")[0] == "skip"
+
+    gdrive.upload(service, path, file_id="plain")
+    assert fake.files["plain"] == ("text/csv", raw)
+
+def test_compressed_create_appends_gz_suffix(drive, tmp_path):
+    service, fake, srv = drive
+    path = _write(tmp_path, "out.csv", 1000)
+    _, new_id = gdrive.upload(service, path, folder_id="folder", compress=True)
+    assert fake.meta[new_id]["name"] == "out.csv.gz"
+    assert fake.files[new_id][0] == gdrive.GZIP_MIMETYPE
+    assert gzip.decompress(fake.files[new_id][1]) == open(path, "rb").read()
+
+# ======================================================================
+# NO ACCESS
+# ======================================================================
+def _http_error(status, reason=None):
+    from googleapiclient.errors import HttpError
+    body = {"error": {"code": status, "message": "x",
+                      "errors": [{"domain": "global", "reason": reason, "message": "x"}] if reason else []}}
+    resp = httplib2.Response({"status": status, "content-type": "application/json"})
+    return HttpError(resp, json.dumps(body).encode("utf-8"), uri="https://www.googleapis.com/drive/v3/files/x")
+
+@pytest.mark.parametrize("status, reason, expected", [
+    (404, "notFound", True),
+    (404, None, True),
+    (403, "forbidden", True),
+    (403, "insufficientFilePermissions", True),
+    (403, "rateLimitExceeded", False),
+    (403, "userRateLimitExceeded", False),
+    (403, None, False),
+    (429, "rateLimitExceeded", False),
+    (500, "backendError", False),
+])
+def test_is_no_access_checks_reason(status, reason, expected):
+    assert gdrive.is_no_access(_http_error(status, reason)) is expected
+
+def test_is_no_access_from_server_reply(local_server, tmp_path, monkeypatch):
+    from googleapiclient.errors import HttpError
+    monkeypatch.setattr(gdrive, "STATE_PATH", str(tmp_path / "state.json"))
+    replies = {"denied": (403, "insufficientFilePermissions"), "busy": (403, "userRateLimitExceeded")}
+
+    def reply(req):
+        status, reason = replies[req.path.rsplit("/", 1)[1]]
+        return status, {}, {"error": {"code": status, "errors": [{"reason": reason}], "message": reason}}
+
+    service = _service(local_server(reply))
+    path = _write(tmp_path, "x.csv", 100)
+    for file_id, expected in (("denied", True), ("busy", False)):
+        with pytest.raises(HttpError) as exc:
+            gdrive.upload(service, path, file_id=file_id, retries=0)
+        assert gdrive.is_no_access(exc.value) is expected
+
+# ======================================================================
+# STREAMING DOWNLOAD
+# ======================================================================
+THAI_CSV = "\ufeffสถานี,ระดับน้ำ\n" + "".join(f"แม่น้ำเจ้าพระยา {i},{i}.5\n" for i in range(9))
+
+@pytest.mark.parametrize("chunksize", [1, 2, 7, 64 * 1024])
+def test_read_csv_chunks_across_byte_boundaries(drive, monkeypatch, chunksize):
+    service, fake, srv = drive
+    fake.files["dl"] = ("text/csv", THAI_CSV.encode("utf-8"))
+    monkeypatch.setattr(gdrive, "DOWNLOAD_CHUNK", chunksize)
+    chunks = list(gdrive.read_csv_chunks(service, "dl", rows=4, dtype=str))
+    # BOM (3 ไบต์) และอักษรไทย (3 ไบต์/ตัว) ถูกตัดกลาง chunk แต่ decode ได้ครบ ; ตัด BOM ออกจากชื่อคอลัมน์
+    assert [len(c) for c in chunks] == [4, 4, 1]
+    assert list(chunks[0].columns) == ["สถานี", "ระดับน้ำ"]
+    assert chunks[2].iloc[0].tolist() == ["แม่น้ำเจ้าพระยา 8", "8.5"]
+    gets = [r for r in srv.requests if r.method == "GET"]
+    assert len(gets) == -(-len(THAI_CSV.encode("utf-8")) // chunksize)
+
+def test_open_download_reads_exact_bytes(drive):
+    service, fake, srv = drive
+    data = bytes(range(256)) * 40
+    fake.files["bin"] = ("application/octet-stream", data)
+    with gdrive.open_download(service, "bin", chunksize=1000) as f:
+        assert f.read(10) == data[:10]
+        assert f.read() == data[10:]
+        assert f.read() == b""
+
+def test_read_csv_chunks_empty_file(drive):
+    service, fake, srv = drive
+    fake.files["empty"] = ("text/csv", b"")
+    assert list(gdrive.read_csv_chunks(service, "empty")) == []
+
+def test_read_csv_chunks_closes_stream(drive, monkeypatch):
+    service, fake, srv = drive
+    fake.files["dl"] = ("text/csv", THAI_CSV.encode("utf-8"))
+    fake.files["empty"] = ("text/csv", b"")
+    opened = []
+    orig = gdrive.open_download
+    monkeypatch.setattr(gdrive, "open_download", lambda *a, **kw: opened.append(orig(*a, **kw)) or opened[-1])
+
+    list(gdrive.read_csv_chunks(service, "empty"))
+    gen = gdrive.read_csv_chunks(service, "dl", rows=2)
+    next(gen)
+    gen.close()                    # ผู้เรียกเลิกอ่านกลางทาง
+    list(gdrive.read_csv_chunks(service, "dl"))
+    assert len(opened) == 3 and all(s.closed for s in opened)
+
+@pytest.mark.parametrize("status, reason, no_access", [
+    (404, "notFound", True),
+    (403, "insufficientFilePermissions", True),
+    (403, "userRateLimitExceeded", False),
+])
+def test_read_csv_chunks_http_errors(drive, monkeypatch, status, reason, no_access):
+    from googleapiclient.errors import HttpError
+    monkeypatch.setattr("googleapiclient.http.time.sleep", lambda s: None)   # rate limit ถูก retry ก่อน raise
+    service, fake, srv = drive
+    fake.denied["x"] = (status, reason)
+    with pytest.raises(HttpError) as exc:
+        list(gdrive.read_csv_chunks(service, "x"))
+    assert exc.value.resp.status == status
+    assert gdrive.is_no_access(exc.value) is no_access
+    assert len(srv.requests) == (1 if no_access else 4)
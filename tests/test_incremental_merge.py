@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""incremental_merge: ต่อท้ายเฉพาะแถวใหม่ แต่ค่าที่ scrape ใหม่ต้องชนะค่าเก่าเหมือน drop_duplicates(keep="last")"""
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+import incremental_merge as im
+
+KEYS = ("Station", "Time")
+
+def _df(rows):
+    return pd.DataFrame(rows, columns=["Station", "Time", "Level"])
+
+def _read(path):
+    return pd.read_csv(path, dtype=str, encoding="utf-8-sig").sort_values(list(KEYS)).reset_index(drop=True)
+
+def test_append_only_new_keys(tmp_path):
+    path = str(tmp_path / "all.csv")
+    im.compact(_df([["a", "1", "1.0"], ["b", "1", "2.0"]]), KEYS, path)
+    assert im.append_new_rows(_df([["a", "1", "1.0"], ["c", "1", "3.0"]]), KEYS, path) == (1, 3)
+    assert im.append_new_rows(_df([["a", "1", "1.0"], ["c", "1", "3.0"]]), KEYS, path) == (0, 3)
+    assert _read(path)["Station"].tolist() == ["a", "b", "c"]
+
+def test_corrected_value_replaces_old_row(tmp_path):
+    path = str(tmp_path / "all.csv")
+    im.compact(_df([["a", "1", "1.0"], ["b", "1", "2.0"]]), KEYS, path)
+    added, total = im.append_new_rows(_df([["a", "1", "9.5"], ["c", "1", "3.0"]]), KEYS, path)
+    assert (added, total) == (2, 3)
+    out = _read(path)
+    assert out.set_index("Station")["Level"].to_dict() == {"a": "9.5", "b": "2.0", "c": "3.0"}
+    # รอบถัดไปด้วยข้อมูลเดิม = ไม่มีอะไรเปลี่ยน
+    assert im.append_new_rows(_df([["a", "1", "9.5"]]), KEYS, path) == (0, 3)
+
+def test_duplicates_within_batch_keep_last(tmp_path):
+    path = str(tmp_path / "all.csv")
+    im.append_new_rows(_df([["a", "1", "1.0"], ["a", "1", "1.5"]]), KEYS, path)
+    assert _read(path)["Level"].tolist() == ["1.5"]
+
+def test_missing_row_index_forces_compaction(tmp_path):
+    path = str(tmp_path / "all.csv")
+    im.compact(_df([["a", "1", "1.0"]]), KEYS, path)
+    assert not im.needs_compaction(path)
+    (tmp_path / "all.csv.rowidx").unlink()
+    assert im.needs_compaction(path)
+
+def test_close_releases_memmap(tmp_path):
+    path = str(tmp_path / "all.csv")
+    im.compact(_df([["a", "1", "1.0"]]), KEYS, path)
+    idx = im.KeyIndex.load(path + ".keyidx")
+    mm = idx._main._mmap
+    idx.close()
+    assert mm.closed and len(idx) == 0
+
+def test_new_column_rewrites_with_index_released(tmp_path, monkeypatch):
+    path = str(tmp_path / "all.csv")
+    im.compact(_df([["a", "1", "1.0"]]), KEYS, path)
+    mapped = []
+    orig_close = im.KeyIndex.close
+
+    def close(self):
+        mapped.append(getattr(self._main, "_mmap", None))
+        orig_close(self)
+
+    monkeypatch.setattr(im.KeyIndex, "close", close)
+    df = pd.DataFrame([["b", "1", "2.0", "x"]], columns=["Station", "Time", "Level", "Flag"])
+    assert im.append_new_rows(df, KEYS, path) == (1, 2)
+    # memmap ของ index ที่ append_new_rows เปิดไว้ต้องถูกปิดก่อน compact เขียนทับไฟล์
+    assert any(m is not None and m.closed for m in mapped)
+    assert list(pd.read_csv(path, nrows=0).columns) == ["Station", "Time", "Level", "Flag"]
+
+def test_dam_rows_keyed_on_identity_columns(tmp_path):
+    from schema import apply_schema, dam_key_columns, dam_schema
+    path = str(tmp_path / "dam.csv")
+    cols = ["0", "1", "2", "3", "DamType"]
+    schema = dam_schema(cols)
+    keys = dam_key_columns(cols)
+    assert keys == ["0", "2", "3", "DamType"]
+
+    def batch(value):
+        df = pd.DataFrame([["เขื่อนภูมิพล", value, "10/17/2026", "large", "large"]], columns=cols)
+        return apply_schema(df, schema)
+
+    assert im.append_new_rows(batch("1,234"), keys, path, schema) == (1, 1)
+    # ตัวเลขรูปแบบต่างกันแต่เป็นแถวเดียวกัน -> ไม่เพิ่มแถวซ้ำ
+    assert im.append_new_rows(batch("1234.00"), keys, path, schema) == (0, 1)
+    # ค่าแก้ไขของวันเดียวกัน -> แทนแถวเดิม
+    assert im.append_new_rows(batch("1300"), keys, path, schema)[1] == 1
+    assert pd.read_csv(path, dtype=str)["1"].tolist() == ["1300.0"]
+
+def test_compact_chunks_matches_compact(tmp_path):
+    rows = [["a", "1", "1.0"], ["b", "1", "2.0"], ["a", "1", "1.5"], ["c", "2", ""], ["b", "1", "2.5"]]
+    whole, streamed = str(tmp_path / "whole.csv"), str(tmp_path / "streamed.csv")
+    assert im.compact(_df(rows), KEYS, whole) == 3
+    assert im.compact_chunks((_df(rows[i:i + 2]) for i in range(0, len(rows), 2)), KEYS, streamed, rows=1) == 3
+    assert open(streamed, "rb").read() == open(whole, "rb").read()
+    for suffix in (".keyidx", ".rowidx"):
+        assert open(streamed + suffix, "rb").read() == open(whole + suffix, "rb").read()
+    assert sorted(p.name for p in tmp_path.iterdir() if "streamed" in p.name) == \
+        ["streamed.csv", "streamed.csv.keyidx", "streamed.csv.rowidx", "streamed.csv.state.json"]
+    # index ที่ได้ใช้ต่อกับ append_new_rows ได้ตามปกติ
+    assert im.append_new_rows(_df([["b", "1", "2.5"], ["d", "1", "4.0"]]), KEYS, streamed) == (1, 4)
+
+def test_compact_chunks_failure_keeps_old_file(tmp_path):
+    path = str(tmp_path / "all.csv")
+    im.compact(_df([["a", "1", "1.0"]]), KEYS, path)
+    before = open(path, "rb").read()
+
+    def broken():
+        yield _df([["z", "9", "9.0"]])
+        raise OSError("download cut")
+
+    with pytest.raises(OSError):
+        im.compact_chunks(broken(), KEYS, path)
+    assert open(path, "rb").read() == before
+    assert sorted(p.name for p in tmp_path.iterdir()) == \
+        ["all.csv", "all.csv.keyidx", "all.csv.rowidx", "all.csv.state.json"]
+    assert im.compact_chunks(iter(()), KEYS, path) == 0
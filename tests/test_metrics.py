@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""metrics: นับ WebDriver command ต่อชนิด + phase ซ้อนกันในรายงาน JSON ; disable() คืน method เดิม"""
+from __future__ import annotations
+
+import json
+
+import pytest
+
+import metrics
+
+class StubExecutor:
+    """command_executor จำลอง: จด (command, params) ; command ใน fail โยน error"""
+
+    def __init__(self, fail=()):
+        self.calls, self.fail = [], set(fail)
+
+    def execute(self, command, params):
+        self.calls.append(command)
+        if command in self.fail:
+            raise RuntimeError(command)
+        return {"value": None}
+
+class StubDriver:
+    def __init__(self, executor):
+        self.command_executor = executor
+
+@pytest.fixture(autouse=True)
+def enabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(metrics, "_run", None)
+    yield
+    metrics.disable()
+
+def _report(tmp_path):
+    files = list(tmp_path.glob("unit_*.json"))
+    assert len(files) == 1
+    return json.loads(files[0].read_text(encoding="utf-8"))
+
+def test_counts_commands_and_nested_phases(tmp_path):
+    ex = StubExecutor(fail={"findElement"})
+    drv = metrics.instrument(StubDriver(ex))
+    assert metrics.instrument(drv) is drv   # เรียกซ้ำไม่ห่อซ้อน
+
+    with metrics.run("unit"):
+        drv.command_executor.execute("newSession", {})
+        with metrics.phase(metrics.PAGE_LOAD):
+            drv.command_executor.execute("get", {"url": "x"})
+            with metrics.phase(metrics.SELECTOR):
+                drv.command_executor.execute("findElements", {})
+                drv.command_executor.execute("findElements", {})
+                with pytest.raises(RuntimeError):
+                    drv.command_executor.execute("findElement", {})
+            drv.command_executor.execute("executeScript", {})
+        with pytest.raises(ValueError), metrics.phase(metrics.EXTRACT):
+            raise ValueError("boom")
+        metrics.count("rows", 3)
+
+    assert metrics.current() is None
+    assert ex.calls == ["newSession", "get", "findElements", "findElements", "findElement", "executeScript"]
+    rep = _report(tmp_path)
+    cmds = rep["webdriver"]["commands"]
+    assert rep["webdriver"]["count"] == 6
+    assert {k: v["count"] for k, v in cmds.items()} == {
+        "newSession": 1, "get": 1, "findElements": 2, "findElement": 1, "executeScript": 1}
+    assert cmds["findElement"]["errors"] == 1 and cmds["get"]["errors"] == 0
+    phases = rep["phases"]
+    # command ถูกนับใน phase ในสุดที่กำลังทำงานอยู่เท่านั้น
+    assert phases[metrics.PAGE_LOAD]["webdriver_calls"] == {"get": 1, "executeScript": 1}
+    assert phases[metrics.SELECTOR]["webdriver_calls"] == {"findElements": 2, "findElement": 1}
+    assert phases[metrics.PAGE_LOAD]["secs"] >= phases[metrics.SELECTOR]["secs"]
+    assert phases[metrics.EXTRACT]["errors"] == 1 and phases[metrics.EXTRACT]["webdriver_calls"] == {}
+    assert rep["counters"] == {"rows": 3}
+
+def test_no_run_passes_through(tmp_path):
+    ex = StubExecutor()
+    drv = metrics.instrument(StubDriver(ex))
+    with metrics.phase(metrics.PARSE):
+        assert drv.command_executor.execute("get", {}) == {"value": None}
+    assert ex.calls == ["get"] and list(tmp_path.iterdir()) == []
+
+def test_disable_restores_executor(tmp_path):
+    ex = StubExecutor()
+    orig = ex.execute
+    metrics.instrument(StubDriver(ex))
+    assert ex.execute != orig
+    metrics.disable()
+    assert ex.execute == orig
+    assert not hasattr(ex, "_metrics_wrapped")
+    with metrics.run("unit") as r:
+        ex.execute("get", {})
+    assert r is None and list(tmp_path.iterdir()) == []
+
+def test_disable_restores_web_element():
+    pytest.importorskip("selenium")
+    from selenium.webdriver.remote.webelement import WebElement
+
+    originals = {attr: WebElement.__dict__[attr] for attr, _ in metrics._ATOMS}
+    metrics.instrument(StubDriver(StubExecutor()))
+    assert all(WebElement.__dict__[attr] is not originals[attr] for attr in originals)
+    metrics.instrument(StubDriver(StubExecutor()))   # driver ที่สองไม่ห่อ WebElement ซ้อน
+    metrics.disable()
+    assert {attr: WebElement.__dict__[attr] for attr in originals} == originals
+    assert "_metrics_originals" not in WebElement.__dict__
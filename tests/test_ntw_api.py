@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""ntw_api: จับคู่คอลัมน์จาก JSON ที่บันทึกไว้ + ดึงแบบแบ่งหน้า/ตรวจยอดรวมกับ server ในเครื่อง + discover"""
+from __future__ import annotations
+
+import pytest
+
+import ntw_api
+from conftest import fixture_json
+
+WL = fixture_json("ntw_waterlevel.json")
+WL_TABLE = fixture_json("ntw_waterlevel_table.json")
+DAM = fixture_json("ntw_dam_large.json")
+DAM_TABLE = fixture_json("ntw_dam_large_table.json")
+PAGE_SIZE = 10
+
+def _num_equal(rows_a, rows_b):
+    return all(ntw_api._same(a, b) for ra, rb in zip(rows_a, rows_b) for a, b in zip(ra, rb)) \
+        and len(rows_a) == len(rows_b)
+
+# ======================================================================
+# JSON -> ROWS (recorded fixtures)
+# ======================================================================
+def test_find_records_and_total():
+    assert len(ntw_api.find_records(WL)) == len(WL_TABLE)
+    assert ntw_api.find_total(WL) is None
+    assert ntw_api.find_total(DAM) == len(DAM_TABLE)
+    assert ntw_api.find_total({"meta": {"recordsTotal": "1,204"}, "data": []}) == 1204
+
+@pytest.mark.parametrize("payload, table", [(WL, WL_TABLE), (DAM, DAM_TABLE)])
+def test_learn_columns_reproduces_table(payload, table):
+    records = ntw_api.find_records(payload)
+    columns = ntw_api.learn_columns(records, table[:ntw_api.DISCOVER_SAMPLE_ROWS])
+    assert columns and None not in columns
+    assert _num_equal(ntw_api.records_to_rows(records, columns), table)
+
+def test_learn_columns_rejects_unmatched_column():
+    rows = [r + ["ไม่มีใน JSON"] for r in WL_TABLE[:3]]
+    assert ntw_api.learn_columns(ntw_api.find_records(WL), rows) is None
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://h/api/dam?type=large&page=1&size=10", ("https://h/api/dam?type=large&page={page}&size=10", 1)),
+    ("https://h/api/dam?pageIndex=0&size=10", ("https://h/api/dam?pageIndex={page}&size=10", 0)),
+    ("https://h/api/waterlevel?type=all", ("https://h/api/waterlevel?type=all", None)),
+])
+def test_page_template(url, expected):
+    assert ntw_api.page_template(url) == expected
+
+def test_table_total():
+    class Drv:
+        def __init__(self, texts):
+            self.texts = texts
+
+        def execute_script(self, js, *a):
+            return self.texts
+
+    assert ntw_api.table_total(Drv(["1–10 of 1,023"])) == 1023
+    assert ntw_api.table_total(Drv(["แสดง 1-10 จาก 95"])) == 95
+    assert ntw_api.table_total(Drv([])) is None
+
+# ======================================================================
+# LOCAL SERVER
+# ======================================================================
+def _ntw_site(total_field=True, honour_page=True, overstate=0):
+    """/api/dam?page=N&size=10 (1-based) | /api/dam_all (ทั้งหมด) | /api/dam_first (เฉพาะหน้าแรก ไม่มี total)"""
+    records = DAM["data"]
+
+    def handler(req):
+        size = int(req.query.get("size", [PAGE_SIZE])[0])
+        if req.path == "/api/dam":
+            page = int(req.query.get("page", ["1"])[0]) if honour_page else 1
+            body = {"data": records[(page - 1) * size: page * size]}
+            if total_field:
+                body["total"] = len(records) + overstate
+            return 200, "application/json", body
+        if req.path == "/api/dam_all":
+            return 200, "application/json", {"total": len(records), "data": records}
+        if req.path == "/api/dam_first":
+            return 200, "application/json", {"data": records[:size]}
+        return 404, "text/plain", ""
+
+    return handler
+
+@pytest.mark.parametrize("total_field", [True, False])
+def test_fetch_all_records_paginated(local_server, total_field):
+    srv = local_server(_ntw_site(total_field=total_field))
+    recs = ntw_api.fetch_all_records(ntw_api.make_session(), srv.url("/api/dam?page={page}&size=10"), workers=3)
+    assert [r["id"] for r in recs] == [r["id"] for r in DAM["data"]]
+    pages = sorted(int(r.query["page"][0]) for r in srv.requests)
+    # รู้ยอดรวม = ยิงเท่าจำนวนหน้าพอดี ; ไม่รู้ = หยุดหลังชุด (workers หน้า) ที่เจอหน้าสั้น
+    assert pages == ([1, 2, 3] if total_field else [1, 2, 3, 4])
+
+def test_fetch_all_records_raises_when_short_of_total(local_server):
+    srv = local_server(_ntw_site(overstate=5))
+    with pytest.raises(ValueError):
+        ntw_api.fetch_all_records(ntw_api.make_session(), srv.url("/api/dam?page={page}&size=10"))
+
+def test_fetch_all_records_raises_when_page_ignored(local_server):
+    srv = local_server(_ntw_site(total_field=False, honour_page=False))
+    with pytest.raises(ValueError):
+        ntw_api.fetch_all_records(ntw_api.make_session(), srv.url("/api/dam?page={page}&size=10"))
+
+def test_unpaginated_url_checks_reported_total(local_server):
+    srv = local_server(_ntw_site())
+    assert len(ntw_api.fetch_all_records(ntw_api.make_session(), srv.url("/api/dam_all"))) == len(DAM_TABLE)
+    with pytest.raises(ValueError):
+        ntw_api.fetch_all_records(ntw_api.make_session(), srv.url("/api/dam?page=1&size=10"))
+
+# ======================================================================
+# DISCOVER -> fetch_table
+# ======================================================================
+class FakeDriver:
+    """แทน driver ที่ render ตารางแล้ว: XHR ที่หน้าเว็บเรียก + ข้อความ pagination ของ MUI"""
+
+    def __init__(self, urls, shown_total):
+        self.urls, self.shown_total = urls, shown_total
+
+    def execute_script(self, js, *args):
+        if "getEntriesByType" in js:
+            return list(self.urls)
+        if "MuiTablePagination" in js:
+            return [f"1–{PAGE_SIZE} of {self.shown_total}"]
+        return None
+
+@pytest.fixture
+def endpoint_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(ntw_api, "ENDPOINT_CACHE", str(tmp_path / "ep.json"))
+    for k in ("NTW_DAM_LARGE_URL", "NTW_DAM_LARGE_COLUMNS"):
+        monkeypatch.delenv(k, raising=False)
+
+def test_discover_templates_page_param(local_server, endpoint_cache):
+    srv = local_server(_ntw_site())
+    drv = FakeDriver([srv.url("/static/app.json"), srv.url("/api/dam?page=1&size=10")], len(DAM_TABLE))
+    assert ntw_api.discover(drv, "dam_large", DAM_TABLE[:PAGE_SIZE])
+    ep = ntw_api.load_endpoint("dam_large")
+    assert ep["url"].endswith("page={page}&size=10") and ep["page_start"] == 1
+    assert _num_equal(ntw_api.fetch_table("dam_large"), DAM_TABLE)
+
+def test_discover_skips_partial_endpoint(local_server, endpoint_cache):
+    srv = local_server(_ntw_site())
+    drv = FakeDriver([srv.url("/api/dam_first?size=10")], len(DAM_TABLE))
+    assert not ntw_api.discover(drv, "dam_large", DAM_TABLE[:PAGE_SIZE])
+    assert ntw_api.load_endpoint("dam_large") is None
+    with pytest.raises(LookupError):
+        ntw_api.fetch_table("dam_large")
+
+def test_discover_accepts_full_unpaginated_endpoint(local_server, endpoint_cache):
+    srv = local_server(_ntw_site())
+    drv = FakeDriver([srv.url("/api/dam_all")], len(DAM_TABLE))
+    assert ntw_api.discover(drv, "dam_large", DAM_TABLE[:PAGE_SIZE])
+    assert len(ntw_api.fetch_table("dam_large")) == len(DAM_TABLE)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""province_cache.lookup: TTL ยังไม่หมด / รายชื่อไม่เปลี่ยน / เปลี่ยน / อ่านได้น้อยผิดปกติ"""
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import province_cache as pc
+
+PROVINCES = [(f"จังหวัด {i}", str(i)) for i in range(1, 13)]
+
+class FakeDriver:
+    """execute_script ของ _READ_OPTIONS_JS คืน [[text, value], ...] ; นับจำนวนครั้งที่อ่าน DOM"""
+
+    def __init__(self, options):
+        self.options, self.reads = options, 0
+
+    def execute_script(self, script, select):
+        self.reads += 1
+        return [list(o) for o in self.options]
+
+@pytest.fixture(autouse=True)
+def cache_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(pc, "CACHE_PATH", str(tmp_path / "province_cache.json"))
+    return tmp_path / "province_cache.json"
+
+def _expire(key, hours=pc.TTL_HOURS + 1):
+    data = json.loads(open(pc.CACHE_PATH, encoding="utf-8").read())
+    data[key]["checked_at"] = (datetime.now() - timedelta(hours=hours)).isoformat(timespec="seconds")
+    open(pc.CACHE_PATH, "w", encoding="utf-8").write(json.dumps(data, ensure_ascii=False))
+    return data[key]
+
+def _entry(key):
+    return json.loads(open(pc.CACHE_PATH, encoding="utf-8").read())[key]
+
+def test_ttl_hit_skips_dom():
+    pc.save("tmd", PROVINCES)
+    drv = FakeDriver([])
+    assert pc.lookup("tmd", drv, "#sel") == (PROVINCES, False)
+    assert drv.reads == 0
+
+def test_first_read_is_not_a_change():
+    drv = FakeDriver(PROVINCES)
+    assert pc.lookup("tmd", drv, "#sel") == (PROVINCES, False)
+    assert drv.reads == 1 and _entry("tmd")["checksum"] == pc.checksum(PROVINCES)
+
+def test_unchanged_list_only_refreshes_checked_at(monkeypatch):
+    pc.save("tmd", PROVINCES)
+    before = _expire("tmd")
+    saved = []
+    monkeypatch.setattr(pc, "save", lambda *a: saved.append(a) or True)
+    drv = FakeDriver(PROVINCES)
+    assert pc.lookup("tmd", drv, "#sel") == (PROVINCES, False)
+    after = _entry("tmd")
+    assert saved == [] and drv.reads == 1
+    assert (after["options"], after["checksum"]) == (before["options"], before["checksum"])
+    assert after["checked_at"] > before["checked_at"]
+    assert pc.fresh("tmd") == PROVINCES
+
+def test_changed_list_is_reported_and_saved():
+    pc.save("dgr", PROVINCES)
+    _expire("dgr")
+    renamed = [("จังหวัดใหม่", "1")] + PROVINCES[1:]
+    options, changed = pc.lookup("dgr", FakeDriver(renamed), "#sel")
+    assert (options, changed) == (renamed, True)
+    assert _entry("dgr")["checksum"] == pc.checksum(renamed)
+    # รอบถัดไป (ยังไม่หมดอายุ) ไม่แจ้งซ้ำ
+    assert pc.lookup("dgr", FakeDriver([]), "#sel") == (renamed, False)
+
+def test_too_few_options_leaves_cache_alone():
+    pc.save("dgr", PROVINCES)
+    before = _expire("dgr")
+    header_only = [("เลือกจังหวัด", "")] + PROVINCES[:3]
+    assert pc.lookup("dgr", FakeDriver(header_only), "#sel", keep=lambda n, v: bool(v)) == (None, False)
+    assert _entry("dgr") == before
+
+def test_keep_filter_and_read_error():
+    options, changed = pc.lookup("tmd", FakeDriver([("เลือกจังหวัด", "")] + PROVINCES), "#sel",
+                                 keep=lambda n, v: bool(v))
+    assert (options, changed) == (PROVINCES, False)
+
+    class Broken:
+        def execute_script(self, *a):
+            raise RuntimeError("stale")
+
+    _expire("tmd")
+    assert pc.lookup("tmd", Broken(), "#sel") == (None, False)
+
+def test_save_reports_change_and_invalidate():
+    assert pc.save("tmd", PROVINCES) is False
+    assert pc.save("tmd", PROVINCES) is False
+    assert pc.save("tmd", PROVINCES[:-1]) is True
+    pc.invalidate("tmd")
+    assert pc.fresh("tmd") is None
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""rate_limit.limited_get: ทุกคำขอ HTTP ผ่าน acquire + success/failure ของ limiter ต่อ host (รวมจาก thread pool)"""
+from __future__ import annotations
+
+import time
+
+import pytest
+
+import ntw_api
+import rate_limit
+import tmd_http
+from test_ntw_api import DAM, _ntw_site
+from test_tmd_http import PROVINCES, _tmd_site
+
+@pytest.fixture
+def limiter(monkeypatch):
+    """เปิด limiter จริง (rate สูง ไม่มี jitter) ของ host ที่ server ในเครื่องฟังอยู่"""
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    return lambda srv: rate_limit.for_host(srv.url("/"), rate=20, max_rate=50, jitter=0)
+
+def _session():
+    import requests
+    return requests.Session()   # ไม่มี Retry ของ urllib3 -> 1 คำขอ = 1 ครั้งที่ยิงจริง
+
+def test_success_and_server_errors(local_server, limiter):
+    replies = {"/ok": 200, "/missing": 404, "/busy": 503, "/slow-down": 429}
+    srv = local_server(lambda req: (replies[req.path], "text/plain", "x"))
+    lim = limiter(srv)
+
+    assert rate_limit.limited_get(_session(), srv.url("/ok"), timeout=5).status_code == 200
+    assert (lim.stats["increases"], lim.rate) == (1, pytest.approx(20.1))
+    rate_limit.limited_get(_session(), srv.url("/missing"), timeout=5)   # 404 ไม่ใช่สัญญาณว่าเว็บรับไม่ไหว
+    assert lim.stats["decreases"] == 0
+    rate_limit.limited_get(_session(), srv.url("/busy"), timeout=5)
+    rate_limit.limited_get(_session(), srv.url("/slow-down"), timeout=5)
+    assert lim.stats["decreases"] == 2
+    assert lim.stats["requests"] == 4
+
+def test_timeout_reports_failure(local_server, limiter):
+    import requests
+
+    def slow(req):
+        time.sleep(0.5)
+        return 200, "text/plain", "late"
+
+    srv = local_server(slow)
+    lim = limiter(srv)
+    with pytest.raises(requests.Timeout):
+        rate_limit.limited_get(_session(), srv.url("/"), timeout=0.1)
+    assert (lim.stats["requests"], lim.stats["decreases"]) == (1, 1)
+
+def test_tmd_workers_share_host_limiter(local_server, limiter):
+    srv = local_server(_tmd_site())
+    lim = limiter(srv)
+    session = tmd_http.make_session(4)
+    mapping = tmd_http.fetch_province_mapping(session, srv.url("/"))
+    rows, failed = tmd_http.scrape_provinces(session, srv.url("/api/forecast?province={value}"),
+                                             mapping, list(mapping), workers=4)
+    assert (len(rows), failed) == (PROVINCES, [])
+    assert lim.stats["requests"] == len(srv.requests) == PROVINCES + 1
+    assert rate_limit.for_host(srv.url("/api/forecast")) is lim
+
+def test_ntw_page_fanout_shares_host_limiter(local_server, limiter):
+    srv = local_server(_ntw_site())
+    lim = limiter(srv)
+    recs = ntw_api.fetch_all_records(ntw_api.make_session(), srv.url("/api/dam?page={page}&size=10"), workers=3)
+    assert len(recs) == len(DAM["data"])
+    assert lim.stats["requests"] == len(srv.requests) == 3
+
+def test_disabled_limiter_does_not_wait(local_server, monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", False)
+    srv = local_server(lambda req: (200, "text/plain", "x"))
+    lim = rate_limit.for_host(srv.url("/"), rate=0.2, min_rate=0.2)
+    t0 = time.perf_counter()
+    for _ in range(3):
+        rate_limit.limited_get(_session(), srv.url("/"), timeout=5)
+    assert time.perf_counter() - t0 < 2
+    assert lim.stats["requests"] == 0
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""scrap3.scrape_data: คลิก Next แล้วหน้าไม่เปลี่ยน -> คลิกซ้ำครั้งเดียว ไม่อ่านหน้าเดิมซ้ำ"""
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("selenium")
+
+import scrap3
+
+class FakeTable:
+    """ตาราง MUI จำลอง: pages[i] = แถวของหน้า i ; lost_clicks = ลำดับคลิกที่หน้าไม่เปลี่ยน (1-based)"""
+
+    def __init__(self, pages, lost_clicks=()):
+        self.pages, self.lost = pages, set(lost_clicks)
+        self.page, self.clicks = 0, 0
+
+    def execute_script(self, script, *args):
+        self.clicks += 1
+        if self.clicks not in self.lost:
+            self.page += 1
+
+    def first_row_text(self, *a, **kw):
+        return " ".join(self.pages[self.page][0])
+
+class _Button:
+    def __init__(self, table):
+        self.table = table
+
+    def is_enabled(self):
+        return self.table.page < len(self.table.pages) - 1
+
+@pytest.fixture
+def table(monkeypatch):
+    holder = {}
+
+    class Wait:
+        def __init__(self, driver, timeout, *a, **kw):
+            pass
+
+        def until(self, cond):
+            return _Button(holder["t"])
+
+    monkeypatch.setattr(scrap3, "WebDriverWait", Wait)
+    monkeypatch.setattr(scrap3, "wait_dom_quiet", lambda *a, **kw: True)
+    monkeypatch.setattr(scrap3, "first_row_text", lambda d, *a, **kw: d.first_row_text())
+    monkeypatch.setattr(scrap3, "read_mui_table", lambda d: [list(r) for r in d.pages[d.page]])
+    monkeypatch.setattr(scrap3, "wait_first_row_text_change",
+                        lambda d, css, old, timeout=0: d.first_row_text() != old)
+    monkeypatch.setattr(scrap3, "NTW_ENGINE", "selenium")
+
+    def make(pages, lost_clicks=()):
+        holder["t"] = FakeTable(pages, lost_clicks)
+        return holder["t"]
+
+    return make
+
+PAGES = [[["เขื่อน A", "1"], ["เขื่อน B", "2"]], [["เขื่อน C", "3"]], [["เขื่อน D", "4"]]]
+TAB = next(iter(scrap3.TABS))
+
+def _names(rows):
+    return [r[0] for r in rows]
+
+def test_reads_every_page_once(table):
+    drv = table(PAGES)
+    assert _names(scrap3.scrape_data(drv, TAB)) == ["เขื่อน A", "เขื่อน B", "เขื่อน C", "เขื่อน D"]
+    assert drv.clicks == 2
+
+def test_lost_click_is_retried_without_rereading(table):
+    drv = table(PAGES, lost_clicks={1})
+    assert _names(scrap3.scrape_data(drv, TAB)) == ["เขื่อน A", "เขื่อน B", "เขื่อน C", "เขื่อน D"]
+    assert drv.clicks == 3
+
+def test_stuck_page_raises(table):
+    drv = table(PAGES, lost_clicks={2, 3})
+    with pytest.raises(TimeoutError):
+        scrap3.scrape_data(drv, TAB)
+    assert drv.clicks == 3
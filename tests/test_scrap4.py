@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""scrap4: header registry ของไฟล์รวม DGR + merge ไฟล์รายจังหวัด (ต้องมี selenium เพราะ scrap4 import ตอนโหลดโมดูล)"""
+from __future__ import annotations
+
+import json
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("selenium")
+
+import scrap4
+
+TH_HEADER = ["จังหวัด", "วันที่เก็บข้อมูล", "ความลึก (เมตร)", "ปริมาณน้ำ (เมตร³/ชม.)"]
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    scrap4._header_cache.clear()
+    yield
+    scrap4._header_cache.clear()
+
+def _header(path):
+    return list(pd.read_csv(path, nrows=0, encoding="utf-8-sig").columns)
+
+def _en_rows(n=1):
+    return pd.DataFrame({"Province": ["ขอนแก่น"] * n, "CollectedAt": ["2026-01-01 08:00:00"] * n,
+                         "Depth": ["12.5"] * n, "Flow": ["3"] * n})
+
+def test_rename_columns_matches_frame_rename():
+    cols = ["ลำดับ", "ความลึก  (เมตร)", "จังหวัด", "อื่น ๆ"]
+    df = pd.DataFrame([["1", "2", "3", "4"]], columns=cols)
+    assert scrap4.rename_columns_th_to_en(cols) == list(scrap4.rename_th_to_en(df).columns)
+    assert scrap4.rename_columns_th_to_en(cols) == ["Province", "No", "Depth", "อื่น ๆ"]
+
+def test_migrate_renames_thai_header(tmp_path):
+    path = str(tmp_path / "all.csv")
+    pd.DataFrame([["ขอนแก่น", "2026-01-01 08:00:00", "10", "2"]], columns=TH_HEADER) \
+        .to_csv(path, index=False, encoding="utf-8-sig")
+    scrap4.migrate_existing_csv_headers(path)
+    assert _header(path) == ["Province", "CollectedAt", "Depth", "Flow"]
+    assert json.load(open(path + ".header.json", encoding="utf-8"))["migrated"] is True
+    assert list(tmp_path.glob("all.csv.bak.*"))
+
+    scrap4.append_save(_en_rows(), path)
+    assert _header(path) == ["Province", "CollectedAt", "Depth", "Flow"]
+    assert len(pd.read_csv(path, encoding="utf-8-sig")) == 2
+
+def test_append_save_survives_bad_sidecar(tmp_path):
+    path = str(tmp_path / "all.csv")
+    scrap4.append_save(_en_rows(), path)
+    with open(path + ".header.json", "w", encoding="utf-8") as f:
+        json.dump({"columns": 5, "migrated": True, "size": (tmp_path / "all.csv").stat().st_size}, f)
+    scrap4._header_cache.clear()
+    assert scrap4.append_save(_en_rows(2), path) == 2
+    assert len(pd.read_csv(path, encoding="utf-8-sig")) == 3
+    # รอบถัดไปอ่านหัวจากไฟล์จริงได้ตามปกติ
+    assert scrap4.load_header(path)["columns"] == ["Province", "CollectedAt", "Depth", "Flow"]
+
+# ======================================================================
+# merge_province_outputs: crash ระหว่างต่อท้ายกับบันทึก checkpoint
+# ======================================================================
+@pytest.fixture
+def dgr_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(scrap4, "ALL_PATH", str(tmp_path / "all.csv"))
+    monkeypatch.setattr(scrap4, "CHECKPOINT_PATH", str(tmp_path / "cp.json"))
+    monkeypatch.setattr(scrap4, "PROVINCE_DIR", str(tmp_path))
+    return tmp_path
+
+def _done_province(cp, value, n):
+    path = scrap4.province_out_path(value)
+    _en_rows(n).assign(Province=value).to_csv(path, index=False, encoding="utf-8-sig")
+    scrap4.mark_province_done(cp, value, value, n, path)
+
+@pytest.mark.parametrize("existing", [False, True])
+def test_resume_after_crash_does_not_duplicate(dgr_dirs, monkeypatch, existing):
+    if existing:
+        scrap4.append_save(_en_rows(3).assign(Province="เก่า"), scrap4.ALL_PATH)
+    cp = scrap4._new_checkpoint()
+    _done_province(cp, "10", 2)
+    _done_province(cp, "20", 4)
+
+    real_save, calls = scrap4.save_checkpoint, []
+
+    def crash_after_append(c):
+        calls.append(1)
+        if any(e.get("merged") for e in c["done"].values()):
+            raise SystemExit("killed")
+        real_save(c)
+
+    monkeypatch.setattr(scrap4, "save_checkpoint", crash_after_append)
+    with pytest.raises(SystemExit):
+        scrap4.merge_province_outputs(cp)
+    monkeypatch.setattr(scrap4, "save_checkpoint", real_save)
+
+    resumed = scrap4.load_checkpoint()
+    assert "merging" in resumed
+    scrap4._header_cache.clear()
+    assert scrap4.merge_province_outputs(resumed) == 6
+    out = pd.read_csv(scrap4.ALL_PATH, encoding="utf-8-sig", dtype=str)
+    assert out["Province"].value_counts().to_dict() == {**({"เก่า": 3} if existing else {}), "10": 2, "20": 4}
+    final = scrap4.load_checkpoint()
+    assert "merging" not in final and all(e["merged"] for e in final["done"].values())
+
+# ======================================================================
+# run log
+# ======================================================================
+def test_run_log_adds_renamed_column(tmp_path, monkeypatch):
+    monkeypatch.setattr(scrap4, "OUT_DIR", str(tmp_path))
+    monkeypatch.setattr(scrap4, "RUN_LOG_PATH", str(tmp_path / "log.csv"))
+    # log จากรอบเก่าที่ยังใช้ rows_appended_all_file
+    pd.DataFrame([{"province": "ก", "rows_collected": 5, "rows_appended_all_file": 5}]).to_csv(
+        scrap4.RUN_LOG_PATH, index=False, encoding="utf-8-sig")
+    scrap4.write_run_log({"province": "ข", "rows_collected": 7, "rows_written_province_file": 7})
+    scrap4.write_run_log({"province": "ค", "rows_collected": 1, "rows_written_province_file": 1})
+    log = pd.read_csv(scrap4.RUN_LOG_PATH, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    assert list(log.columns) == ["province", "rows_collected", "rows_appended_all_file", "rows_written_province_file"]
+    assert log.values.tolist() == [["ก", "5", "5", ""], ["ข", "7", "", "7"], ["ค", "1", "", "1"]]
+
+def test_changed_province_list_drops_stale_checkpoint_entries(dgr_dirs):
+    cp = scrap4._new_checkpoint()
+    _done_province(cp, "10", 2)          # ชื่อเดิม "10" ยังตรง
+    _done_province(cp, "20", 1)          # value 20 กลายเป็นจังหวัดอื่น
+    _done_province(cp, "30", 1)          # value 30 หายจากรายชื่อ: ยังต้อง merge
+    scrap4.drop_stale_done(cp, [("10", "10"), ("20", "จังหวัดใหม่")])
+    assert sorted(cp["done"]) == ["10", "30"]
+    assert sorted(scrap4.load_checkpoint()["done"]) == ["10", "30"]
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""storage: ทุก batch ของ dataset ต้องได้ type เดียวกัน ไม่ว่าค่าในรอบนั้นจะเป็นอะไร"""
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import storage
+
+def _dgr(day, depth, **extra):
+    return pd.DataFrame({"Province": ["ขอนแก่น"], "CollectedAt": [f"2026-01-0{day} 08:00:00"],
+                         "Depth": [depth], **{k: [v] for k, v in extra.items()}})
+
+def _write(df, dataset="dgr", root=None, **kw):
+    kw.setdefault("date_col", "CollectedAt" if dataset == "dgr" else None)
+    return storage.write_partitioned(df, dataset, root=str(root), **kw)
+
+@pytest.mark.parametrize("first, second", [("12.5", "n/a"), ("n/a", "12.5"), ("-", "")])
+def test_batches_with_unparseable_values_read_back(tmp_path, first, second):
+    _write(_dgr(1, first), root=tmp_path)
+    _write(_dgr(2, second), root=tmp_path)
+    out = storage.read("dgr", root=str(tmp_path)).sort_values("collect_date")
+    assert str(out["Depth"].dtype) == "float32"
+    expected = [None if v in ("n/a", "-", "") else float(v) for v in (first, second)]
+    assert [None if pd.isna(v) else float(v) for v in out["Depth"]] == expected
+
+def test_unknown_columns_stay_string(tmp_path):
+    _write(_dgr(1, "1", Note="123"), root=tmp_path)
+    _write(_dgr(2, "2", Note="ดี"), root=tmp_path)
+    out = storage.read("dgr", root=str(tmp_path))
+    assert sorted(out["Note"].tolist()) == sorted(["123", "ดี"])
+
+def test_new_batch_cast_to_existing_files(tmp_path):
+    """ไฟล์เก่า (เขียนก่อนมี schema คงที่) เป็น float64 -> batch ใหม่ถูก cast ตาม"""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    old = pa.table({"CollectedAt": ["2026-01-01 08:00:00"], "Depth": pa.array([3.0], pa.float64()),
+                    "collect_date": ["2026-01-01"], "Province": ["ขอนแก่น"]})
+    ds.write_dataset(old, str(tmp_path / "dgr"), format="parquet",
+                     partitioning=storage._partitioning("dgr"), basename_template="old-{i}.parquet")
+    _write(_dgr(2, "4.5"), root=tmp_path)
+    out = storage.read("dgr", root=str(tmp_path))
+    assert sorted(out["Depth"].tolist()) == [3.0, 4.5]
+
+def test_waterdam_positional_columns(tmp_path):
+    rows = [["เขื่อน ก", "1,000.5", "-", "10/17/2026", "แหล่งน้ำขนาดใหญ่"]]
+    _write(pd.DataFrame(rows).assign(DamType="large"), "waterdam", root=tmp_path)
+    _write(pd.DataFrame([["เขื่อน ข", "ปิดปรับปรุง", "4", "10/17/2026", "แหล่งน้ำขนาดใหญ่"]]).assign(DamType="large"),
+           "waterdam", root=tmp_path)
+    out = storage.read("waterdam", root=str(tmp_path)).sort_values("col_1")
+    assert str(out["col_2"].dtype) == "float32" and str(out["col_3"].dtype) == "float32"
+    assert out["col_2"].iloc[0] == pytest.approx(1000.5) and pd.isna(out["col_2"].iloc[1])
+
+def test_dam_schema_is_fixed_per_column():
+    from schema import apply_schema, dam_schema
+    from incremental_merge import key_hashes
+
+    a = pd.DataFrame([["เขื่อน ก", "12", "-", "10/17/2026", "ใหญ่"]]).assign(DamType="large")
+    b = pd.DataFrame([["เขื่อน ก", "12.0", "ปิด", "10/17/2026", "ใหญ่"]]).assign(DamType="large")
+    ta, tb = (apply_schema(df, dam_schema(df.columns)) for df in (a, b))
+    assert list(ta.dtypes.astype(str)) == list(tb.dtypes.astype(str))
+    assert str(ta[1].dtype) == "float32" and str(ta[0].dtype) == "string"
+    # "12" กับ "12.0" คือค่าเดียวกันหลังแปลง -> hash ของคอลัมน์ตัวเลขตรงกัน
+    assert key_hashes(ta, [0, 1]).iloc[0] == key_hashes(tb, [0, 1]).iloc[0]
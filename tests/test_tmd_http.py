@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""tmd_http: parser บน fixture ที่บันทึกไว้ + HTTP engine กับ server ในเครื่อง + fallback ไป Selenium ใน scrap1"""
+from __future__ import annotations
+
+import json
+
+import pytest
+
+import tmd_http
+from conftest import fixture_text
+
+PROVINCES = 12
+
+# ======================================================================
+# PARSERS
+# ======================================================================
+def test_parse_province_options_skips_placeholder():
+    mapping = tmd_http.parse_province_options(fixture_text("tmd_home.html"))
+    assert len(mapping) == PROVINCES
+    assert mapping["เชียงใหม่"] == "17"
+    assert not any(n.startswith("เลือก") for n in mapping)
+
+def test_parse_province_options_without_select():
+    assert tmd_http.parse_province_options("<html><body><select id='lang'><option value='th'>ไทย</option></select>") == {}
+
+def test_parse_today_html_reads_only_today_card():
+    row = tmd_http.parse_today_html(fixture_text("tmd_forecast.html"), "เชียงใหม่")
+    assert row["Province"] == "เชียงใหม่"
+    assert row["Weather"] == "ฝนฟ้าคะนอง"
+    assert row["RainChance"] == pytest.approx(0.6)
+
+def test_parse_today_payload_json_fragment():
+    row = tmd_http.parse_today_payload(fixture_text("tmd_forecast.json"), "เชียงใหม่", is_json=True)
+    assert (row["Weather"], row["RainChance"]) == ("ฝนฟ้าคะนอง", pytest.approx(0.6))
+
+def test_parse_today_payload_sniffs_json_without_header():
+    assert tmd_http.parse_today_payload(fixture_text("tmd_forecast.json"), "x")["Weather"] == "ฝนฟ้าคะนอง"
+
+def test_parse_today_payload_without_today_card():
+    html = fixture_text("tmd_forecast.html").replace("วันนี้", "เมื่อวาน")
+    assert tmd_http.parse_today_payload(html, "x") is None
+    assert tmd_http.parse_today_payload(json.dumps({"html": html}), "x", is_json=True) is None
+
+@pytest.mark.parametrize("url, value, expected", [
+    ("https://www.tmd.go.th/api/forecast?province=17&lang=th", "17",
+     "https://www.tmd.go.th/api/forecast?province={value}&lang=th"),
+    ("https://www.tmd.go.th/province/17/forecast", "17", "https://www.tmd.go.th/province/{value}/forecast"),
+    ("https://www.tmd.go.th/api/forecast?id=170", "17", ""),
+])
+def test_url_to_template(url, value, expected):
+    assert tmd_http.url_to_template(url, value) == expected
+
+def test_endpoint_cache_roundtrip(tmp_path, monkeypatch):
+    monkeypatch.setattr(tmd_http, "ENDPOINT_CACHE", str(tmp_path / "ep.json"))
+    monkeypatch.setattr(tmd_http, "FORECAST_URL", "")
+    assert tmd_http.load_endpoint() == ""
+    tmd_http.save_endpoint("http://x/forecast?p={value}")
+    assert tmd_http.load_endpoint() == "http://x/forecast?p={value}"
+
+# ======================================================================
+# HTTP ENGINE (local server)
+# ======================================================================
+def _tmd_site(broken=(), json_api=False):
+    """หน้าแรก + /api/forecast?province=<value> ; value ใน broken -> 404 หรือไม่มี card"""
+    home = fixture_text("tmd_home.html")
+
+    def handler(req):
+        if req.path == "/":
+            return 200, "text/html; charset=utf-8", home
+        if req.path == "/api/forecast":
+            value = req.query.get("province", [""])[0]
+            if value == "404":
+                return 404, "text/plain", "not found"
+            if value in broken:
+                return 200, "text/html; charset=utf-8", "<div class='card card-shadow text-center'></div>"
+            if json_api:
+                return 200, "application/json", fixture_text("tmd_forecast.json")
+            return 200, "text/html; charset=utf-8", fixture_text("tmd_forecast.html")
+        return 404, "text/plain", ""
+
+    return handler
+
+def test_fetch_today_over_http(local_server):
+    srv = local_server(_tmd_site(json_api=True))
+    session = tmd_http.make_session(1)
+    row = tmd_http.fetch_today(session, srv.url("/api/forecast?province={value}"), "17", "เชียงใหม่")
+    assert row["Weather"] == "ฝนฟ้าคะนอง"
+    req = srv.requests[-1]
+    assert req.query["province"] == ["17"]
+    assert req.headers["x-requested-with"] == "XMLHttpRequest"
+
+def test_fetch_province_mapping_over_http(local_server):
+    srv = local_server(_tmd_site())
+    assert len(tmd_http.fetch_province_mapping(tmd_http.make_session(1), srv.url("/"))) == PROVINCES
+
+def test_scrape_provinces_reports_failures(local_server):
+    srv = local_server(_tmd_site(broken={"27"}))
+    session = tmd_http.make_session(4)
+    mapping = tmd_http.fetch_province_mapping(session, srv.url("/"))
+    mapping["ไม่มีหน้า"] = "404"
+    rows, failed = tmd_http.scrape_provinces(session, srv.url("/api/forecast?province={value}"),
+                                             mapping, list(mapping), workers=4)
+    assert sorted(failed) == sorted(["ขอนแก่น", "ไม่มีหน้า"])
+    assert len(rows) == PROVINCES - 1
+    assert {r["Province"] for r in rows}.isdisjoint(failed)
+
+# ======================================================================
+# FALLBACK -> SELENIUM (scrap1.main)
+# ======================================================================
+@pytest.fixture
+def scrap1_http(local_server, tmp_path, monkeypatch):
+    pytest.importorskip("selenium")
+    import scrap1
+
+    calls = []
+
+    def fake_selenium(only=None):
+        calls.append(only)
+        return [{"Province": n, "Weather": "selenium", "RainChance": 0.1, "DateTime": "2026-01-01 00:00:00"}
+                for n in (only or ["ทั้งหมด"])]
+
+    def setup(template_path, **site):
+        srv = local_server(_tmd_site(**site))
+        monkeypatch.setattr(scrap1, "TMD_ENGINE", "http")
+        monkeypatch.setattr(scrap1, "HOME", srv.url("/"))
+        monkeypatch.setattr(scrap1, "CSV_OUT", str(tmp_path / "out.csv"))
+        monkeypatch.setattr(scrap1, "_scrape_via_selenium", fake_selenium)
+        monkeypatch.setattr(scrap1.storage, "save_frame", lambda *a, **k: None)
+        monkeypatch.setattr(tmd_http, "FORECAST_URL", srv.url(template_path) if template_path else "")
+        monkeypatch.setattr(tmd_http, "ENDPOINT_CACHE", str(tmp_path / "ep.json"))
+        return scrap1
+
+    setup.calls = calls
+    return setup
+
+def test_fallback_all_provinces_when_endpoint_unknown(scrap1_http):
+    scrap1_http(None).main()
+    assert scrap1_http.calls == [None]
+
+def test_fallback_only_failed_provinces(scrap1_http):
+    import pandas as pd
+
+    mod = scrap1_http("/api/forecast?province={value}", broken={"27", "52"})
+    mod.main()
+    assert [sorted(c) for c in scrap1_http.calls] == [sorted(["ขอนแก่น", "ภูเก็ต"])]
+    out = pd.read_csv(mod.CSV_OUT)
+    assert len(out) == PROVINCES
+    assert set(out.loc[out["Weather"] == "selenium", "Province"]) == {"ขอนแก่น", "ภูเก็ต"}
+
+def test_no_fallback_when_http_complete(scrap1_http):
+    scrap1_http("/api/forecast?province={value}").main()
+    assert scrap1_http.calls == []
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+ดึงพยากรณ์ "วันนี้" ของ TMD ผ่าน HTTP ตรง ๆ (ไม่ต้องเปิด Chrome)
+
+- endpoint ที่ตัวเลือกจังหวัดเรียกจะถูกค้นหาครั้งแรกด้วย Selenium (discover_endpoint)
+  แล้วเก็บเป็น template ไว้ใน TMD_ENDPOINT_CACHE เช่น "https://.../forecast?province={value}"
+- หรือกำหนดเองด้วย env TMD_FORECAST_URL (ต้องมี {value})
+- รองรับทั้ง HTML ที่ server render และ JSON ที่ห่อ HTML fragment ของ card
+"""
+from __future__ import annotations
+
+import os, re, json, time
+from datetime import datetime
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+import rate_limit
+
+# ======================================================================
+# CONFIG
+# ======================================================================
+ENDPOINT_CACHE: str = os.getenv("TMD_ENDPOINT_CACHE", "tmd_endpoint.json")
+FORECAST_URL: str = os.getenv("TMD_FORECAST_URL", "")
+HTTP_TIMEOUT: float = float(os.getenv("TMD_HTTP_TIMEOUT", "15"))
+# ความถี่เริ่มต้นของ host TMD (คำขอ/วินาที รวมทุก worker ทั้ง HTTP และ Selenium) ; rate_limit ปรับขึ้นลงเอง
+TMD_RATE: float = float(os.getenv("TMD_RATE", "1.0"))
+USER_AGENT: str = ("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36")
+
+RE_INT = re.compile(r"(\d+)")
+CARD_CLASSES = {"card", "card-shadow", "text-center"}
+
+# ======================================================================
+# MINI DOM (html.parser) — พอสำหรับหา card/select โดยไม่ต้องพึ่ง lib ภายนอก
+# ======================================================================
+_VOID = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+         "meta", "param", "source", "track", "wbr"}
+
+class _Node:
+    __slots__ = ("tag", "attrs", "children")
+
+    def __init__(self, tag: str, attrs: Dict[str, str]):
+        self.tag = tag
+        self.attrs = attrs
+        self.children: list = []
+
+    @property
+    def classes(self) -> set:
+        return set((self.attrs.get("class") or "").split())
+
+    def iter(self) -> Iterator["_Node"]:
+        for ch in self.children:
+            if isinstance(ch, _Node):
+                yield ch
+                yield from ch.iter()
+
+    def text(self) -> str:
+        parts: List[str] = []
+        for ch in self.children:
+            parts.append(ch.text() if isinstance(ch, _Node) else ch)
+        return re.sub(r"\s+", " ", " ".join(parts)).strip()
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = _Node("#root", {})
+        self._stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        node = _Node(tag, {k: (v or "") for k, v in attrs})
+        self._stack[-1].children.append(node)
+        if tag not in _VOID:
+            self._stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        self._stack[-1].children.append(_Node(tag, {k: (v or "") for k, v in attrs}))
+
+    def handle_endtag(self, tag):
+        # ปิด tag ที่ค้างอยู่จนถึงตัวที่ตรงกัน (HTML จริงมักไม่ครบคู่)
+        for i in range(len(self._stack) - 1, 0, -1):
+            if self._stack[i].tag == tag:
+                del self._stack[i:]
+                return
+
+    def handle_data(self, data):
+        self._stack[-1].children.append(data)
+
+def parse_html(html: str) -> _Node:
+    b = _TreeBuilder()
+    b.feed(html or "")
+    b.close()
+    return b.root
+
+# ======================================================================
+# PARSERS
+# ======================================================================
+def extract_percent(text: str) -> Optional[float]:
+    m = RE_INT.search(text or "")
+    return (int(m.group(1)) / 100.0) if m else None
+
+def parse_today_html(html: str, province_name: str) -> Optional[Dict[str, str]]:
+    """เทียบเท่า parse_today_fast ใน scrap1 แต่ทำงานบน HTML string"""
+    root = parse_html(html)
+    for card in root.iter():
+        if card.tag != "div" or not CARD_CLASSES.issubset(card.classes):
+            continue
+        head = next((n for n in card.iter() if n.tag == "div" and "font-small" in n.classes), None)
+        if head is None or head.text() != "วันนี้":
+            continue
+        cond, rain_text = None, None
+        for el in card.iter():
+            if el.tag != "div" or not {"font-tiny", "text-center"}.issubset(el.classes):
+                continue
+            txt = el.text()
+            if "%" in txt and not rain_text:
+                rain_text = txt
+            elif "%" not in txt and not cond:
+                cond = txt
+        if cond and rain_text:
+            return {
+                "Province": province_name,
+                "Weather": cond,
+                "RainChance": extract_percent(rain_text),
+                "DateTime": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }
+    return None
+
+def _html_fragments(obj) -> Iterator[str]:
+    """ไล่หา string ที่เป็น HTML ใน JSON (endpoint แบบ partial มักส่ง {"html": "..."})"""
+    if isinstance(obj, str):
+        if "<" in obj and "card" in obj:
+            yield obj
+    elif isinstance(obj, dict):
+        for v in obj.values():
+            yield from _html_fragments(v)
+    elif isinstance(obj, list):
+        for v in obj:
+            yield from _html_fragments(v)
+
+def parse_today_payload(body: str, province_name: str, is_json: bool = False) -> Optional[Dict[str, str]]:
+    if is_json or body.lstrip()[:1] in ("{", "["):
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = None
+        if data is not None:
+            for frag in _html_fragments(data):
+                row = parse_today_html(frag, province_name)
+                if row:
+                    return row
+            return None
+    return parse_today_html(body, province_name)
+
+def parse_province_options(html: str) -> Dict[str, str]:
+    """อ่าน <option> ของ select จังหวัดจาก HTML หน้าแรก -> {ชื่อ: value}"""
+    root = parse_html(html)
+    for sel in root.iter():
+        if sel.tag != "select":
+            continue
+        ident = (sel.attrs.get("id", "") + " " + sel.attrs.get("name", "")).lower()
+        if "province" not in ident:
+            continue
+        mapping: Dict[str, str] = {}
+        for op in sel.iter():
+            if op.tag != "option":
+                continue
+            name = op.text()
+            val = (op.attrs.get("value") or "").strip()
+            if not name or not val or name.startswith("เลือก"):
+                continue
+            mapping[name] = val
+        if mapping:
+            return mapping
+    return {}
+
+# ======================================================================
+# HTTP SESSION (connection pool)
+# ======================================================================
+def make_session(pool_size: int = 4):
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    s = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    s.headers.update({
+        "User-Agent": USER_AGENT,
+        "Accept-Language": "th-TH,th;q=0.9,en;q=0.8",
+        "Accept-Encoding": "gzip, deflate",
+    })
+    return s
+
+def fetch_province_mapping(session, home: str) -> Dict[str, str]:
+    r = rate_limit.limited_get(session, home, rate=TMD_RATE, timeout=HTTP_TIMEOUT)
+    r.raise_for_status()
+    return parse_province_options(r.text)
+
+def fetch_today(session, template: str, value: str, province_name: str) -> Optional[Dict[str, str]]:
+    url = template.replace("{value}", quote(value, safe=""))
+    r = rate_limit.limited_get(session, url, rate=TMD_RATE, timeout=HTTP_TIMEOUT,
+                               headers={"X-Requested-With": "XMLHttpRequest"})
+    r.raise_for_status()
+    is_json = "json" in (r.headers.get("Content-Type") or "").lower()
+    return parse_today_payload(r.text, province_name, is_json=is_json)
+
+def scrape_provinces(session, template: str, mapping: Dict[str, str], names: List[str],
+                     workers: int = 4) -> Tuple[List[Dict[str, str]], List[str]]:
+    total = len(names)
+    print(f"เริ่มดึง {total} จังหวัด (HTTP, {workers} connections)")
+
+    def _one(name: str) -> Optional[Dict[str, str]]:
+        try:
+            return fetch_today(session, template, mapping[name], name)
+        except Exception as e:
+            print(f"[http] {name} ✖ {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        results = list(ex.map(_one, names))
+
+    rows = [r for r in results if r]
+    failed = [n for n, r in zip(names, results) if not r]
+    return rows, failed
+
+# ======================================================================
+# ENDPOINT CACHE / DISCOVERY
+# ======================================================================
+def load_endpoint() -> str:
+    if FORECAST_URL:
+        return FORECAST_URL
+    try:
+        with open(ENDPOINT_CACHE, "r", encoding="utf-8") as f:
+            return (json.load(f) or {}).get("template", "")
+    except Exception:
+        return ""
+
+def save_endpoint(template: str) -> None:
+    with open(ENDPOINT_CACHE, "w", encoding="utf-8") as f:
+        json.dump({"template": template, "discovered_at": datetime.now().isoformat(timespec="seconds")},
+                  f, ensure_ascii=False, indent=2)
+
+_HOOK_JS = """
+if (!window.__tmdReq) {
+  window.__tmdReq = [];
+  const rec = (u) => { try { window.__tmdReq.push(String(new URL(u, location.href))); } catch (e) {} };
+  const oo = XMLHttpRequest.prototype.open;
+  XMLHttpRequest.prototype.open = function (m, u) { rec(u); return oo.apply(this, arguments); };
+  if (window.fetch) {
+    const of = window.fetch;
+    window.fetch = function (input, init) { rec(typeof input === 'string' ? input : input.url); return of.apply(this, arguments); };
+  }
+}
+window.__tmdReq.length = 0;
+"""
+
+def url_to_template(url: str, value: str) -> str:
+    """แทนค่า value ใน URL ด้วย {value} (เฉพาะที่เป็น path segment หรือค่า query)"""
+    for v in dict.fromkeys((quote(value, safe=""), value)):
+        pat = re.compile(r"(?<=[=/])" + re.escape(v) + r"(?=$|[&/?#])")
+        hits = list(pat.finditer(url))
+        if hits:
+            m = hits[-1]
+            return url[:m.start()] + "{value}" + url[m.end():]
+    return ""
+
+def discover_endpoint(driver, trigger: Callable[[], bool], value: str, timeout: float = 8.0) -> str:
+    """ติด hook XHR/fetch แล้วสั่งเลือกจังหวัด เพื่อดูว่าหน้าเว็บเรียก URL ไหน"""
+    url_before = driver.current_url
+    try:
+        driver.execute_script(_HOOK_JS)
+    except Exception:
+        pass
+    if not trigger():
+        return ""
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urls = driver.execute_script("return window.__tmdReq || [];") or []
+        except Exception:
+            urls = []
+        # หน้าแบบ server-render จะเปลี่ยน URL แทนการยิง XHR
+        if driver.current_url != url_before:
+            urls = list(urls) + [driver.current_url]
+        for u in reversed(urls):
+            tpl = url_to_template(u, value)
+            if tpl:
+                return tpl
+        time.sleep(0.3)
+    return ""
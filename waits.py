@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+เงื่อนไขรอแบบ event-driven ใช้แทน time.sleep คงที่
+
+ทุกฟังก์ชันมี timeout เสมอ และไม่ raise: คืน True/ค่าใหม่เมื่อเงื่อนไขเป็นจริง
+คืน False/ค่าเดิมเมื่อหมดเวลา เพื่อให้ผู้เรียกทำงานต่อได้เหมือนตอน sleep ครบ
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+POLL: float = 0.1
+
+# ---------- DOM mutation quiescence ----------
+_DOM_QUIET_JS = """
+const quietMs = arguments[0], timeoutMs = arguments[1];
+const root = arguments[2] || document.documentElement || document;
+const done = arguments[arguments.length - 1];
+let timer = null, hard = null, obs = null;
+const finish = (ok) => { if (obs) obs.disconnect(); clearTimeout(timer); clearTimeout(hard); done(ok); };
+obs = new MutationObserver(() => { clearTimeout(timer); timer = setTimeout(() => finish(true), quietMs); });
+obs.observe(root, {childList: true, subtree: true, characterData: true});
+timer = setTimeout(() => finish(true), quietMs);
+hard = setTimeout(() => finish(false), timeoutMs);
+"""
+
+def wait_dom_quiet(driver, quiet_ms: int = 300, timeout: float = 5.0, root=None) -> bool:
+    """รอจน DOM ไม่มีการเปลี่ยนแปลงติดต่อกัน quiet_ms (MutationObserver)"""
+    try:
+        return bool(driver.execute_async_script(_DOM_QUIET_JS, int(quiet_ms), int(timeout * 1000), root))
+    except Exception:
+        return False
+
+# ---------- animation frame (หลัง scrollIntoView) ----------
+_FRAMES_JS = """
+let n = arguments[0];
+const done = arguments[arguments.length - 1];
+const tick = () => (--n <= 0) ? done(true) : requestAnimationFrame(tick);
+requestAnimationFrame(tick);
+"""
+
+def wait_animation_frame(driver, frames: int = 2) -> None:
+    try:
+        driver.execute_async_script(_FRAMES_JS, int(frames))
+    except Exception:
+        pass
+
+# ---------- network idle ----------
+# hook นับ XHR/fetch ที่ยังค้าง (resource timing เห็นเฉพาะ request ที่จบแล้ว)
+_NETWORK_HOOK_JS = """
+if (window.__wInflight === undefined) {
+  window.__wInflight = 0;
+  const dec = () => { window.__wInflight = Math.max(0, window.__wInflight - 1); };
+  const oo = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.send = function () {
+    window.__wInflight++; this.addEventListener('loadend', dec, {once: true});
+    return oo.apply(this, arguments);
+  };
+  if (window.fetch) {
+    const of = window.fetch;
+    window.fetch = function () {
+      window.__wInflight++;
+      return of.apply(this, arguments).finally(dec);
+    };
+  }
+}
+"""
+
+def install_network_hook(driver) -> None:
+    """เรียกก่อน action ที่จะยิง XHR เพื่อให้ wait_network_idle เห็น request ที่ยังไม่จบ"""
+    try:
+        driver.execute_script(_NETWORK_HOOK_JS)
+    except Exception:
+        pass
+
+_NETWORK_IDLE_JS = """
+const idleMs = arguments[0], timeoutMs = arguments[1];
+const done = arguments[arguments.length - 1];
+const start = Date.now();
+let last = -1, since = Date.now();
+const tick = () => {
+  const n = performance.getEntriesByType('resource').length;
+  const now = Date.now();
+  if (n !== last || (window.__wInflight || 0) > 0 || document.readyState !== 'complete') { last = n; since = now; }
+  if (now - since >= idleMs) return done(true);
+  if (now - start >= timeoutMs) return done(false);
+  setTimeout(tick, 50);
+};
+tick();
+"""
+
+def wait_network_idle(driver, idle_ms: int = 500, timeout: float = 10.0) -> bool:
+    """รอจนไม่มี request ค้าง/resource ใหม่เป็นเวลา idle_ms และ readyState = complete"""
+    try:
+        return bool(driver.execute_async_script(_NETWORK_IDLE_JS, int(idle_ms), int(timeout * 1000)))
+    except Exception:
+        return False
+
+# ---------- row count / first row text ----------
+_ROW_COUNT_JS = "return (arguments[1] || document).querySelectorAll(arguments[0]).length;"
+_FIRST_ROW_JS = """
+const r = (arguments[1] || document).querySelector(arguments[0]);
+return r ? (r.innerText || r.textContent || '').trim() : '';
+"""
+
+def row_count(driver, css: str, root=None) -> int:
+    try:
+        return int(driver.execute_script(_ROW_COUNT_JS, css, root) or 0)
+    except Exception:
+        return 0
+
+def first_row_text(driver, css: str, root=None) -> str:
+    try:
+        return driver.execute_script(_FIRST_ROW_JS, css, root) or ""
+    except Exception:
+        return ""
+
+def _poll(driver, timeout: float, cond) -> Optional[object]:
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=POLL).until(lambda d: cond())
+    except Exception:
+        return None
+
+def wait_row_count_change(driver, css: str, old_count: int, timeout: float = 5.0, root=None) -> int:
+    """รอจนจำนวนแถวไม่เท่ากับ old_count; คืนจำนวนแถวล่าสุด"""
+    def _changed():
+        n = row_count(driver, css, root)
+        return [n] if n != old_count else None  # ห่อ list กันกรณี n == 0 ถูกมองเป็น False
+
+    got = _poll(driver, timeout, _changed)
+    return got[0] if got else old_count
+
+def wait_first_row_text_change(driver, css: str, old_text: str, timeout: float = 15.0, root=None) -> bool:
+    """รอจนข้อความแถวแรกเปลี่ยน (ใช้หลังคลิกเปลี่ยนหน้าในตารางที่ reuse element เดิม)"""
+    return _poll(driver, timeout, lambda: first_row_text(driver, css, root) not in ("", old_text)) is not None